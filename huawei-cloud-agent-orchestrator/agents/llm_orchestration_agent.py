@@ -3,18 +3,72 @@
 使用大语言模型理解用户需求并生成工作流
 """
 
+import asyncio
 import json
-from typing import Dict, List, Optional, Any
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Any, Tuple
 from datetime import datetime
 from pathlib import Path
 
-from models.workflow import Workflow, Task, TaskType, TaskStatus, WorkflowStatus, PARAMETER_TEMPLATES
+from models.workflow import (
+    Workflow, Task, TaskType, TaskStatus, WorkflowStatus, PARAMETER_TEMPLATES, workflow_content_hash
+)
 from services.huawei_cloud_service_registry import get_registry
 from services.llm_client import LLMClient
+from services.registry_index import get_registry_index
+from services.requirement_classifier import RULE_PATTERNS, get_requirement_classifier, keyword_labels, mentioned_services
+from services.service_dependency_analyzer import get_analyzer
+from services.workflow_verifier import ADVISORY_ISSUE_CODES, get_workflow_verifier
+from utils.async_runner import run_sync
 from utils.config_manager import get_config
+from utils.database import find_explanation_by_hash, save_workflow_explanation
+from utils.generation_cache import get_generation_cache
+from utils.json_patch import JsonPatchError, apply_patch, parse_pointer
+from utils.tracing import trace_span
 from utils.vector_store import get_vector_store
 
 
+async def _timed(coro, timings: Optional[Dict[str, float]], name: str):
+    """等待协程并将耗时（毫秒）记录到 timings[name]，同时记录为追踪span plan.<name>"""
+    start = time.perf_counter()
+    try:
+        with trace_span(f"plan.{name}"):
+            return await coro
+    finally:
+        if timings is not None:
+            timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+# 需求文本中的配置参数（按顺序匹配，每个键取第一个匹配）
+_NAME_VALUE = r'([A-Za-z0-9][A-Za-z0-9_\-\.]*)'
+_SEPARATOR = r'\s*[:：=]?\s*(?:为|是)?\s*'
+_CONFIG_PATTERNS = [
+    ('vpc_name', rf'(?:vpc|虚拟私有云)\s*(?:名称|名字|name){_SEPARATOR}{_NAME_VALUE}'),
+    ('subnet_name', rf'(?:子网|subnet)\s*(?:名称|名字|name){_SEPARATOR}{_NAME_VALUE}'),
+    ('db_name', rf'(?:数据库|db)[\s_]*(?:名称|名字|name){_SEPARATOR}{_NAME_VALUE}'),
+    ('ecs_name', rf'(?:服务器|云主机|ecs)\s*(?:名称|名字|name){_SEPARATOR}{_NAME_VALUE}'),
+    ('name', rf'(?:名称|名字|命名为|name){_SEPARATOR}{_NAME_VALUE}'),
+    ('vpc_id', rf'vpc[\s_-]*id{_SEPARATOR}([A-Za-z0-9\-]+)'),
+    ('subnet_id', rf'(?:子网|subnet)[\s_-]*id{_SEPARATOR}([A-Za-z0-9\-]+)'),
+    ('flavor', rf'(?:规格|flavor){_SEPARATOR}([a-z0-9]+(?:\.[a-z0-9]+)+)'),
+    ('flavor', r'(?<![\w.])([a-z]\d[a-z]?\.(?:small|medium|large|\d*xlarge)\.\d+)(?![\w.])'),
+    ('image', rf'(?:镜像|image)[\s_-]*id{_SEPARATOR}([A-Za-z0-9\-]+)'),
+    ('image', r'((?:Huawei Cloud EulerOS|EulerOS|openEuler|CentOS|Ubuntu|Debian|Windows Server)(?:\s*\d+(?:\.\d+)*)?)'),
+    ('domain', rf'(?:域名|domain){_SEPARATOR}((?:[a-z0-9\-]+\.)+[a-z]{{2,}})'),
+]
+_QUALIFIED_NAME_KEYS = ('vpc_name', 'subnet_name', 'db_name', 'ecs_name')
+_CIDR_PATTERN = re.compile(r'(?<![\d.])(\d{1,3}(?:\.\d{1,3}){3}/\d{1,2})(?![\d.])')
+
+
+# 批量生成时共享的向量检索结果: 检索键 -> 检索任务（见 LLMOrchestrationAgent.shared_retrieval）
+_retrieval_memo: ContextVar[Optional[Dict[str, asyncio.Task]]] = ContextVar("retrieval_memo", default=None)
+
+
 class LLMOrchestrationAgent:
     """
     基于LLM的智能Agent编排引擎
@@ -29,6 +83,9 @@ class LLMOrchestrationAgent:
         agent = LLMOrchestrationAgent()
         workflow = agent.plan("部署一个Web应用，包含ECS和RDS")
         explanation = agent.explain(workflow)
+
+        # 在异步代码中（如FastAPI处理函数）
+        workflow = await agent.aplan("部署一个Web应用，包含ECS和RDS")
     """
 
     def __init__(self):
@@ -36,18 +93,128 @@ class LLMOrchestrationAgent:
         self.service_registry = get_registry()
         self.llm_client = LLMClient()
         self.logger = LLMClient().logger  # 复用logger
+        # 工作流解释缓存：内容哈希 -> 解释文本（LRU），以及进行中的解释任务
+        self._explanation_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._explanation_lock = threading.Lock()
+        self._explanation_tasks: Dict[str, asyncio.Task] = {}
+        self._background_tasks = set()
 
     def is_llm_available(self) -> bool:
         """检查LLM是否可用"""
         return self.llm_client.is_available()
 
-    def plan(self, user_requirement: str, context: Optional[Dict[str, Any]] = None) -> Workflow:
+    def plan(self, user_requirement: str, context: Optional[Dict[str, Any]] = None,
+             timings: Optional[Dict[str, float]] = None) -> Workflow:
+        """
+        同步生成工作流（供脚本/CLI使用），内部执行 aplan
+
+        Args:
+            user_requirement: 用户的自然语言描述
+            context: 可选上下文（区域、项目等）
+            timings: 可选，写入各阶段耗时（毫秒），见 aplan
+
+        Returns:
+            Workflow: 生成的可执行工作流
+        """
+        return run_sync(self.aplan(user_requirement, context, timings=timings))
+
+    async def aplan_cached(self, user_requirement: str, context: Optional[Dict[str, Any]] = None,
+                           timings: Optional[Dict[str, float]] = None,
+                           generation: Optional[Dict[str, Any]] = None) -> Tuple[Workflow, Optional[str]]:
+        """
+        先查询语义缓存，未命中再调用 aplan 生成
+
+        Args:
+            user_requirement: 用户的自然语言描述
+            context: 可选上下文（区域、项目等）
+            timings: 可选，写入各阶段耗时（毫秒），见 aplan
+            generation: 可选，写入生成来源信息，见 aplan
+
+        Returns:
+            (工作流, 命中的workflow_records记录ID)；未命中时记录ID为None
+        """
+        cached = await _timed(self._alookup_generation_cache(user_requirement, context), timings, "cache_lookup")
+        if cached:
+            print(f"\n✓ 命中生成缓存 (相似度: {cached['similarity']:.3f})，复用记录 {cached['record_id']}")
+            if generation is not None:
+                generation.update({"source": "cache", "validated": True, "model": cached.get("model", "")})
+            return self._parse_workflow_from_llm(cached["workflow"]), cached["record_id"]
+
+        workflow = await self.aplan(user_requirement, context, timings=timings, generation=generation)
+        return workflow, None
+
+    async def _alookup_generation_cache(self, user_requirement: str, context: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """查询语义缓存（在线程池中执行向量查询）"""
+        try:
+            return await asyncio.to_thread(
+                get_generation_cache().lookup,
+                user_requirement, self._generation_cache_scope(context)
+            )
+        except Exception as e:
+            self.logger.warning(f"生成缓存不可用: {e}")
+            return None
+
+    def cache_generated_workflow(self, user_requirement: str, record_id: str, context: Optional[Dict[str, Any]] = None,
+                                 generation: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        将已保存到 workflow_records 的生成结果登记到语义缓存
+
+        只登记由LLM生成且通过验证的结果；规则模板/规则回退生成的工作流不进入缓存，
+        作用域中的模型为生成时实际使用的 "端点名/模型"。
+
+        Args:
+            user_requirement: 用户需求
+            record_id: workflow_records 记录ID
+            context: 生成时使用的上下文
+            generation: aplan / aplan_cached / aplan_stream 给出的生成来源信息
+
+        Returns:
+            是否登记成功
+        """
+        generation = generation or {}
+        if generation.get("source") != "llm" or not generation.get("validated") or not generation.get("model"):
+            self.logger.info(
+                f"跳过生成缓存登记: 来源={generation.get('source')}, 验证通过={generation.get('validated')}"
+            )
+            return False
+        try:
+            return get_generation_cache().store(
+                user_requirement, self._generation_cache_scope(context, generation["model"]), record_id
+            )
+        except Exception as e:
+            self.logger.warning(f"登记生成缓存失败: {e}")
+            return False
+
+    def _generation_cache_scope(self, context: Optional[Dict[str, Any]], model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        生成缓存作用域：区域、提示词版本、模型
+
+        model 为 "端点名/模型"；查询时未指定，匹配任一已配置端点生成的条目，
+        命中与否不随路由器按延迟调整的端点顺序变化。
+        """
+        region = (context or {}).get('region') or self.config.get('huaweicloud.region', '')
+        return {
+            "region": region or "",
+            "prompt_version": self.llm_client.prompt_version(),
+            "model": model if model is not None else self.llm_client.configured_endpoints("generate"),
+        }
+
+    async def aplan(self, user_requirement: str, context: Optional[Dict[str, Any]] = None,
+                    timings: Optional[Dict[str, float]] = None,
+                    generation: Optional[Dict[str, Any]] = None) -> Workflow:
         """
         基于LLM生成工作流（含两阶段检索、参数模板注入、架构规划、验证重试）
 
+        需求分类器高置信度命中规则模板时直接使用模板生成（规则快速路径），不调用LLM。
+        LLM调用使用异步客户端，向量检索在线程池中执行，不阻塞事件循环。
+
         Args:
             user_requirement: 用户的自然语言描述
             context: 可选上下文（区域、项目等）
+            timings: 可选，写入各阶段耗时（毫秒）：classify, architecture_plan, identify_operations,
+                     broad_search, targeted_search, prepare, generate, finalize, total
+            generation: 可选，写入生成来源信息：source（rule_fast_path / llm / rules）、
+                        validated（最终是否仍有验证错误）、model（生成阶段实际使用的 "端点名/模型"）
 
         Returns:
             Workflow: 生成的可执行工作流
@@ -57,36 +224,243 @@ class LLMOrchestrationAgent:
         print(f"{'='*60}")
         print(f"用户需求: {user_requirement}")
 
+        with trace_span("agent.plan", requirement=user_requirement) as span, \
+                self.llm_client.track_endpoints() as used_endpoints:
+            timings = timings if timings is not None else {}
+            generation = generation if generation is not None else {}
+            start = time.perf_counter()
+
+            # Step 0: 常见需求直接使用规则模板
+            workflow = await self._arule_fast_path(user_requirement, timings)
+            if workflow is not None:
+                generation["source"] = "rule_fast_path"
+                workflow = await _timed(self._afinalize_workflow(workflow, [], generation), timings, "finalize")
+                span.set_attribute("rule_fast_path", True)
+                span.set_attribute("task_count", len(workflow.tasks))
+                timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+                self.logger.info(f"工作流生成阶段耗时(ms): {timings}")
+                return workflow
+
+            architecture_plan, relevant_operations, filtered_templates = await _timed(
+                self._aprepare_generation(user_requirement, timings), timings, "prepare"
+            )
+
+            # Step 2: 使用LLM生成工作流 (P3: 两步生成)
+            if self.is_llm_available():
+                print("\n[Step 2] 调用LLM生成工作流...")
+                workflow_dict = await _timed(self.llm_client.agenerate_workflow(
+                    user_requirement, context,
+                    relevant_operations=relevant_operations if relevant_operations else None,
+                    parameter_templates=filtered_templates if filtered_templates else None,
+                    architecture_plan=architecture_plan
+                ), timings, "generate")
+                workflow = self._workflow_from_llm_result(workflow_dict, user_requirement, context, generation)
+                generation["model"] = used_endpoints.get("generate", "")
+            else:
+                print("\n⚠ LLM不可用，使用规则引擎生成...")
+                generation["source"] = "rules"
+                workflow = self._generate_with_rules(user_requirement, context)
+
+            workflow = await _timed(self._afinalize_workflow(workflow, relevant_operations, generation), timings, "finalize")
+            span.set_attribute("task_count", len(workflow.tasks))
+            timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+            self.logger.info(f"工作流生成阶段耗时(ms): {timings}")
+            return workflow
+
+    async def aplan_stream(self, user_requirement: str, context: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式生成工作流：阶段进度和每个完整的任务对象一经产生即推送
+
+        Args:
+            user_requirement: 用户的自然语言描述
+            context: 可选上下文（区域、项目等）
+
+        Yields:
+            {"type": "stage", "stage": 阶段名, "message": 说明}
+            {"type": "task", "index": 序号, "task": 任务字典}（LLM流式输出中的任务，尚未经过验证）
+            最后产出 {"type": "workflow", "workflow": 最终Workflow对象, "record_id": 命中缓存的记录ID,
+                      "cache_hit": 是否命中缓存, "truncated": LLM输出是否被截断, "timings": 各阶段耗时(毫秒),
+                      "generation": 生成来源信息（见 aplan）}
+        """
+        with trace_span("agent.plan_stream", requirement=user_requirement) as span, \
+                self.llm_client.track_endpoints() as used_endpoints:
+            timings: Dict[str, float] = {}
+            generation: Dict[str, Any] = {}
+            start = time.perf_counter()
+            cached = await _timed(self._alookup_generation_cache(user_requirement, context), timings, "cache_lookup")
+            if cached:
+                workflow = self._parse_workflow_from_llm(cached["workflow"])
+                yield {
+                    "type": "workflow",
+                    "workflow": workflow,
+                    "record_id": cached["record_id"],
+                    "cache_hit": True,
+                    "truncated": False,
+                    "timings": timings,
+                    "generation": {"source": "cache", "validated": True, "model": cached.get("model", "")},
+                }
+                return
+
+            workflow = await self._arule_fast_path(user_requirement, timings)
+            if workflow is not None:
+                generation["source"] = "rule_fast_path"
+                yield {"type": "stage", "stage": "validate", "message": "验证规则模板生成的工作流..."}
+                workflow = await _timed(self._afinalize_workflow(workflow, [], generation), timings, "finalize")
+                span.set_attribute("rule_fast_path", True)
+                span.set_attribute("task_count", len(workflow.tasks))
+                timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+                yield {
+                    "type": "workflow",
+                    "workflow": workflow,
+                    "record_id": None,
+                    "cache_hit": False,
+                    "truncated": False,
+                    "timings": timings,
+                    "generation": generation,
+                }
+                return
+
+            yield {"type": "stage", "stage": "prepare", "message": "分析需求并检索相关API..."}
+            architecture_plan, relevant_operations, filtered_templates = await _timed(
+                self._aprepare_generation(user_requirement, timings), timings, "prepare"
+            )
+
+            truncated = False
+            generate_start = time.perf_counter()
+            if self.is_llm_available():
+                yield {"type": "stage", "stage": "generate", "message": "LLM正在生成工作流..."}
+                workflow_dict = None
+                async for event in self.llm_client.astream_workflow(
+                    user_requirement, context,
+                    relevant_operations=relevant_operations if relevant_operations else None,
+                    parameter_templates=filtered_templates if filtered_templates else None,
+                    architecture_plan=architecture_plan
+                ):
+                    if event["type"] == "task":
+                        yield event
+                    else:
+                        workflow_dict = event["workflow"]
+                        truncated = event["truncated"]
+                timings["generate"] = round((time.perf_counter() - generate_start) * 1000, 1)
+                workflow = self._workflow_from_llm_result(workflow_dict, user_requirement, context, generation)
+                generation["model"] = used_endpoints.get("generate", "")
+            else:
+                generation["source"] = "rules"
+                workflow = self._generate_with_rules(user_requirement, context)
+
+            yield {"type": "stage", "stage": "validate", "message": "验证并修正工作流..."}
+            workflow = await _timed(self._afinalize_workflow(workflow, relevant_operations, generation), timings, "finalize")
+            span.set_attribute("task_count", len(workflow.tasks))
+            timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+            self.logger.info(f"工作流生成阶段耗时(ms): {timings}")
+
+            yield {
+                "type": "workflow",
+                "workflow": workflow,
+                "record_id": None,
+                "cache_hit": False,
+                "truncated": truncated,
+                "timings": timings,
+                "generation": generation,
+            }
+
+    async def _arule_fast_path(self, user_requirement: str,
+                               timings: Optional[Dict[str, float]] = None) -> Optional[Workflow]:
+        """
+        规则快速路径：需求分类器高置信度命中规则模板时，直接用模板生成，不调用LLM
+
+        需求中提及了模板未覆盖的服务时视为新颖需求，仍交给LLM生成。
+
+        Args:
+            user_requirement: 用户需求
+            timings: 可选，写入分类耗时 classify（毫秒）
+
+        Returns:
+            命中时返回模板生成的工作流（尚未验证），否则返回None
+        """
+        try:
+            classifier = get_requirement_classifier()
+            if not classifier.enabled:
+                return None
+            classification = await _timed(
+                asyncio.to_thread(classifier.classify, user_requirement), timings, "classify"
+            )
+        except Exception as e:
+            self.logger.warning(f"需求分类不可用: {e}")
+            return None
+
+        if not classification.fast_path:
+            print(f"\n[Step 0] 规则快速路径未命中: {classification.reason}")
+            return None
+
+        workflow = getattr(self, classification.builder)(user_requirement)
+        covered = {task.service for task in workflow.tasks}
+        uncovered = [name for name in classification.mentioned_services if name not in covered]
+        if uncovered:
+            print(f"\n[Step 0] 规则模板 {classification.label} 未覆盖需求中的服务 {uncovered}，使用LLM生成")
+            return None
+
+        print(f"\n[Step 0] ✓ 规则快速路径命中: {classification.label} (置信度 {classification.confidence:.3f})")
+        return workflow
+
+    async def _aprepare_generation(self, user_requirement: str,
+                                   timings: Optional[Dict[str, float]] = None) -> Tuple[Optional[Dict], List[Dict], Optional[Dict]]:
+        """
+        生成前的准备阶段：架构规划/操作识别、向量检索、参数模板筛选
+
+        - 本地广泛向量检索与 Stage 0 同时启动：Stage 0 任务内最多等待检索 agent.stage0_candidate_wait 秒，
+          命中的服务与需求中直接提及的服务组成候选服务，提示词只展开候选服务的操作清单；
+          检索超时则只使用需求中提及的服务。针对性检索无结果时直接使用广泛检索结果
+        - 架构规划超过 agent.stage0_hedge_delay 秒仍未返回时，提前启动轻量级操作识别作为对冲，
+          架构规划失败时无需再从头等待一次LLM调用
+
+        Args:
+            user_requirement: 用户需求
+            timings: 可选，写入各阶段耗时（毫秒）
+
+        Returns:
+            (架构计划, 相关操作列表, 参数模板)
+        """
+        vector_store = None
+        try:
+            vector_store = get_vector_store()
+        except Exception as e:
+            print(f"  ⚠ 向量库不可用: {e}")
+
+        broad_search_task = None
+        if vector_store is not None:
+            broad_search_task = asyncio.create_task(_timed(
+                self._avector_lookup(vector_store, "search", query=" ".join(user_requirement.split()), n_results=25),
+                timings, "broad_search"
+            ))
+
         # Stage 0: 架构规划 + 识别所需操作 (P3 subsumes P0)
         architecture_plan = None
         identified_ops = None
         if self.is_llm_available():
             print("\n[Stage 0] 生成架构计划...")
-            architecture_plan = self.llm_client.generate_architecture_plan(user_requirement)
-            if architecture_plan:
-                identified_ops = architecture_plan.get("services_needed", [])
-                print(f"  ✓ 架构模式: {architecture_plan.get('pattern', 'unknown')}")
-                print(f"  ✓ DFX级别: {architecture_plan.get('dfx_level', 'unknown')}")
-                print(f"  ✓ 识别到 {len(identified_ops)} 个所需操作")
-            else:
-                print("  ⚠ 架构计划生成失败，尝试轻量级操作识别...")
-                identified_ops = self.llm_client.identify_required_operations(user_requirement)
-                if identified_ops:
-                    print(f"  ✓ 识别到 {len(identified_ops)} 个所需操作")
-                else:
-                    print("  ⚠ 操作识别也失败，将使用广泛搜索")
+            candidates_task = asyncio.create_task(
+                self._aselect_candidate_services(user_requirement, broad_search_task)
+            )
+            architecture_plan, identified_ops = await self._aplan_architecture_hedged(
+                user_requirement, timings, candidates_task
+            )
 
-        # Stage 1: 针对性向量检索 (P0)
+        # Stage 1: 针对性向量检索 (P0)，无识别结果时使用推测执行的广泛检索
         relevant_operations = []
         try:
-            vector_store = get_vector_store()
-            if identified_ops:
+            if identified_ops and vector_store is not None:
                 print("\n[Stage 1] 针对性向量检索...")
-                relevant_operations = vector_store.search_by_service_operations(identified_ops)
+                relevant_operations = await _timed(
+                    self._avector_lookup(vector_store, "search_by_service_operations",
+                                         self._operation_pairs(identified_ops)),
+                    timings, "targeted_search"
+                )
                 print(f"  ✓ 针对性检索找到 {len(relevant_operations)} 个相关操作")
-            else:
+
+            if not relevant_operations and broad_search_task is not None:
                 print("\n[Stage 1] 广泛向量检索 (fallback)...")
-                relevant_operations = vector_store.search(query=user_requirement, n_results=25)
+                relevant_operations = await broad_search_task
 
             if relevant_operations:
                 for op in relevant_operations[:5]:
@@ -97,50 +471,227 @@ class LLMOrchestrationAgent:
                 print("  ⚠ 向量搜索未找到相关操作")
         except Exception as e:
             print(f"  ⚠ 向量搜索失败: {e}")
+        finally:
+            if broad_search_task is not None and not broad_search_task.done():
+                broad_search_task.cancel()
 
         # P2: 筛选相关参数模板
         filtered_templates = self._filter_templates(identified_ops, relevant_operations)
         if filtered_templates:
             print(f"\n[P2] 匹配到 {len(filtered_templates)} 个参数模板")
 
-        # Step 2: 使用LLM生成工作流 (P3: 两步生成)
-        if self.is_llm_available():
-            print("\n[Step 2] 调用LLM生成工作流...")
-            workflow_dict = self.llm_client.generate_workflow(
-                user_requirement, context,
-                relevant_operations=relevant_operations if relevant_operations else None,
-                parameter_templates=filtered_templates if filtered_templates else None,
-                architecture_plan=architecture_plan
-            )
+        return architecture_plan, relevant_operations, filtered_templates
+
+    @contextmanager
+    def shared_retrieval(self, memo: Optional[Dict[str, asyncio.Task]] = None) -> Iterator[Dict[str, asyncio.Task]]:
+        """
+        共享向量检索作用域：作用域内（含其中创建的任务）参数相同的向量检索只执行一次
+
+        批量生成时各需求在各自的任务中进入同一个 memo 的作用域，
+        模板化需求的广泛检索和针对性检索在整个批次中去重。
+
+        Args:
+            memo: 检索结果表，多个任务传入同一个字典即可共享；默认新建
+
+        Yields:
+            检索结果表
+        """
+        memo = {} if memo is None else memo
+        token = _retrieval_memo.set(memo)
+        try:
+            yield memo
+        finally:
+            _retrieval_memo.reset(token)
+
+    @staticmethod
+    def _operation_pairs(identified_ops: List[Dict]) -> List[Dict[str, str]]:
+        """
+        Stage 0 识别结果中的 (service, operation) 对，去除空白、去重并保持顺序
+
+        reason 等说明文字不参与检索，去掉后相同操作集合的检索参数（及共享检索的键）一致。
+        """
+        pairs = dict.fromkeys(
+            (str(op.get("service") or "").strip(), str(op.get("operation") or "").strip())
+            for op in identified_ops or [] if isinstance(op, dict)
+        )
+        return [{"service": service, "operation": operation} for service, operation in pairs if service and operation]
+
+    async def _avector_lookup(self, vector_store, method: str, *args, **kwargs) -> List[Dict]:
+        """
+        在线程池中执行向量检索；处于 shared_retrieval 作用域时复用相同检索的结果
+
+        调用方传入规范化后的参数（查询文本合并空白，服务+操作对见 _operation_pairs），参数即共享键。
+        """
+        memo = _retrieval_memo.get()
+        if memo is None:
+            return await asyncio.to_thread(getattr(vector_store, method), *args, **kwargs)
+
+        key = json.dumps([method, args, kwargs], ensure_ascii=False, sort_keys=True, default=str)
+        task = memo.get(key)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.to_thread(getattr(vector_store, method), *args, **kwargs))
+            memo[key] = task
+        # shield: 某个需求取消检索（如广泛检索不再需要）时不影响共享该检索的其他需求
+        results = await asyncio.shield(task)
+        return [dict(item) for item in results]
+
+    async def _aselect_candidate_services(self, user_requirement: str,
+                                          broad_search_task: Optional[asyncio.Task]) -> Optional[Dict[str, List[str]]]:
+        """
+        等待广泛检索（最多 agent.stage0_candidate_wait 秒）后选择 Stage 0 候选服务
+
+        检索超时或失败时只按需求中提及的服务选择，不阻塞 Stage 0；检索任务本身不会被取消，
+        Stage 1 仍可使用其结果。
+        """
+        broad_results = []
+        if broad_search_task is not None:
+            wait = float(self.config.get('agent.stage0_candidate_wait', 0.3))
+            try:
+                broad_results = await asyncio.wait_for(asyncio.shield(broad_search_task), timeout=max(wait, 0))
+            except asyncio.TimeoutError:
+                print(f"  ⚠ 广泛检索 {wait} 秒内未完成，候选服务只使用需求中提及的服务")
+            except Exception as e:
+                print(f"  ⚠ 向量搜索失败: {e}")
+        candidate_services = self._select_candidate_services(user_requirement, broad_results)
+        if candidate_services:
+            print(f"  候选服务: {', '.join(candidate_services)}")
+        return candidate_services
+
+    def _select_candidate_services(self, user_requirement: str, search_results: List[Dict]) -> Optional[Dict[str, List[str]]]:
+        """
+        选择 Stage 0 候选服务
+
+        需求中直接提及的服务（服务名/简称/中文名）优先，其次按向量检索最高相似度排序的服务，
+        总数不超过 agent.stage0_max_services；最后补充这些服务的强依赖（如ECS必须部署在VPC中）。
+
+        Args:
+            user_requirement: 用户需求
+            search_results: 广泛向量检索结果
+
+        Returns:
+            候选服务名 -> 检索命中的该服务操作；无法确定时返回None（Stage 0 使用全部服务）
+        """
+        services = self.service_registry.get_all_services()
+        max_services = int(self.config.get('agent.stage0_max_services', 8))
+
+        hits: Dict[str, List[str]] = {}
+        best_similarity: Dict[str, float] = {}
+        for op in search_results or []:
+            name = op.get('service_name')
+            if name in services:
+                hits.setdefault(name, []).append(op.get('operation_name', ''))
+                best_similarity[name] = max(best_similarity.get(name, 0), op.get('similarity', 0))
+
+        candidates = mentioned_services(user_requirement)
+
+        for name in sorted(best_similarity, key=lambda n: -best_similarity[n]):
+            if len(candidates) >= max_services:
+                break
+            if name not in candidates:
+                candidates.append(name)
+
+        if not candidates:
+            return None
+
+        analyzer = get_analyzer()
+        for name in list(candidates):
+            for upstream in analyzer.get_service_dependencies(name).get("depends_on", []):
+                if upstream["type"] == "requires" and upstream["service"] in services \
+                        and upstream["service"] not in candidates:
+                    candidates.append(upstream["service"])
+        return {name: hits.get(name, []) for name in candidates}
+
+    async def _aplan_architecture_hedged(self, user_requirement: str,
+                                         timings: Optional[Dict[str, float]] = None,
+                                         candidates_task: Optional[asyncio.Task] = None) -> Tuple[Optional[Dict], Optional[List[Dict]]]:
+        """
+        生成架构计划，超过对冲延迟后并发启动轻量级操作识别
+
+        Args:
+            user_requirement: 用户需求
+            timings: 可选，写入各阶段耗时（毫秒）
+            candidates_task: 产出 Stage 0 候选服务（服务名 -> 检索命中的操作）的任务，
+                             架构规划与操作识别共用其结果；为None时展开全部服务
+
+        Returns:
+            (架构计划, 识别到的操作列表)；架构计划失败时前者为None，后者来自操作识别
+        """
+        async def candidates() -> Optional[Dict[str, List[str]]]:
+            # shield: 取消其中一个LLM调用不影响另一个共用的候选服务
+            return await asyncio.shield(candidates_task) if candidates_task is not None else None
+
+        async def plan():
+            return await self.llm_client.agenerate_architecture_plan(user_requirement, await candidates())
+
+        async def identify():
+            return await self.llm_client.aidentify_required_operations(user_requirement, await candidates())
+
+        hedge_delay = float(self.config.get('agent.stage0_hedge_delay', 2.0))
+        plan_task = asyncio.create_task(_timed(plan(), timings, "architecture_plan"))
+        identify_task = None
+
+        try:
+            done, _ = await asyncio.wait({plan_task}, timeout=max(hedge_delay, 0))
+            if not done:
+                identify_task = asyncio.create_task(_timed(identify(), timings, "identify_operations"))
+            architecture_plan = await plan_task
+
+            if architecture_plan:
+                identified_ops = architecture_plan.get("services_needed", [])
+                print(f"  ✓ 架构模式: {architecture_plan.get('pattern', 'unknown')}")
+                print(f"  ✓ DFX级别: {architecture_plan.get('dfx_level', 'unknown')}")
+                print(f"  ✓ 识别到 {len(identified_ops)} 个所需操作")
+                return architecture_plan, identified_ops
 
-            if workflow_dict:
-                try:
-                    workflow = self._parse_workflow_from_llm(workflow_dict)
-                    print("\n✓ LLM成功生成工作流")
-                except Exception as e:
-                    print(f"\n✗ 解析LLM生成的工作流失败: {e}")
-                    print("使用备用方案生成...")
-                    workflow = self._generate_with_rules(user_requirement, context)
+            print("  ⚠ 架构计划生成失败，尝试轻量级操作识别...")
+            if identify_task is None:
+                identify_task = asyncio.create_task(_timed(identify(), timings, "identify_operations"))
+            identified_ops = await identify_task
+            if identified_ops:
+                print(f"  ✓ 识别到 {len(identified_ops)} 个所需操作")
             else:
-                print("\n✗ LLM生成失败，使用备用方案...")
-                workflow = self._generate_with_rules(user_requirement, context)
-        else:
-            print("\n⚠ LLM不可用，使用规则引擎生成...")
-            workflow = self._generate_with_rules(user_requirement, context)
-
-        # 2. 验证工作流
-        errors = workflow.validate()
-        if errors:
-            print(f"\n⚠ 工作流验证发现 {len(errors)} 个问题:")
-            for error in errors:
-                print(f"  - {error}")
-        else:
-            print("\n✓ 工作流验证通过")
+                print("  ⚠ 操作识别也失败，将使用广泛搜索")
+            return None, identified_ops
+        finally:
+            for task in (plan_task, identify_task, candidates_task):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def _workflow_from_llm_result(self, workflow_dict: Optional[Dict[str, Any]], user_requirement: str,
+                                  context: Optional[Dict[str, Any]],
+                                  generation: Optional[Dict[str, Any]] = None) -> Workflow:
+        """将LLM生成结果解析为工作流，失败时回退到规则引擎（generation["source"] 记录实际来源）"""
+        generation = generation if generation is not None else {}
+        if workflow_dict:
+            try:
+                workflow = self._parse_workflow_from_llm(workflow_dict)
+                print("\n✓ LLM成功生成工作流")
+                generation["source"] = "llm"
+                return workflow
+            except Exception as e:
+                print(f"\n✗ 解析LLM生成的工作流失败: {e}")
+                print("使用备用方案生成...")
+                generation["source"] = "rules"
+                return self._generate_with_rules(user_requirement, context)
 
-        # 3. 注册表验证 + 自动修正 + LLM重试 (P1)
-        registry_result = self._validate_against_registry(workflow, auto_correct=True)
+        print("\n✗ LLM生成失败，使用备用方案...")
+        generation["source"] = "rules"
+        return self._generate_with_rules(user_requirement, context)
+
+    async def _afinalize_workflow(self, workflow: Workflow, relevant_operations: List[Dict],
+                                  generation: Optional[Dict[str, Any]] = None) -> Workflow:
+        """
+        生成后的验证阶段：注册表验证与静态验证、本地自动修正、LLM修正重试
+
+        generation 不为None时写入 validated：最终工作流是否已无需要修正的问题，
+        以及 warnings：不影响 validated 的提示性问题
+        """
+        # 2-3. 注册表验证 + 静态验证 + 自动修正 + LLM重试 (P1)
+        registry_result = await asyncio.to_thread(self._validate_workflow, workflow)
         auto_corrected = registry_result.get("auto_corrected", [])
         needs_llm_fix = registry_result.get("needs_llm_fix", [])
+        failed_tasks = registry_result.get("failed_tasks", [])
+        warnings = registry_result.get("warnings", [])
 
         if auto_corrected:
             print(f"\n✓ 自动修正了 {len(auto_corrected)} 个问题:")
@@ -148,29 +699,35 @@ class LLMOrchestrationAgent:
                 print(f"  - {ac}")
 
         if needs_llm_fix:
-            print(f"\n⚠ 注册表验证发现 {len(needs_llm_fix)} 个需要修正的问题:")
+            print(f"\n⚠ 工作流验证发现 {len(needs_llm_fix)} 个需要修正的问题:")
             for fix in needs_llm_fix:
                 print(f"  - {fix}")
 
             # P1: 验证重试循环
             if self.is_llm_available():
                 print("\n[P1] 启动验证重试循环...")
-                workflow = self._retry_with_validation_feedback(
+                workflow, needs_llm_fix = await self._retry_with_validation_feedback(
                     workflow, needs_llm_fix,
                     relevant_operations=relevant_operations,
-                    max_retries=2
+                    max_retries=2,
+                    failed_tasks=failed_tasks
                 )
         else:
-            print("\n✓ 注册表验证通过")
+            print("\n✓ 工作流验证通过")
 
-        # 4. 生成解释（如果LLM可用）
-        if self.is_llm_available():
-            explanation = self.explain(workflow)
-            if explanation:
-                print(f"\n工作流说明:\n{explanation[:300]}...")
+        if warnings:
+            print(f"\n⚠ 工作流验证警告 {len(warnings)} 个（不影响生成）:")
+            for warning in warnings:
+                print(f"  - {warning}")
+
+        if generation is not None:
+            generation["validated"] = not needs_llm_fix
+            generation["warnings"] = warnings
 
+        # 解释不在生成路径上计算，见 aexplain / schedule_explanation
         return workflow
 
+
     def _filter_templates(
         self,
         identified_ops: Optional[List[Dict]],
@@ -271,21 +828,63 @@ class LLMOrchestrationAgent:
 
         return task
 
+    def _validate_workflow(self, workflow: Workflow) -> Dict[str, List[str]]:
+        """
+        本地完整验证：先按注册表规范化服务/操作名，再做静态验证
+
+        静态验证（依赖、依赖环、输出引用、必填参数）中可无歧义修正的问题在本地修正，
+        其余问题带精确位置并入 needs_llm_fix，出错任务并入 failed_tasks 以限定补丁范围。
+        提示性问题（如缺少必填参数，可能是参数命名不一致造成的误报）与执行前的验证一致，
+        只放入 warnings，不触发LLM修正。
+
+        Returns:
+            {"auto_corrected": [...], "needs_llm_fix": [...], "failed_tasks": [...], "warnings": [...]}
+        """
+        with trace_span("validate.registry", tasks=len(workflow.tasks)) as span:
+            result = self._validate_against_registry(workflow, auto_correct=True)
+            span.set_attribute("auto_corrected", len(result["auto_corrected"]))
+            span.set_attribute("issues", len(result["needs_llm_fix"]))
+
+        verifier = get_workflow_verifier()
+        with trace_span("validate.static", tasks=len(workflow.tasks)) as span:
+            fixes = verifier.fix(workflow)
+            issues = verifier.verify(workflow)
+            span.set_attribute("auto_corrected", len(fixes))
+            span.set_attribute("issues", len(issues))
+        result["auto_corrected"].extend(fixes)
+        result["warnings"] = []
+        for issue in issues:
+            if issue.code in ADVISORY_ISSUE_CODES:
+                result["warnings"].append(f"{issue.message} [位置: {issue.location}]")
+                continue
+            result["needs_llm_fix"].append(f"{issue.message} [位置: {issue.location}]")
+            if issue.task and issue.task not in result["failed_tasks"]:
+                result["failed_tasks"].append(issue.task)
+        return result
+
     def _validate_against_registry(self, workflow: Workflow, auto_correct: bool = True) -> Dict[str, List[str]]:
         """
         验证工作流中的service+operation是否在注册表中真实存在
 
+        使用预构建的注册表索引查找，未知名称只在最佳候选与其动词一致（或编辑距离不超过1）时自动修正，
+        其余交给LLM修正。服务名无法确定时仍按最可能的候选服务检查操作，一次反馈全部问题。
+
         Args:
             workflow: 待验证的工作流
             auto_correct: 是否自动修正模糊匹配的候选项
 
         Returns:
-            {"auto_corrected": [...], "needs_llm_fix": [...]}
+            {"auto_corrected": [...], "needs_llm_fix": [...], "failed_tasks": [需要LLM修正的任务名]}
         """
         auto_corrected = []
         needs_llm_fix = []
-        all_services = self.service_registry.get_all_services()
-        service_names_lower = {name.lower(): name for name in all_services}
+        failed_tasks = []
+
+        def needs_fix(task: Task, message: str):
+            needs_llm_fix.append(message)
+            if task.name not in failed_tasks:
+                failed_tasks.append(task.name)
+        index = get_registry_index()
 
         for task in workflow.tasks:
             if task.type != TaskType.HUAWEICLOUD_API:
@@ -293,99 +892,97 @@ class LLMOrchestrationAgent:
             if not task.service:
                 continue
 
-            task_service_lower = task.service.lower()
-
-            # 检查服务是否存在
-            if task_service_lower not in service_names_lower:
-                candidates = [
-                    name for name_lower, name in service_names_lower.items()
-                    if task_service_lower in name_lower or name_lower in task_service_lower
-                ]
-                if candidates and auto_correct:
-                    old_service = task.service
-                    task.service = candidates[0]
+            # 检查服务是否存在（精确匹配同时修正大小写）
+            canonical_name = index.services.get(task.service)
+            service_resolved = canonical_name is not None
+            if canonical_name is None:
+                candidates = index.services.candidates(task.service)
+                correction = index.services.correction(task.service) if auto_correct else None
+                if correction is not None:
                     auto_corrected.append(
-                        f"任务 '{task.name}': 服务 '{old_service}' → '{candidates[0]}'"
+                        f"任务 '{task.name}': 服务 '{task.service}' → '{correction}'"
                     )
+                    canonical_name = correction
+                    service_resolved = True
                 elif candidates:
-                    needs_llm_fix.append(
+                    needs_fix(
+                        task,
                         f"任务 '{task.name}': 服务 '{task.service}' 不存在，"
                         f"候选: {', '.join(candidates)}"
                     )
+                    # 操作按最可能的候选服务检查（不修改任务）
+                    canonical_name = candidates[0]
                 else:
-                    needs_llm_fix.append(
+                    needs_fix(
+                        task,
                         f"任务 '{task.name}': 服务 '{task.service}' 在注册表中不存在"
                     )
                     continue
-                # 重新查找canonical name after auto-correct
-                task_service_lower = task.service.lower()
-                if task_service_lower not in service_names_lower:
-                    continue
-
-            # 自动修正大小写
-            canonical_name = service_names_lower[task_service_lower]
-            if task.service != canonical_name:
+            if service_resolved:
                 task.service = canonical_name
 
             # 检查操作是否存在
             if not task.operation:
                 continue
 
-            service_info = all_services[canonical_name]
-            operations = service_info.common_operations
-            operations_lower = {op.lower(): op for op in operations}
-            task_op_lower = task.operation.lower()
-
-            if task_op_lower not in operations_lower:
-                candidates = [
-                    op for op_lower, op in operations_lower.items()
-                    if task_op_lower in op_lower or op_lower in task_op_lower
-                ]
-                if candidates and auto_correct:
-                    old_op = task.operation
-                    task.operation = candidates[0]
-                    auto_corrected.append(
-                        f"任务 '{task.name}': 操作 '{old_op}' → '{candidates[0]}'"
-                    )
-                elif candidates:
-                    needs_llm_fix.append(
-                        f"任务 '{task.name}': 操作 '{task.operation}' "
-                        f"不在服务 '{canonical_name}' 中，"
-                        f"候选: {', '.join(candidates)}"
-                    )
-                else:
-                    needs_llm_fix.append(
-                        f"任务 '{task.name}': 操作 '{task.operation}' "
-                        f"不在服务 '{canonical_name}' 的已知操作列表中"
-                    )
-            else:
-                canonical_op = operations_lower[task_op_lower]
-                if task.operation != canonical_op:
+            operations = index.operation_index(canonical_name)
+            canonical_op = operations.get(task.operation)
+            if canonical_op is not None:
+                if service_resolved:
                     task.operation = canonical_op
+                continue
+
+            candidates = operations.candidates(task.operation)
+            correction = operations.correction(task.operation) if auto_correct and service_resolved else None
+            if correction is not None:
+                old_op = task.operation
+                task.operation = correction
+                auto_corrected.append(
+                    f"任务 '{task.name}': 操作 '{old_op}' → '{correction}'"
+                )
+            elif candidates:
+                needs_fix(
+                    task,
+                    f"任务 '{task.name}': 操作 '{task.operation}' "
+                    f"不在服务 '{canonical_name}' 中，"
+                    f"候选: {', '.join(candidates)}"
+                )
+            else:
+                needs_fix(
+                    task,
+                    f"任务 '{task.name}': 操作 '{task.operation}' "
+                    f"不在服务 '{canonical_name}' 的已知操作列表中"
+                )
 
-        return {"auto_corrected": auto_corrected, "needs_llm_fix": needs_llm_fix}
+        return {"auto_corrected": auto_corrected, "needs_llm_fix": needs_llm_fix, "failed_tasks": failed_tasks}
 
-    def _retry_with_validation_feedback(
+    async def _retry_with_validation_feedback(
         self,
         workflow: Workflow,
         needs_llm_fix: List[str],
         relevant_operations: Optional[List] = None,
-        max_retries: int = 2
-    ) -> Workflow:
+        max_retries: int = 2,
+        failed_tasks: Optional[List[str]] = None
+    ) -> Tuple[Workflow, List[str]]:
         """
         将验证错误反馈给LLM进行修正，最多重试max_retries次
 
+        优先请求只涉及出错任务的 JSON Patch 并在本地应用，其余任务保持不变；
+        补丁无效或越界时回退为完整工作流修正。
+
         Args:
             workflow: 当前工作流
             needs_llm_fix: 需要LLM修正的错误列表
             relevant_operations: 相关API操作
             max_retries: 最大重试次数
+            failed_tasks: 出错的任务名
 
         Returns:
-            修正后的工作流（尽力而为）
+            (修正后的工作流（尽力而为）, 仍未解决的问题)
         """
         best_workflow = workflow
         remaining_errors = needs_llm_fix
+        failed_tasks = failed_tasks or []
 
         for attempt in range(max_retries):
             if not remaining_errors:
@@ -393,11 +990,32 @@ class LLMOrchestrationAgent:
 
             print(f"\n  修正尝试 {attempt + 1}/{max_retries}，待修正问题: {len(remaining_errors)}")
 
-            corrected_dict = self.llm_client.correct_workflow(
-                workflow_dict=best_workflow.to_dict(),
-                validation_errors=remaining_errors,
-                relevant_operations=relevant_operations
-            )
+            workflow_dict = best_workflow.to_dict()
+            corrected_dict = None
+            if failed_tasks:
+                patch = await self.llm_client.acorrect_workflow_patch(
+                    workflow_dict=workflow_dict,
+                    validation_errors=remaining_errors,
+                    failed_tasks=failed_tasks,
+                    relevant_operations=relevant_operations
+                )
+                if patch is not None:
+                    try:
+                        self._check_patch_scope(patch, workflow_dict, failed_tasks)
+                        corrected_dict = apply_patch(workflow_dict, patch)
+                        print(f"  ✓ 应用修正补丁: {len(patch)} 个操作")
+                    except Exception as e:
+                        # 补丁来自LLM输出，任何格式问题都回退为完整修正
+                        print(f"  ⚠ 修正补丁无效: {e}，改为完整修正")
+                else:
+                    print("  ⚠ LLM未返回有效补丁，改为完整修正")
+
+            if corrected_dict is None:
+                corrected_dict = await self.llm_client.acorrect_workflow(
+                    workflow_dict=workflow_dict,
+                    validation_errors=remaining_errors,
+                    relevant_operations=relevant_operations
+                )
 
             if not corrected_dict:
                 print(f"  修正尝试 {attempt + 1} 失败：LLM未返回结果")
@@ -410,8 +1028,9 @@ class LLMOrchestrationAgent:
                 break
 
             # 重新验证
-            result = self._validate_against_registry(corrected_workflow, auto_correct=True)
+            result = await asyncio.to_thread(self._validate_workflow, corrected_workflow)
             remaining_errors = result.get("needs_llm_fix", [])
+            failed_tasks = result.get("failed_tasks", [])
             best_workflow = corrected_workflow
 
             if result.get("auto_corrected"):
@@ -424,7 +1043,44 @@ class LLMOrchestrationAgent:
             else:
                 print(f"  仍有 {len(remaining_errors)} 个问题未解决")
 
-        return best_workflow
+        return best_workflow, remaining_errors
+
+    @staticmethod
+    def _check_patch_scope(patch: List[Dict[str, Any]], workflow_dict: Dict[str, Any], failed_tasks: List[str]):
+        """
+        检查补丁只修改出错的任务
+
+        逐个操作模拟应用补丁，每个路径按该操作执行前的工作流定位到任务名，
+        前面的 add/remove 造成的下标变化因此会被正确跟踪。新增整个任务也视为越界。
+
+        Raises:
+            JsonPatchError: 补丁格式错误、无法应用，或修改了出错任务之外的路径
+        """
+        if not isinstance(patch, list):
+            raise JsonPatchError("补丁必须是操作数组")
+
+        current = workflow_dict
+        for operation in patch:
+            if not isinstance(operation, dict):
+                raise JsonPatchError(f"无效的补丁操作: {operation}")
+            paths = [operation.get('path')]
+            if operation.get('op') == 'move':
+                paths.append(operation.get('from'))
+            for path in paths:
+                if not isinstance(path, str):
+                    raise JsonPatchError(f"无效的补丁路径: {path!r}")
+                parts = parse_pointer(path)
+                tasks = current.get('tasks') if isinstance(current, dict) else None
+                in_scope = (
+                    len(parts) >= 2 and parts[0] == 'tasks' and isinstance(tasks, list)
+                    and parts[1].isdigit() and int(parts[1]) < len(tasks)
+                    and isinstance(tasks[int(parts[1])], dict)
+                    and tasks[int(parts[1])].get('name') in failed_tasks
+                    and not (len(parts) == 2 and operation.get('op') == 'add')
+                )
+                if not in_scope:
+                    raise JsonPatchError(f"补丁路径 {path} 不属于出错的任务")
+            current = apply_patch(current, [operation])
 
     def _generate_with_rules(self, requirement: str, context: Optional[Dict[str, Any]]) -> Workflow:
         """
@@ -439,39 +1095,11 @@ class LLMOrchestrationAgent:
         """
         print("  \n使用规则引擎生成...")
 
-        # 简单的模式匹配
-        requirement_lower = requirement.lower()
-
-        # 高可用/负载均衡场景优先匹配（含完整网络+安全+ELB+EIP）
-        if any(word in requirement_lower for word in ['高可用', '负载均衡', 'elb', 'load balanc', 'ha ']):
-            return self._create_ha_web_workflow(requirement)
-
-        if 'web' in requirement_lower or '网站' in requirement_lower or '应用' in requirement_lower:
-            return self._create_web_application_workflow(requirement)
-
-        if any(word in requirement_lower for word in ['容器', 'cce', 'kubernetes', 'k8s']):
-            return self._create_cce_workflow(requirement)
-
-        if any(word in requirement_lower for word in ['存储', 'obs', '桶', 'bucket']):
-            return self._create_obs_workflow(requirement)
-
-        if any(word in requirement_lower for word in ['安全', 'waf', '防火墙', '防护']):
-            return self._create_security_workflow(requirement)
-
-        if any(word in requirement_lower for word in ['监控', '告警', 'ces']):
-            return self._create_monitoring_workflow(requirement)
-
-        if any(word in requirement_lower for word in ['gaussdb', '高斯']):
-            return self._create_gaussdb_workflow(requirement)
-
-        if 'ecs' in requirement_lower or '服务器' in requirement_lower:
-            return self._create_ecs_workflow(requirement)
-
-        if 'vpc' in requirement_lower or '网络' in requirement_lower:
-            return self._create_vpc_workflow(requirement)
-
-        if any(word in requirement_lower for word in ['rds', '数据库', 'mysql', 'postgresql']):
-            return self._create_rds_workflow(requirement)
+        # 关键词匹配，按 RULE_PATTERNS 的优先级取第一个命中的模板
+        # （高可用/负载均衡场景优先匹配，含完整网络+安全+ELB+EIP）
+        labels = keyword_labels(requirement)
+        if labels:
+            return getattr(self, RULE_PATTERNS[labels[0]][0])(requirement)
 
         # 默认空工作流
         return self._create_default_workflow()
@@ -488,7 +1116,7 @@ class LLMOrchestrationAgent:
                 "vpc_cidr": config.get("vpc_cidr", "192.168.0.0/16"),
                 "subnet_name": config.get("subnet_name", "web-app-subnet"),
                 "subnet_cidr": config.get("subnet_cidr", "192.168.1.0/24"),
-                "ecs_name": config.get("ecs_name", "web-server"),
+                "ecs_name": config.get("ecs_name", config.get("name", "web-server")),
                 "ecs_flavor": config.get("flavor", "s6.large.2"),
                 "image_id": config.get("image", "CentOS 7.9"),
             },
@@ -572,7 +1200,7 @@ class LLMOrchestrationAgent:
         workflow = Workflow(
             name="创建ECS实例",
             variables={
-                "ecs_name": config.get("name", "my-server"),
+                "ecs_name": config.get("ecs_name", config.get("name", "my-server")),
                 "ecs_flavor": config.get("flavor", "s6.large.2"),
                 "vpc_id": config.get("vpc_id", "default-vpc"),
                 "subnet_id": config.get("subnet_id", "default-subnet"),
@@ -606,9 +1234,9 @@ class LLMOrchestrationAgent:
         workflow = Workflow(
             name="创建VPC网络",
             variables={
-                "vpc_name": config.get("name", "my-vpc"),
+                "vpc_name": config.get("vpc_name", config.get("name", "my-vpc")),
                 "vpc_cidr": config.get("cidr", "192.168.0.0/16"),
-                "subnet_name": config.get("subnet", "my-subnet"),
+                "subnet_name": config.get("subnet_name", "my-subnet"),
                 "subnet_cidr": config.get("subnet_cidr", "192.168.1.0/24")
             },
             status=WorkflowStatus.READY
@@ -653,7 +1281,7 @@ class LLMOrchestrationAgent:
         workflow = Workflow(
             name=f"创建{db_type}数据库实例",
             variables={
-                "db_name": config.get("name", "my-database"),
+                "db_name": config.get("db_name", config.get("name", "my-database")),
                 "db_type": db_type,
                 "vpc_id": config.get("vpc_id", "default-vpc"),
                 "subnet_id": config.get("subnet_id", "default-subnet")
@@ -1246,7 +1874,7 @@ class LLMOrchestrationAgent:
             name="创建GaussDB数据库实例",
             description="创建华为云GaussDB数据库实例",
             variables={
-                "db_name": config.get("name", "my-gaussdb"),
+                "db_name": config.get("db_name", config.get("name", "my-gaussdb")),
                 "vpc_id": config.get("vpc_id", "default-vpc"),
                 "subnet_id": config.get("subnet_id", "default-subnet"),
             },
@@ -1282,39 +1910,139 @@ class LLMOrchestrationAgent:
         )
 
     def _parse_configuration(self, requirement: str) -> Dict[str, Any]:
-        """从需求文本中提取配置参数"""
-        import re
+        """
+        从需求文本中提取配置参数（供规则模板填充变量）
+
+        资源限定的名称（VPC/子网/数据库/服务器名称）先于通用名称匹配，已匹配的片段不再参与通用匹配；
+        CIDR 按前文是否提到子网区分 vpc_cidr 和 subnet_cidr（cidr 同 vpc_cidr）。
+        """
         config = {}
-        patterns = [
-            (r'(?:名称|name)[\s:：]\s*(\w+)', 'name'),
-            (r'(?:规格|flavor)[\s:：]\s*([\w\.]+)', 'flavor'),
-            (r'(?:vpc|VPC)[\s:：]?\s*(\w+)', 'vpc_id'),
-            (r'(?:子网|subnet)[\s:：]?\s*(\w+)', 'subnet_id'),
-            (r'(?:CIDR|cidr)[\s:：]?\s*([\d\./]+)', 'cidr'),
-        ]
-
-        for pattern, key in patterns:
-            match = re.search(pattern, requirement, re.IGNORECASE)
+        text = requirement
+        for key, pattern in _CONFIG_PATTERNS:
+            if key in config:
+                continue
+            match = re.search(pattern, text, re.IGNORECASE)
             if match:
                 config[key] = match.group(1).strip()
+                if key in _QUALIFIED_NAME_KEYS:
+                    text = text[:match.start()] + " " * (match.end() - match.start()) + text[match.end():]
+
+        for match in _CIDR_PATTERN.finditer(requirement):
+            prefix = requirement[max(0, match.start() - 12):match.start()].lower()
+            if ("子网" in prefix or "subnet" in prefix) and "subnet_cidr" not in config:
+                config["subnet_cidr"] = match.group(1)
+            elif "vpc_cidr" not in config:
+                config["vpc_cidr"] = config["cidr"] = match.group(1)
+            elif "subnet_cidr" not in config:
+                config["subnet_cidr"] = match.group(1)
 
         return config
 
-    def explain(self, workflow: Workflow) -> Optional[str]:
+    def explain(self, workflow: Workflow, record_id: Optional[str] = None) -> Optional[str]:
         """
-        解释工作流
+        解释工作流（按工作流内容哈希缓存）
 
         Args:
             workflow: 工作流对象
+            record_id: 可选，workflow_records 记录ID，生成的解释会保存到该记录
+
+        Returns:
+            解释文本
+        """
+        return run_sync(self.aexplain(workflow, record_id))
+
+    async def aexplain(self, workflow: Workflow, record_id: Optional[str] = None) -> Optional[str]:
+        """explain 的异步版本"""
+        return await self.aexplain_dict(workflow.to_dict(), record_id)
+
+    async def aexplain_dict(self, workflow_dict: Dict[str, Any], record_id: Optional[str] = None) -> Optional[str]:
+        """
+        解释工作流字典
+
+        依次查找内存缓存、数据库中相同内容哈希的解释，都未命中时调用LLM生成；
+        同一工作流的并发请求共享同一次LLM调用。
+
+        Args:
+            workflow_dict: 工作流字典（Workflow.to_dict() 或历史记录中的 workflow_json）
+            record_id: 可选，workflow_records 记录ID，生成的解释会保存到该记录
 
         Returns:
             解释文本
         """
         if not self.is_llm_available():
-            return self._manual_explain(workflow)
+            return self._manual_explain(self._parse_workflow_from_llm(workflow_dict))
 
-        workflow_dict = workflow.to_dict()
-        return self.llm_client.explain_workflow(workflow_dict)
+        content_hash = workflow_content_hash(workflow_dict)
+        explanation = self._cached_explanation(content_hash)
+        if explanation is None:
+            try:
+                explanation = await asyncio.to_thread(find_explanation_by_hash, content_hash)
+            except Exception as e:
+                self.logger.warning(f"查询已保存的工作流解释失败: {e}")
+            if explanation:
+                self._remember_explanation(content_hash, explanation)
+
+        if explanation is None:
+            loop = asyncio.get_running_loop()
+            task = self._explanation_tasks.get(content_hash)
+            if task is None or task.get_loop() is not loop:
+                task = loop.create_task(self.llm_client.aexplain_workflow(workflow_dict))
+                self._explanation_tasks[content_hash] = task
+                task.add_done_callback(
+                    lambda t: self._explanation_tasks.pop(content_hash, None)
+                    if self._explanation_tasks.get(content_hash) is t else None
+                )
+            explanation = await asyncio.shield(task)
+            if not explanation:
+                return explanation
+            self._remember_explanation(content_hash, explanation)
+
+        if record_id:
+            try:
+                await asyncio.to_thread(save_workflow_explanation, record_id, content_hash, explanation)
+            except Exception as e:
+                self.logger.warning(f"保存工作流解释失败 ({record_id}): {e}")
+        return explanation
+
+    def schedule_explanation(self, workflow: Workflow, record_id: Optional[str] = None) -> Optional[asyncio.Task]:
+        """
+        在后台生成工作流解释（不阻塞当前请求），需在事件循环中调用
+
+        Args:
+            workflow: 工作流对象
+            record_id: 可选，workflow_records 记录ID，生成的解释会保存到该记录
+
+        Returns:
+            后台任务；未开启 agent.background_explanation 或LLM不可用时返回None
+        """
+        if not self.config.get('agent.background_explanation', True) or not self.is_llm_available():
+            return None
+
+        async def run():
+            try:
+                await self.aexplain(workflow, record_id)
+            except Exception as e:
+                self.logger.warning(f"后台生成工作流解释失败: {e}")
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def _cached_explanation(self, content_hash: str) -> Optional[str]:
+        with self._explanation_lock:
+            explanation = self._explanation_cache.get(content_hash)
+            if explanation is not None:
+                self._explanation_cache.move_to_end(content_hash)
+            return explanation
+
+    def _remember_explanation(self, content_hash: str, explanation: str):
+        max_entries = int(self.config.get('agent.explanation_cache_size', 256))
+        with self._explanation_lock:
+            self._explanation_cache[content_hash] = explanation
+            self._explanation_cache.move_to_end(content_hash)
+            while len(self._explanation_cache) > max(max_entries, 1):
+                self._explanation_cache.popitem(last=False)
 
     def _manual_explain(self, workflow: Workflow) -> str:
         """手动生成工作流解释"""
@@ -3,19 +3,23 @@
 基于FastAPI的现代Web应用
 """
 
+import asyncio
+import json
 import os
 import secrets
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Optional
 from fastapi import FastAPI, Request, Form, HTTPException, Depends
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
 import uvicorn
 
-from models.workflow import Workflow, Task, TaskStatus, WorkflowStatus
+from models.workflow import Workflow, Task, TaskStatus, WorkflowStatus, workflow_content_hash
 from services.workflow_engine import WorkflowEngine
+from services.workflow_verifier import ADVISORY_ISSUE_CODES, get_workflow_verifier
 from services import huawei_cloud_service_registry
 from agents.llm_orchestration_agent import LLMOrchestrationAgent
 from utils.database import init_db, save_workflow_record, list_workflow_records, get_workflow_record, delete_workflow_record
@@ -26,6 +30,8 @@ from utils.auth import init_default_user, authenticate, get_current_user, AuthMi
 from utils.graph_store import get_graph_store
 from services.service_dependency_analyzer import get_analyzer
 from utils.modelarts_knowledge_store import get_modelarts_store
+from utils.generation_cache import get_generation_cache
+from utils.tracing import get_tracer, to_otlp, TracingMiddleware
 
 # 初始化配置
 config = get_config()
@@ -87,6 +93,7 @@ async def lifespan(app: FastAPI):
 
     # 关闭时清理
     logger.info("系统正在关闭...")
+    await agent.llm_client.aclose()
 
 # 初始化应用
 app = FastAPI(
@@ -96,10 +103,11 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# 中间件（注意：后添加的在外层，SessionMiddleware 必须在 AuthMiddleware 外层）
+# 中间件（注意：后添加的在外层，SessionMiddleware 必须在 AuthMiddleware 外层，追踪在最外层以覆盖完整耗时）
 app.add_middleware(AuthMiddleware)
 SESSION_SECRET = os.environ.get("SESSION_SECRET", secrets.token_hex(32))
 app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET, max_age=86400)
+app.add_middleware(TracingMiddleware)
 
 # 初始化目录
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -235,14 +243,31 @@ async def generate_workflow(requirement: str = Form(...)):
         if not agent.is_llm_available():
             logger.warning("LLM不可用，使用规则引擎生成")
 
-        # 生成工作流
-        workflow = agent.plan(requirement)
+        # 生成工作流（优先复用语义缓存）
+        timings = {}
+        generation = {}
+        workflow, cached_record_id = await agent.aplan_cached(requirement, timings=timings, generation=generation)
+        workflow_dict = workflow.to_dict()
+
+        # 保存到数据库并登记语义缓存（缓存命中时复用原记录）
+        record_id = cached_record_id
+        if record_id is None:
+            try:
+                record_id = save_workflow_record(requirement, workflow_dict)
+                logger.info(f"工作流已保存到数据库, record_id={record_id}")
+                agent.cache_generated_workflow(requirement, record_id, generation=generation)
+            except Exception as save_err:
+                logger.warning(f"保存工作流记录失败: {save_err}")
+                record_id = None
 
         response = {
             "success": True,
-            "data": workflow.to_dict(),
+            "data": workflow_dict,
             "message": "工作流生成成功",
-            "llm_used": agent.is_llm_available()
+            "llm_used": agent.is_llm_available() and not cached_record_id,
+            "record_id": record_id,
+            "cache_hit": cached_record_id is not None,
+            "timings": timings
         }
 
         return JSONResponse(response)
@@ -325,14 +350,8 @@ async def list_services():
     try:
         vector_store = get_vector_store()
 
-        # 从向量数据库获取所有操作
-        all_operations = vector_store.get_all_operations()
-
-        # 按服务分组统计操作数
-        ops_count = {}
-        for op in all_operations:
-            svc = op["service_name"]
-            ops_count[svc] = ops_count.get(svc, 0) + 1
+        # 向量数据库中各服务的操作数（缓存的元数据统计）
+        ops_count = vector_store.get_service_counts()
 
         # 基于注册表构建服务列表，用向量数据库的操作数
         services = []
@@ -589,13 +608,15 @@ async def auto_generate_workflow(data: dict):
         data: {
             requirement: str,           # 自然语言需求
             auto_execute: bool,         # 是否自动执行
-            generate_explanation: bool  # 是否生成解释
+            generate_explanation: bool  # 是否同步生成解释；否则在后台生成，
+                                        # 通过 /api/workflows/history/{record_id}/explanation 获取
         }
 
     Returns:
         {
             success: bool,
             workflow: dict,
+            timings: dict,              # 各阶段耗时（毫秒）
             explanation: str (可选),
             execution: dict (可选)
         }
@@ -613,8 +634,10 @@ async def auto_generate_workflow(data: dict):
 
         logger.info(f"AI自动生成工作流: {requirement}")
 
-        # 使用Agent生成工作流
-        workflow = agent.plan(requirement)
+        # 使用Agent生成工作流（优先复用语义缓存）
+        timings = {}
+        generation = {}
+        workflow, cached_record_id = await agent.aplan_cached(requirement, timings=timings, generation=generation)
 
         if not workflow:
             return JSONResponse({
@@ -624,25 +647,32 @@ async def auto_generate_workflow(data: dict):
 
         workflow_dict = workflow.to_dict()
 
-        # 保存到数据库
-        try:
-            record_id = save_workflow_record(requirement, workflow_dict)
-            logger.info(f"工作流已保存到数据库, record_id={record_id}")
-        except Exception as save_err:
-            logger.warning(f"保存工作流记录失败: {save_err}")
-            record_id = None
+        # 保存到数据库（缓存命中时复用原记录）
+        record_id = cached_record_id
+        if record_id is None:
+            try:
+                record_id = save_workflow_record(requirement, workflow_dict)
+                logger.info(f"工作流已保存到数据库, record_id={record_id}")
+                agent.cache_generated_workflow(requirement, record_id, generation=generation)
+            except Exception as save_err:
+                logger.warning(f"保存工作流记录失败: {save_err}")
+                record_id = None
 
         result = {
             "success": True,
             "workflow": workflow_dict,
             "record_id": record_id,
+            "cache_hit": cached_record_id is not None,
+            "timings": timings,
         }
 
-        # 生成解释
+        # 生成解释（已缓存时直接返回，否则未请求时在后台生成）
         if generate_explanation:
-            explanation = agent.explain(workflow)
+            explanation = await agent.aexplain(workflow, record_id)
             if explanation:
                 result["explanation"] = explanation
+        elif record_id:
+            agent.schedule_explanation(workflow, record_id)
 
         # 自动执行
         if auto_execute:
@@ -661,6 +691,168 @@ async def auto_generate_workflow(data: dict):
         }, status_code=500)
 
 
+def _sse_event(event: str, data: dict) -> str:
+    """编码一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/auto/generate/stream")
+async def auto_generate_workflow_stream(data: dict):
+    """
+    AI自动生成工作流（流式）
+
+    以 Server-Sent Events 推送生成进度，LLM输出中每个完整的任务一经解析即推送，
+    前端无需等待整个工作流生成完毕即可开始渲染。
+
+    Args:
+        data: 同 /api/auto/generate
+
+    Returns:
+        text/event-stream，事件类型:
+            stage:       {stage, message}            阶段进度
+            task:        {index, task}               新解析出的任务（未经验证）
+            workflow:    {workflow, record_id, cache_hit, truncated, timings}  验证后的最终工作流
+            explanation: {explanation}               工作流解释（可选）
+            execution:   {execution}                 执行结果（可选）
+            error:       {error}                     生成失败
+            done:        {}                          结束
+    """
+    requirement = data.get('requirement', '')
+    auto_execute = data.get('auto_execute', False)
+    generate_explanation = data.get('generate_explanation', False)
+
+    if not requirement:
+        return JSONResponse({
+            "success": False,
+            "error": "需求不能为空"
+        }, status_code=400)
+
+    logger.info(f"AI自动生成工作流(流式): {requirement}")
+
+    async def event_stream():
+        workflow = None
+        try:
+            async for event in agent.aplan_stream(requirement):
+                event_type = event.pop("type")
+                if event_type != "workflow":
+                    yield _sse_event(event_type, event)
+                    continue
+
+                workflow = event["workflow"]
+                workflow_dict = workflow.to_dict()
+                record_id = event["record_id"]
+                if record_id is None:
+                    try:
+                        record_id = save_workflow_record(requirement, workflow_dict)
+                        logger.info(f"工作流已保存到数据库, record_id={record_id}")
+                        agent.cache_generated_workflow(requirement, record_id, generation=event["generation"])
+                    except Exception as save_err:
+                        logger.warning(f"保存工作流记录失败: {save_err}")
+                        record_id = None
+
+                yield _sse_event("workflow", {
+                    "workflow": workflow_dict,
+                    "record_id": record_id,
+                    "cache_hit": event["cache_hit"],
+                    "truncated": event["truncated"],
+                    "timings": event["timings"],
+                })
+
+            if workflow is None:
+                yield _sse_event("error", {"error": "无法生成工作流"})
+                return
+
+            if generate_explanation:
+                explanation = await agent.aexplain(workflow, record_id)
+                if explanation:
+                    yield _sse_event("explanation", {"explanation": explanation})
+            elif record_id:
+                agent.schedule_explanation(workflow, record_id)
+
+            if auto_execute:
+                logger.info("自动执行工作流...")
+                execution_result = await workflow_engine.execute(workflow)
+                yield _sse_event("execution", {"execution": execution_result})
+
+            yield _sse_event("done", {})
+
+        except Exception as e:
+            logger.error(f"流式生成工作流失败: {str(e)}", exc_info=True)
+            yield _sse_event("error", {"error": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/cache/generation/stats")
+async def get_generation_cache_stats():
+    """获取工作流生成语义缓存的命中统计"""
+    try:
+        return JSONResponse({"success": True, "data": get_generation_cache().get_stats()})
+    except Exception as e:
+        logger.error(f"获取生成缓存统计失败: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+@app.post("/api/cache/generation/invalidate")
+async def invalidate_generation_cache():
+    """清空工作流生成语义缓存"""
+    try:
+        ok = get_generation_cache().invalidate()
+        return JSONResponse({"success": ok, "message": "生成缓存已清空" if ok else "清空失败"})
+    except Exception as e:
+        logger.error(f"清空生成缓存失败: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+@app.get("/api/debug/llm/responses")
+async def get_llm_debug_captures():
+    """获取采样记录的原始LLM响应（解析失败的响应总是被记录）"""
+    return JSONResponse({"success": True, "data": agent.llm_client.get_debug_captures()})
+
+
+@app.get("/api/llm/endpoints")
+async def get_llm_endpoint_stats():
+    """获取各LLM端点的路由统计（EWMA延迟、错误率、健康状态）"""
+    return JSONResponse({"success": True, "data": agent.llm_client.get_routing_stats()})
+
+
+# ===== 生成链路追踪 =====
+
+@app.get("/api/admin/traces")
+async def list_traces(limit: int = 50, name: Optional[str] = None):
+    """最近的追踪列表（可按包含的span名称过滤，如 llm.call）"""
+    return JSONResponse({"success": True, "data": get_tracer().list_traces(limit=limit, name=name)})
+
+
+@app.get("/api/admin/traces/summary")
+async def summarize_traces():
+    """按span名称汇总耗时分布和token数"""
+    return JSONResponse({"success": True, "data": get_tracer().summarize()})
+
+
+@app.get("/api/admin/traces/{trace_id}")
+async def get_trace(trace_id: str, format: str = "json"):
+    """获取一个追踪的全部span（format=otlp 时返回 OTLP/JSON）"""
+    spans = get_tracer().get_spans(trace_id)
+    if not spans:
+        return JSONResponse({"success": False, "error": f"追踪不存在: {trace_id}"}, status_code=404)
+    if format == "otlp":
+        return JSONResponse(to_otlp(spans))
+    spans.sort(key=lambda span: span.start_ns)
+    return JSONResponse({"success": True, "data": [span.to_dict() for span in spans]})
+
+
+@app.delete("/api/admin/traces")
+async def clear_traces():
+    """清空内存中的追踪数据"""
+    get_tracer().clear()
+    return JSONResponse({"success": True})
+
+
 # ===== 工作流历史记录 =====
 
 @app.get("/history", response_class=HTMLResponse)
@@ -700,6 +892,27 @@ async def api_get_workflow_record(record_id: str):
         return JSONResponse({"success": False, "error": str(e)}, status_code=500)
 
 
+@app.get("/api/workflows/history/{record_id}/explanation")
+async def api_get_workflow_explanation(record_id: str):
+    """获取工作流记录的解释（未生成时按需生成并保存）"""
+    try:
+        record = get_workflow_record(record_id)
+        if not record:
+            return JSONResponse({"success": False, "error": "记录不存在"}, status_code=404)
+
+        workflow_dict = record["workflow_json"]
+        if record.get("explanation") and record.get("explanation_hash") == workflow_content_hash(workflow_dict):
+            return JSONResponse({"success": True, "explanation": record["explanation"], "cached": True})
+
+        explanation = await agent.aexplain_dict(workflow_dict, record_id)
+        if not explanation:
+            return JSONResponse({"success": False, "error": "无法生成解释"}, status_code=500)
+        return JSONResponse({"success": True, "explanation": explanation, "cached": False})
+    except Exception as e:
+        logger.error(f"获取工作流解释失败: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
 @app.delete("/api/workflows/history/{record_id}")
 async def api_delete_workflow_record(record_id: str):
     """删除工作流记录"""
@@ -707,6 +920,7 @@ async def api_delete_workflow_record(record_id: str):
         ok = delete_workflow_record(record_id)
         if not ok:
             return JSONResponse({"success": False, "error": "记录不存在"}, status_code=404)
+        get_generation_cache().remove(record_id)
         return JSONResponse({"success": True, "message": "已删除"})
     except Exception as e:
         logger.error(f"删除工作流记录失败: {e}")
@@ -725,14 +939,18 @@ async def validate_workflow(workflow_data: dict):
         验证结果
     """
     try:
-        workflow = Workflow.from_dict(workflow_data)
-        errors = workflow.validate()
+        issues = await asyncio.to_thread(get_workflow_verifier().verify_dict, workflow_data)
+        # 与执行前的验证一致：提示性问题（如缺少必填参数）不影响 valid
+        warnings = [issue for issue in issues if issue.code in ADVISORY_ISSUE_CODES]
+        issues = [issue for issue in issues if issue.code not in ADVISORY_ISSUE_CODES]
 
         return JSONResponse({
             "success": True,
             "data": {
-                "valid": len(errors) == 0,
-                "errors": errors
+                "valid": len(issues) == 0,
+                "errors": [issue.message for issue in issues],
+                "issues": [issue.to_dict() for issue in issues],
+                "warnings": [warning.to_dict() for warning in warnings]
             }
         })
 
@@ -1097,6 +1315,9 @@ async def update_prompt_settings(data: dict):
         config.save()
         config.reload()
 
+        # 提示词变化后，旧版本提示词生成的缓存条目不再有效
+        get_generation_cache().invalidate(prompt_version=agent.llm_client.prompt_version())
+
         logger.info("Prompt模板配置已更新")
         return JSONResponse({
             "success": True,
@@ -1,3 +1,5 @@
+import hashlib
+import json
 from enum import Enum
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, asdict, field
@@ -91,6 +93,28 @@ class Workflow:
         data['tasks'] = [task.to_dict() for task in self.tasks]
         return data
 
+    def content_hash(self) -> str:
+        return workflow_content_hash(self.to_dict())
+
+
+# 参与内容哈希的字段（不含ID、状态、执行结果等易变字段）
+_WORKFLOW_CONTENT_FIELDS = ("name", "description", "version", "trigger", "variables")
+_TASK_CONTENT_FIELDS = (
+    "name", "type", "description", "service", "operation",
+    "parameters", "depends_on", "condition", "retry_policy", "timeout",
+)
+
+
+def workflow_content_hash(workflow_dict: Dict[str, Any]) -> str:
+    """工作流内容哈希：定义相同的工作流（忽略ID和执行状态）哈希相同"""
+    content = {key: workflow_dict.get(key) for key in _WORKFLOW_CONTENT_FIELDS}
+    content["tasks"] = [
+        {key: task.get(key) for key in _TASK_CONTENT_FIELDS}
+        for task in workflow_dict.get("tasks", [])
+    ]
+    payload = json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 
 # 参数模板
 PARAMETER_TEMPLATES = {
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+工作流生成流程基准测试
+在进程内启动LLM模拟服务（scripts/mock_llm_server.py），用一组需求依次执行
+LLMOrchestrationAgent.plan，统计各阶段耗时、各阶段提示词大小、JSON修复率和修正重试次数
+
+使用示例:
+    # 内置需求集，合成响应，首字延迟0.5秒
+    python scripts/benchmark_generation.py
+
+    # 回放录制的响应，需求集每行一个需求（.txt）或 {"requirement": ...}（.jsonl）
+    python scripts/benchmark_generation.py --corpus data/requirements.txt \\
+        --recordings data/llm_recordings.jsonl --latency 0.8 --tokens-per-second 40 --output report.json
+"""
+
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.mock_llm_server import start_in_thread
+from utils.config_manager import get_config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CORPUS = [
+    "创建一个VPC和子网，在子网中部署一台ECS云服务器",
+    "部署一个Web应用，包含ECS、RDS MySQL数据库和弹性公网IP",
+    "创建一个OBS桶用于存储静态网站文件",
+    "搭建高可用架构：两台ECS挂载到ELB负载均衡，后端使用RDS主备",
+    "创建CCE集群并添加一个节点池",
+]
+
+CORRECTION_STAGES = ("correct", "correct_patch")
+
+
+def load_corpus(path: str) -> List[str]:
+    """加载需求集：.jsonl 每行 {"requirement": ...}，其他格式每行一个需求"""
+    requirements = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                requirements.append(json.loads(line)["requirement"])
+            else:
+                requirements.append(line)
+    return requirements
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "mean": round(statistics.mean(values), 1) if values else 0.0,
+        "p50": round(_percentile(values, 0.5), 1),
+        "p95": round(_percentile(values, 0.95), 1),
+        "max": round(max(values), 1) if values else 0.0,
+    }
+
+
+def run_benchmark(requirements: List[str], repeat: int = 1, **mock_options) -> Dict[str, Any]:
+    """
+    执行基准测试
+
+    Args:
+        requirements: 需求列表
+        repeat: 每个需求重复执行的次数
+        **mock_options: 传给模拟服务（recordings, latency, jitter, tokens_per_second）
+
+    Returns:
+        基准报告 {"runs": [...], "summary": {...}}
+    """
+    server = start_in_thread(**mock_options)
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    # 只在内存中覆盖配置（不保存），使客户端指向模拟服务并记录全部原始响应
+    config = get_config()
+    config.set('llm.provider', 'custom')
+    config.set('llm.endpoint', endpoint)
+    config.set('llm.api_key', 'mock')
+    config.set('llm.endpoints', [])
+    config.set('llm.debug_capture_rate', 1.0)
+    config.set('llm.debug_capture_size', 100000)
+
+    from agents.llm_orchestration_agent import LLMOrchestrationAgent
+    from services.llm_client import LLMClient
+    agent = LLMOrchestrationAgent()
+    logger.info(f"模拟服务: {endpoint}，需求 {len(requirements)} 个 × {repeat} 次")
+
+    runs = []
+    for round_index in range(repeat):
+        for requirement in requirements:
+            server.state.drain()
+            captured_before = len(LLMClient.get_debug_captures())
+            timings: Dict[str, float] = {}
+            error = None
+            started = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    workflow = agent.plan(requirement, timings=timings)
+                task_count = len(workflow.tasks)
+            except Exception as e:
+                error = str(e)
+                task_count = 0
+            wall_ms = round((time.perf_counter() - started) * 1000, 1)
+
+            requests = server.state.drain()
+            captures = LLMClient.get_debug_captures()[captured_before:]
+            prompt_tokens: Dict[str, int] = {}
+            for request in requests:
+                prompt_tokens[request["stage"]] = prompt_tokens.get(request["stage"], 0) + request["prompt_tokens"]
+
+            run = {
+                "round": round_index + 1,
+                "requirement": requirement,
+                "wall_ms": wall_ms,
+                "timings": timings,
+                "task_count": task_count,
+                "llm_calls": len(requests),
+                "prompt_tokens": prompt_tokens,
+                "parsed_responses": len(captures),
+                "repaired_responses": sum(1 for capture in captures if capture["repairs"]),
+                "failed_parses": sum(1 for capture in captures if capture["failed"]),
+                "retries": sum(1 for request in requests if request["stage"] in CORRECTION_STAGES),
+                "error": error,
+            }
+            runs.append(run)
+            print(f"  [{len(runs)}] {wall_ms:8.1f}ms  任务 {task_count:2d}  LLM调用 {run['llm_calls']}  "
+                  f"重试 {run['retries']}  修复 {run['repaired_responses']}/{run['parsed_responses']}  "
+                  f"{requirement[:30]}")
+
+    server.shutdown()
+    return {"runs": runs, "summary": summarize_runs(runs)}
+
+
+def summarize_runs(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """汇总各阶段耗时分布、平均提示词大小、修复率和重试次数"""
+    stages = sorted({stage for run in runs for stage in run["timings"]})
+    prompt_stages = sorted({stage for run in runs for stage in run["prompt_tokens"]})
+    parsed = sum(run["parsed_responses"] for run in runs)
+    return {
+        "runs": len(runs),
+        "errors": sum(1 for run in runs if run["error"]),
+        "wall_ms": _summarize([run["wall_ms"] for run in runs]),
+        "stage_ms": {
+            stage: _summarize([run["timings"][stage] for run in runs if stage in run["timings"]])
+            for stage in stages
+        },
+        "prompt_tokens": {
+            stage: round(statistics.mean(run["prompt_tokens"].get(stage, 0) for run in runs))
+            for stage in prompt_stages
+        },
+        "repair_rate": round(sum(run["repaired_responses"] for run in runs) / parsed, 3) if parsed else 0.0,
+        "parse_failure_rate": round(sum(run["failed_parses"] for run in runs) / parsed, 3) if parsed else 0.0,
+        "retries": {
+            "total": sum(run["retries"] for run in runs),
+            "runs_with_retry": sum(1 for run in runs if run["retries"]),
+        },
+    }
+
+
+def print_summary(summary: Dict[str, Any]):
+    print("=" * 72)
+    print(f"运行次数: {summary['runs']}  失败: {summary['errors']}")
+    wall = summary["wall_ms"]
+    print(f"总耗时(ms): mean {wall['mean']}  p50 {wall['p50']}  p95 {wall['p95']}  max {wall['max']}")
+    print("-" * 72)
+    print(f"{'阶段':<20s}{'mean':>10s}{'p50':>10s}{'p95':>10s}{'max':>10s}")
+    for stage, values in summary["stage_ms"].items():
+        print(f"{stage:<20s}{values['mean']:>10.1f}{values['p50']:>10.1f}{values['p95']:>10.1f}{values['max']:>10.1f}")
+    print("-" * 72)
+    print("平均提示词大小(token): " + ", ".join(f"{stage}={tokens}" for stage, tokens in summary["prompt_tokens"].items()))
+    print(f"JSON修复率: {summary['repair_rate']:.1%}  解析失败率: {summary['parse_failure_rate']:.1%}")
+    print(f"修正重试: 共 {summary['retries']['total']} 次，涉及 {summary['retries']['runs_with_retry']} 个运行")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="工作流生成流程基准测试（使用本地LLM模拟服务）")
+    parser.add_argument("--corpus", type=str, help="需求集文件（.txt 每行一个需求，或 .jsonl）")
+    parser.add_argument("--repeat", type=int, default=1, help="每个需求重复执行次数")
+    parser.add_argument("--recordings", type=str, help="模拟服务回放的录制文件（JSONL）")
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟首字延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="首字延迟随机抖动（±秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="模拟输出速率，0 表示不限速")
+    parser.add_argument("--output", type=str, help="将完整报告写入JSON文件")
+
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else DEFAULT_CORPUS
+    report = run_benchmark(
+        corpus,
+        repeat=args.repeat,
+        recordings=args.recordings,
+        latency=args.latency,
+        jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second
+    )
+    print_summary(report["summary"])
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已保存: {args.output}")
+
+    sys.exit(1 if report["summary"]["errors"] else 0)
@@ -12,10 +12,14 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.huawei_cloud_service_registry import get_registry
 from utils.vector_store import get_vector_store
+from utils.embedding_cache import get_embedding_cache
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 本脚本写入的操作在元数据中的来源标记，增量同步只比较和删除同一来源的操作
+OPERATION_SOURCE = "registry"
+
 
 # 操作参数定义 - 基于华为云SDK API文档
 # 这里定义了每个操作的输入参数和输出参数
@@ -1129,6 +1133,7 @@ def build_operation_operations_list():
                 "input_params": definition["input_params"],
                 "output_params": definition["output_params"],
                 "metadata": {
+                    "source": OPERATION_SOURCE,
                     "service_description": service_info.description,
                     "module_name": service_info.module_name,
                     "client_class": service_info.client_class
@@ -1138,12 +1143,13 @@ def build_operation_operations_list():
     return operations
 
 
-def import_to_vector_db(clear_existing=False):
+def import_to_vector_db(clear_existing=False, use_embedding_cache=True):
     """
     导入操作到向量数据库
 
     Args:
         clear_existing: 是否清空已有数据
+        use_embedding_cache: 是否复用嵌入缓存中文本未变化的文档向量
     """
     logger.info("开始导入华为云服务操作到向量数据库...")
 
@@ -1164,7 +1170,8 @@ def import_to_vector_db(clear_existing=False):
     logger.info(f"构建了 {len(operations)} 个操作")
 
     # 批量添加
-    success_count = vector_store.batch_add_operations(operations)
+    embedding_cache = get_embedding_cache() if use_embedding_cache else None
+    success_count = vector_store.batch_add_operations(operations, embedding_cache=embedding_cache)
 
     # 获取统计信息
     stats = vector_store.get_stats()
@@ -1179,14 +1186,53 @@ def import_to_vector_db(clear_existing=False):
     return success_count > 0
 
 
+def sync_vector_db(use_embedding_cache=True, delete_missing=False):
+    """
+    增量同步向量数据库：只写入新增和内容变化的操作，可选删除注册表中已不存在的操作
+
+    Args:
+        use_embedding_cache: 是否复用嵌入缓存中文本未变化的文档向量
+        delete_missing: 是否删除本脚本此前导入、但注册表中已不存在的操作（不影响SDK解析导入的操作）
+    """
+    logger.info("开始增量同步华为云服务操作到向量数据库...")
+
+    operations = build_operation_operations_list()
+    logger.info(f"构建了 {len(operations)} 个操作")
+
+    embedding_cache = get_embedding_cache() if use_embedding_cache else None
+    summary = get_vector_store().sync_operations(
+        operations, OPERATION_SOURCE, embedding_cache=embedding_cache, delete_missing=delete_missing
+    )
+
+    logger.info("=" * 80)
+    logger.info("同步完成！")
+    if summary["error"]:
+        logger.error(f"同步失败: {summary['error']}")
+    for label, key in (("新增", "added"), ("更新", "updated"), ("删除", "deleted"), ("与其他来源冲突（已跳过）", "conflicts")):
+        ids = summary[key]
+        logger.info(f"{label}: {len(ids)}" + (f" ({', '.join(ids[:10])}{' ...' if len(ids) > 10 else ''})" if ids else ""))
+    logger.info(f"未变化: {len(summary['unchanged'])}")
+    logger.info("=" * 80)
+
+    return summary["error"] is None
+
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="导入华为云服务操作到向量数据库")
-    parser.add_argument("--clear", action="store_true", help="清空已有数据后导入")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--clear", action="store_true", help="清空已有数据后导入")
+    mode.add_argument("--sync", action="store_true", help="增量同步：只写入新增和变化的操作")
+    parser.add_argument("--delete-missing", action="store_true",
+                        help="与 --sync 一起使用：删除本脚本此前导入、但注册表中已不存在的操作")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="不使用嵌入缓存，重新计算所有文档向量")
 
     args = parser.parse_args()
 
-    success = import_to_vector_db(clear_existing=args.clear)
+    if args.sync:
+        success = sync_vector_db(use_embedding_cache=not args.no_embedding_cache, delete_missing=args.delete_missing)
+    else:
+        success = import_to_vector_db(clear_existing=args.clear, use_embedding_cache=not args.no_embedding_cache)
 
     sys.exit(0 if success else 1)
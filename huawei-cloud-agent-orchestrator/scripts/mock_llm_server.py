@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+本地LLM模拟服务
+实现 OpenAI (/v1/chat/completions) 与 Anthropic (/v1/messages) 对话接口（含流式），
+回放录制的响应并模拟首字延迟和输出速率，用于在无网络、无API费用的情况下测试和压测生成流程
+
+响应来源优先级:
+1. 录制文件中与请求（系统提示词+用户提示词）完全一致的响应
+2. 录制文件中同一阶段的响应（按顺序轮换）
+3. 按阶段合成的最小可用响应（从提示词中的候选操作构造）
+
+使用示例:
+    # 回放录制的响应，首字延迟0.8秒，输出40 token/秒
+    python scripts/mock_llm_server.py --recordings data/llm_recordings.jsonl --latency 0.8 --tokens-per-second 40
+
+    # 代理到真实API并录制响应
+    python scripts/mock_llm_server.py --upstream https://api.modelarts-maas.com/v1 --upstream-key $KEY \\
+        --record data/llm_recordings.jsonl
+
+    # config.yaml 中将 llm.provider 设为 custom、llm.endpoint 设为 http://127.0.0.1:18080/v1 即可使用
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.prompt_assembler import heuristic_tokens
+
+# 系统提示词特征 -> 阶段（与 services/llm_client.py 中的提示词对应）
+STAGE_MARKERS = (
+    ("架构分析助手", "identify"),
+    ("架构规划专家", "architecture"),
+    ("JSON Patch", "correct_patch"),
+    ("工作流修正专家", "correct"),
+)
+
+# 流式输出时每个分片的时间间隔（秒）
+STREAM_INTERVAL = 0.05
+
+
+def classify_stage(system_prompt: str, user_prompt: str) -> str:
+    """根据提示词判断调用阶段"""
+    for marker, stage in STAGE_MARKERS:
+        if marker in system_prompt:
+            return stage
+    if not system_prompt and user_prompt.startswith("请解释以下工作流"):
+        return "explain"
+    if "改进" in system_prompt:
+        return "improve"
+    return "generate"
+
+
+def request_key(system_prompt: str, user_prompt: str) -> str:
+    """请求的录制键（系统提示词+用户提示词的sha256）"""
+    return hashlib.sha256(f"{system_prompt}\x00{user_prompt}".encode("utf-8")).hexdigest()
+
+
+def load_recordings(path: Optional[str]) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+    """
+    加载录制文件（JSONL，每行 {"key": 请求键, "stage": 阶段, "response": 响应文本}）
+
+    Returns:
+        (请求键 -> 响应, 阶段 -> 响应列表)
+    """
+    exact: Dict[str, str] = {}
+    by_stage: Dict[str, List[str]] = {}
+    if not path or not os.path.exists(path):
+        return exact, by_stage
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("key"):
+                exact[record["key"]] = record["response"]
+            by_stage.setdefault(record.get("stage", "generate"), []).append(record["response"])
+    return exact, by_stage
+
+
+def _listed_operations(user_prompt: str) -> List[Tuple[str, str]]:
+    """从提示词中提取候选操作: 相关API操作分段优先，其次架构计划，最后 Stage 0 候选服务清单"""
+    operations = re.findall(r"^## 操作 \d+: ([\w-]+)\.(\w+)", user_prompt, re.MULTILINE)
+    if operations:
+        return operations
+    plan = re.search(r"^# Architecture Plan\n\n(\{.*\})$", user_prompt, re.MULTILINE)
+    if plan:
+        try:
+            return [
+                (item["service"], item["operation"])
+                for item in json.loads(plan.group(1)).get("services_needed", [])
+                if item.get("service") and item.get("operation")
+            ]
+        except (ValueError, AttributeError):
+            pass
+    for service, listed in re.findall(r"^- ([\w-]+): .*?\| 操作: (.+)$", user_prompt, re.MULTILINE):
+        names = [name.strip() for name in listed.split(",")]
+        create = [name for name in names if name.startswith("create_")]
+        operations.append((service, (create or names)[0]))
+    return operations
+
+
+def synthesize_response(stage: str, user_prompt: str) -> str:
+    """按阶段合成最小可用响应"""
+    operations = list(dict.fromkeys(_listed_operations(user_prompt)))
+    if stage == "identify":
+        return json.dumps([
+            {"service": service, "operation": operation, "reason": "需求所需"}
+            for service, operation in operations[:3]
+        ], ensure_ascii=False)
+    if stage == "architecture":
+        return json.dumps({
+            "pattern": "single",
+            "dfx_level": "basic",
+            "services_needed": [
+                {"service": service, "operation": operation, "reason": "需求所需"}
+                for service, operation in operations[:3]
+            ],
+            "notes": "模拟架构计划"
+        }, ensure_ascii=False)
+    if stage == "correct_patch":
+        return "[]"
+    if stage in ("correct", "improve"):
+        match = re.search(r"```json\n(.*?)\n```", user_prompt, re.DOTALL)
+        return match.group(1) if match else '{"name": "workflow", "tasks": []}'
+    if stage == "explain":
+        return "该工作流按依赖顺序依次创建所需的云资源。（模拟响应）"
+
+    tasks = []
+    for i, (service, operation) in enumerate(operations[:4]):
+        tasks.append({
+            "name": f"{operation}_{i + 1}",
+            "type": "api_call",
+            "description": f"调用 {service}.{operation}",
+            "service": service,
+            "operation": operation,
+            "parameters": {},
+            "depends_on": [tasks[-1]["name"]] if tasks else []
+        })
+    return json.dumps({"name": "模拟工作流", "description": "模拟生成", "tasks": tasks}, ensure_ascii=False)
+
+
+class MockLLMState:
+    """模拟服务的响应来源、时延参数和请求日志"""
+
+    def __init__(self, recordings: Optional[str] = None, latency: float = 0.5, jitter: float = 0.0,
+                 tokens_per_second: float = 50.0, upstream: Optional[str] = None,
+                 upstream_key: Optional[str] = None, record_file: Optional[str] = None):
+        self.exact, self.by_stage = load_recordings(recordings)
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.upstream_key = upstream_key
+        self.record_file = record_file
+        self._stage_cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.requests: List[Dict[str, Any]] = []
+
+    def first_token_delay(self) -> float:
+        return max(self.latency + random.uniform(-self.jitter, self.jitter), 0.0)
+
+    def resolve(self, stage: str, system_prompt: str, user_prompt: str) -> Tuple[Optional[str], str]:
+        """
+        查找回放响应
+
+        Returns:
+            (响应文本或None, 来源 recorded/stage/synthetic)；None 表示需要请求上游
+        """
+        key = request_key(system_prompt, user_prompt)
+        if key in self.exact:
+            return self.exact[key], "recorded"
+        if self.upstream:
+            return None, "upstream"
+        responses = self.by_stage.get(stage)
+        if responses:
+            with self._lock:
+                cursor = self._stage_cursor.get(stage, 0)
+                self._stage_cursor[stage] = cursor + 1
+            return responses[cursor % len(responses)], "stage"
+        return synthesize_response(stage, user_prompt), "synthetic"
+
+    def record(self, stage: str, system_prompt: str, user_prompt: str, response: str):
+        """保存上游响应，供之后离线回放"""
+        key = request_key(system_prompt, user_prompt)
+        with self._lock:
+            self.exact[key] = response
+            self.by_stage.setdefault(stage, []).append(response)
+            if self.record_file:
+                with open(self.record_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "stage": stage, "response": response}, ensure_ascii=False) + "\n")
+
+    def log(self, entry: Dict[str, Any]):
+        with self._lock:
+            self.requests.append(entry)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """取出并清空请求日志"""
+        with self._lock:
+            requests, self.requests = self.requests, []
+            return requests
+
+
+def _split_chunks(text: str, tokens_per_chunk: int) -> Iterator[str]:
+    """按估算token数切分输出文本"""
+    size = max(tokens_per_chunk, 1) * 2  # 中文约1字/token、英文约4字符/token，取中间值
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """OpenAI / Anthropic 兼容的请求处理"""
+
+    server_version = "MockLLM/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> MockLLMState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/_mock/requests":
+            self._send_json(200, {"requests": self.state.drain()})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.split("?")[0].rstrip("/")
+        if path.endswith("/chat/completions"):
+            provider = "openai"
+        elif path.endswith("/messages"):
+            provider = "anthropic"
+        else:
+            self._send_json(404, {"error": f"unsupported path: {self.path}"})
+            return
+
+        system_prompt, user_prompt = self._extract_prompts(provider, body)
+        stage = classify_stage(system_prompt, user_prompt)
+        started = time.perf_counter()
+        text, source = self.state.resolve(stage, system_prompt, user_prompt)
+        if text is None:
+            try:
+                text = self._call_upstream(provider, path, body)
+            except Exception as e:
+                self._send_json(502, {"error": f"upstream failed: {e}"})
+                return
+            self.state.record(stage, system_prompt, user_prompt, text)
+            delay = 0.0  # 上游本身已产生真实延迟
+        else:
+            delay = self.state.first_token_delay()
+
+        prompt_tokens = heuristic_tokens(system_prompt) + heuristic_tokens(user_prompt)
+        completion_tokens = heuristic_tokens(text)
+        time.sleep(delay)
+        if body.get("stream"):
+            self._stream(provider, body, text, prompt_tokens, completion_tokens)
+        else:
+            time.sleep(completion_tokens / self.state.tokens_per_second if self.state.tokens_per_second > 0 else 0)
+            self._respond(provider, body, text, prompt_tokens, completion_tokens)
+
+        self.state.log({
+            "stage": stage,
+            "provider": provider,
+            "model": body.get("model"),
+            "stream": bool(body.get("stream")),
+            "source": source,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+
+    @staticmethod
+    def _extract_prompts(provider: str, body: Dict[str, Any]) -> Tuple[str, str]:
+        def content_text(content: Any) -> str:
+            if isinstance(content, list):
+                return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+            return content or ""
+
+        system_prompt = content_text(body.get("system")) if provider == "anthropic" else ""
+        user_prompt = ""
+        for message in body.get("messages", []):
+            if message.get("role") == "system":
+                system_prompt = content_text(message.get("content"))
+            elif message.get("role") == "user":
+                user_prompt = content_text(message.get("content"))
+        return system_prompt, user_prompt
+
+    def _call_upstream(self, provider: str, path: str, body: Dict[str, Any]) -> str:
+        """将请求转发到上游真实API（非流式）并返回响应文本"""
+        suffix = "/messages" if provider == "anthropic" else "/chat/completions"
+        headers = {"Content-Type": "application/json"}
+        if provider == "anthropic":
+            headers["x-api-key"] = self.state.upstream_key or ""
+            headers["anthropic-version"] = self.headers.get("anthropic-version", "2023-06-01")
+        else:
+            headers["Authorization"] = f"Bearer {self.state.upstream_key or ''}"
+        response = httpx.post(
+            self.state.upstream + suffix,
+            json={**body, "stream": False},
+            headers=headers,
+            timeout=300
+        )
+        response.raise_for_status()
+        data = response.json()
+        if provider == "anthropic":
+            return "".join(block.get("text", "") for block in data.get("content", []))
+        return data["choices"][0]["message"]["content"]
+
+    def _respond(self, provider: str, body: Dict[str, Any], text: str, prompt_tokens: int, completion_tokens: int):
+        model = body.get("model", "mock")
+        if provider == "anthropic":
+            self._send_json(200, {
+                "id": f"msg_{uuid.uuid4().hex[:24]}",
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {"input_tokens": prompt_tokens, "output_tokens": completion_tokens}
+            })
+        else:
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": text}
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+            })
+
+    def _stream(self, provider: str, body: Dict[str, Any], text: str, prompt_tokens: int, completion_tokens: int):
+        """以SSE分片输出，分片间隔按 tokens_per_second 控制"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        model = body.get("model", "mock")
+        rate = self.state.tokens_per_second
+        tokens_per_chunk = int(rate * STREAM_INTERVAL) if rate > 0 else len(text)
+        message_id = uuid.uuid4().hex[:24]
+
+        if provider == "anthropic":
+            self._sse("message_start", {"type": "message_start", "message": {
+                "id": f"msg_{message_id}", "type": "message", "role": "assistant", "model": model,
+                "content": [], "stop_reason": None, "stop_sequence": None,
+                "usage": {"input_tokens": prompt_tokens, "output_tokens": 0}
+            }})
+            self._sse("content_block_start", {"type": "content_block_start", "index": 0,
+                                              "content_block": {"type": "text", "text": ""}})
+            for chunk in _split_chunks(text, tokens_per_chunk):
+                self._sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                  "delta": {"type": "text_delta", "text": chunk}})
+                if rate > 0:
+                    time.sleep(STREAM_INTERVAL)
+            self._sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+            self._sse("message_delta", {"type": "message_delta",
+                                        "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                        "usage": {"output_tokens": completion_tokens}})
+            self._sse("message_stop", {"type": "message_stop"})
+            return
+
+        def chunk_event(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+            return {
+                "id": f"chatcmpl-{message_id}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+
+        for chunk in _split_chunks(text, tokens_per_chunk):
+            self._sse(None, chunk_event({"content": chunk}))
+            if rate > 0:
+                time.sleep(STREAM_INTERVAL)
+        self._sse(None, chunk_event({}, "stop"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _sse(self, event: Optional[str], data: Dict[str, Any]):
+        prefix = f"event: {event}\n" if event else ""
+        self.wfile.write(f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _send_json(self, status: int, data: Dict[str, Any]):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def create_server(host: str = "127.0.0.1", port: int = 18080, **options) -> ThreadingHTTPServer:
+    """
+    创建模拟服务（未启动）
+
+    Args:
+        host: 监听地址
+        port: 监听端口，0 表示随机端口
+        **options: 传给 MockLLMState（recordings, latency, jitter, tokens_per_second,
+                   upstream, upstream_key, record_file）
+
+    Returns:
+        HTTP服务器，server.state 为 MockLLMState
+    """
+    server = ThreadingHTTPServer((host, port), MockLLMHandler)
+    server.daemon_threads = True
+    server.state = MockLLMState(**options)
+    return server
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 0, **options) -> ThreadingHTTPServer:
+    """在后台线程中启动模拟服务（供基准测试等进程内使用）"""
+    server = create_server(host, port, **options)
+    threading.Thread(target=server.serve_forever, name="mock-llm-server", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地LLM模拟服务（OpenAI/Anthropic兼容）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=18080, help="监听端口")
+    parser.add_argument("--recordings", type=str, help="回放的录制文件（JSONL）")
+    parser.add_argument("--latency", type=float, default=0.5, help="首字延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="首字延迟随机抖动（±秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="输出速率，0 表示不限速")
+    parser.add_argument("--upstream", type=str, help="上游API地址：未命中录制时转发请求（代理录制模式）")
+    parser.add_argument("--upstream-key", type=str, default=os.environ.get("MOCK_LLM_UPSTREAM_KEY"),
+                        help="上游API密钥（默认读取环境变量 MOCK_LLM_UPSTREAM_KEY）")
+    parser.add_argument("--record", type=str, help="上游响应追加保存到该文件（JSONL）")
+
+    args = parser.parse_args()
+
+    server = create_server(
+        args.host, args.port,
+        recordings=args.recordings,
+        latency=args.latency,
+        jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second,
+        upstream=args.upstream,
+        upstream_key=args.upstream_key,
+        record_file=args.record
+    )
+    print(f"LLM模拟服务已启动: http://{args.host}:{server.server_address[1]}/v1")
+    print(f"  录制响应: {len(server.state.exact)} 条, 首字延迟: {args.latency}s, 输出速率: {args.tokens_per_second} token/s")
+    if args.upstream:
+        print(f"  代理录制: {args.upstream} -> {args.record or '(仅内存)'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n已停止")
@@ -12,10 +12,14 @@ from typing import Dict, List, Any, Optional
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.vector_store import get_vector_store
+from utils.embedding_cache import get_embedding_cache
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 本脚本写入的操作在元数据中的来源标记，增量同步只比较和删除同一来源的操作
+OPERATION_SOURCE = "sdk"
+
 # SDK根目录（修正为正确的路径）
 SDK_ROOT = Path("/root/huawei-service-agent/huawei-cloud-agent-orchestrator/huaweicloud-sdk-python-v3")
 
@@ -309,6 +313,7 @@ def scan_sdk_for_operations() -> List[Dict[str, Any]]:
                 "input_params": request_params,
                 "output_params": response_params,
                 "metadata": {
+                    "source": OPERATION_SOURCE,
                     "service_description": SERVICE_MAPPING.get(service_name, ""),
                     "method_args": method['args'],
                     "return_type": method['returns']
@@ -319,8 +324,8 @@ def scan_sdk_for_operations() -> List[Dict[str, Any]]:
     return operations
 
 
-def import_to_vector_db(clear_existing=False):
-    """将SDK解析结果导入向量数据库"""
+def import_to_vector_db(clear_existing=False, use_embedding_cache=True):
+    """将SDK解析结果导入向量数据库（默认复用嵌入缓存中文本未变化的文档向量）"""
     logger.info("开始解析华为云SDK并导入向量数据库...")
 
     vector_store = get_vector_store()
@@ -339,7 +344,8 @@ def import_to_vector_db(clear_existing=False):
         logger.warning("未提取到任何操作")
         return False
 
-    success_count = vector_store.batch_add_operations(operations)
+    embedding_cache = get_embedding_cache() if use_embedding_cache else None
+    success_count = vector_store.batch_add_operations(operations, embedding_cache=embedding_cache)
 
     stats = vector_store.get_stats()
 
@@ -354,6 +360,35 @@ def import_to_vector_db(clear_existing=False):
     return success_count > 0
 
 
+def sync_vector_db(use_embedding_cache=True, delete_missing=False):
+    """增量同步SDK解析结果：只写入新增和内容变化的操作，delete_missing 时删除本脚本导入、SDK中已不存在的操作"""
+    logger.info("开始解析华为云SDK并增量同步向量数据库...")
+
+    operations = scan_sdk_for_operations()
+
+    if not operations:
+        # 扫描失败时不能当作"全部删除"
+        logger.warning("未提取到任何操作")
+        return False
+
+    embedding_cache = get_embedding_cache() if use_embedding_cache else None
+    summary = get_vector_store().sync_operations(
+        operations, OPERATION_SOURCE, embedding_cache=embedding_cache, delete_missing=delete_missing
+    )
+
+    logger.info("=" * 80)
+    logger.info("SDK解析和同步完成！")
+    if summary["error"]:
+        logger.error(f"同步失败: {summary['error']}")
+    for label, key in (("新增", "added"), ("更新", "updated"), ("删除", "deleted"), ("与其他来源冲突（已跳过）", "conflicts")):
+        ids = summary[key]
+        logger.info(f"{label}: {len(ids)}" + (f" ({', '.join(ids[:10])}{' ...' if len(ids) > 10 else ''})" if ids else ""))
+    logger.info(f"未变化: {len(summary['unchanged'])}")
+    logger.info("=" * 80)
+
+    return summary["error"] is None
+
+
 def analyze_service(service_name: str) -> Dict[str, Any]:
     """分析单个服务的API信息"""
     sdk_dir = SDK_ROOT / f"huaweicloud-sdk-{service_name}"
@@ -405,7 +440,12 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="解析华为云SDK并导入向量数据库")
-    parser.add_argument("--clear", action="store_true", help="清空已有数据后导入")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--clear", action="store_true", help="清空已有数据后导入")
+    mode.add_argument("--sync", action="store_true", help="增量同步：只写入新增和变化的操作")
+    parser.add_argument("--delete-missing", action="store_true",
+                        help="与 --sync 一起使用：删除本脚本此前导入、但SDK中已不存在的操作")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="不使用嵌入缓存，重新计算所有文档向量")
     parser.add_argument("--service", type=str, help="仅分析指定服务，如 ims")
     parser.add_argument("--list-services", action="store_true", help="列出所有可用服务")
 
@@ -443,6 +483,9 @@ if __name__ == "__main__":
                 print(f"    出参数量: {len(api['output_params'])}")
         sys.exit(0)
 
-    success = import_to_vector_db(clear_existing=args.clear)
+    if args.sync:
+        success = sync_vector_db(use_embedding_cache=not args.no_embedding_cache, delete_missing=args.delete_missing)
+    else:
+        success = import_to_vector_db(clear_existing=args.clear, use_embedding_cache=not args.no_embedding_cache)
 
     sys.exit(0 if success else 1)
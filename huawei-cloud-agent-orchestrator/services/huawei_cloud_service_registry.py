@@ -3,6 +3,7 @@
 包含华为云全量云服务及完整API操作列表
 """
 
+import hashlib
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 
@@ -37,6 +38,7 @@ class HuaweiCloudServiceRegistry:
     """华为云服务注册中心"""
 
     def __init__(self):
+        self._fingerprint: Optional[str] = None
         # 预定义的完整服务列表 - 包含华为云全量云服务
         self.services: Dict[str, ServiceInfo] = {
             "ecs": ServiceInfo(
@@ -4216,6 +4218,23 @@ class HuaweiCloudServiceRegistry:
             ),
         }
 
+    @property
+    def fingerprint(self) -> str:
+        """
+        注册表内容指纹（服务名+描述+操作列表的摘要）
+
+        用于缓存失效：依赖注册表内容的提示词、索引等以此作为缓存键。
+        """
+        if self._fingerprint is None:
+            digest = hashlib.md5()
+            for name in sorted(self.services):
+                service = self.services[name]
+                digest.update(name.encode("utf-8"))
+                digest.update(service.description.encode("utf-8"))
+                digest.update("\n".join(service.common_operations).encode("utf-8"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
     def get_service(self, service_name: str) -> Optional[ServiceInfo]:
         """获取服务信息"""
         return self.services.get(service_name)
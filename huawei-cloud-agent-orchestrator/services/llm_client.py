@@ -3,16 +3,47 @@ LLM客户端封装
 支持Anthropic, OpenAI等多种LLM提供商
 """
 
+import asyncio
+import hashlib
 import json
-from typing import Dict, List, Any, Optional, Union
-import anthropic
-import openai
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Any, Optional, Tuple, Union
 from utils.logger import setup_logger
 from utils.config_manager import get_config
+from utils.json_stream import IncrementalTaskParser, parse_json_tolerant
+from services.llm_router import LLMEndpoint, LLMRouter, is_endpoint_error
+from services.prompt_assembler import PromptAssembler
+from utils.example_store import get_example_store
+from utils.tracing import trace_span
+
+# 资源创建类操作前缀：Stage 0 展开候选服务操作时优先保留
+PROVISIONING_PREFIXES = (
+    "create_", "batch_create_", "add_", "batch_add_", "attach_", "associate_",
+    "bind_", "batch_bind_", "set_", "register_", "install_", "run_",
+)
+
+# 原始响应调试采样（环形缓冲区，替代逐次写文件），首次使用时按 llm.debug_capture_size 创建
+_debug_captures: Optional[deque] = None
+
+
+# 当前生成请求中各阶段实际使用的端点：阶段 -> "端点名/模型"（见 LLMClient.track_endpoints）
+_used_endpoints: ContextVar[Optional[Dict[str, str]]] = ContextVar("llm_used_endpoints", default=None)
+
+
+def _get_debug_captures() -> deque:
+    global _debug_captures
+    if _debug_captures is None:
+        _debug_captures = deque(maxlen=int(get_config().get('llm.debug_capture_size', 50)))
+    return _debug_captures
 
 
 class LLMClient:
-    """LLM客户端 - 支持多个提供商"""
+    """LLM客户端 - 支持多个提供商（同步 + 异步）"""
 
     def __init__(self):
         self.config = get_config()
@@ -20,50 +51,315 @@ class LLMClient:
         self.client = None
         self.provider = None
         self.model = None
+        self.router: Optional[LLMRouter] = None
+        # 提示词片段缓存: 名称 -> (缓存键, 值)
+        self._prompt_cache: Dict[str, Tuple[Any, Any]] = {}
+        self.prompt_assembler = PromptAssembler()
         self._initialize_client()
 
     def _initialize_client(self):
-        """初始化LLM客户端"""
+        """
+        初始化LLM端点路由
+
+        client/provider/model 指向第一个可用端点（主端点），供连接测试等直接调用使用；
+        生成相关调用经路由器在 llm.endpoints 配置的多个端点间选择和切换。
+        """
         llm_config = self.config.get_llm_config()
         self.provider = llm_config.get('provider', 'anthropic')
         self.model = llm_config.get('model', 'claude-3-sonnet-20240229')
-        api_key = llm_config.get('api_key')
 
-        if not api_key:
-            self.logger.warning("未配置LLM API密钥，LLM功能将不可用")
+        self.router = LLMRouter(llm_config, self.logger)
+        primary = self.router.primary
+        if primary is None:
+            self.logger.warning("未配置可用的LLM端点（API密钥），LLM功能将不可用")
             return
 
-        try:
-            if self.provider == 'anthropic':
-                self.client = anthropic.Anthropic(api_key=api_key)
-            elif self.provider == 'openai':
-                self.client = openai.OpenAI(api_key=api_key)
-            elif self.provider == 'custom':
-                endpoint = llm_config.get('endpoint')
-                if endpoint:
-                    self.client = openai.OpenAI(
-                        api_key=api_key,
-                        base_url=endpoint
-                    )
-            else:
-                self.logger.error(f"不支持的LLM提供商: {self.provider}")
-
-            self.logger.info(f"LLM客户端初始化成功: {self.provider} - {self.model}")
-
-        except Exception as e:
-            self.logger.error(f"初始化LLM客户端失败: {e}")
-            self.client = None
+        self.client = primary.client
+        self.provider = primary.provider
+        self.model = primary.model
+        names = ", ".join(f"{endpoint.name}({endpoint.provider} - {endpoint.model})" for endpoint in self.router.endpoints)
+        self.logger.info(f"LLM客户端初始化成功: {names}")
 
     def reinitialize(self):
-        """重新初始化LLM客户端（配置变更后调用）"""
+        """重新初始化LLM客户端（配置变更后调用），旧端点的客户端及连接池随之关闭"""
+        old_router = self.router
         self.config = get_config()
         self.client = None
+        self._prompt_cache.clear()
         self._initialize_client()
+        if old_router is not None:
+            old_router.close()
+
+    async def aclose(self):
+        """关闭当前事件循环上的异步客户端及其连接池"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self.router is not None:
+            await self.router.aclose()
 
     def is_available(self) -> bool:
         """检查LLM是否可用"""
         return self.client is not None
 
+    def get_routing_stats(self) -> List[Dict[str, Any]]:
+        """各LLM端点的路由统计（延迟、错误率、健康状态）"""
+        return self.router.get_stats() if self.router is not None else []
+
+    def _build_request(self, endpoint: LLMEndpoint, stage: str, system_prompt: Optional[str],
+                       user_prompt: str, max_tokens: int, temperature: float) -> Dict[str, Any]:
+        """构建各提供商通用的请求参数"""
+        request = {
+            "model": endpoint.model_for(stage),
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        if endpoint.provider == 'anthropic':
+            if system_prompt and self.config.get('llm.prompt_caching', True):
+                # 系统提示词是稳定前缀，标记为可缓存，后续请求只需按缓存价计费
+                request["system"] = [{
+                    "type": "text",
+                    "text": system_prompt,
+                    "cache_control": {"type": "ephemeral"}
+                }]
+            elif system_prompt:
+                request["system"] = system_prompt
+            request["messages"] = [{"role": "user", "content": user_prompt}]
+        else:
+            messages = []
+            if system_prompt:
+                messages.append({"role": "system", "content": system_prompt})
+            messages.append({"role": "user", "content": user_prompt})
+            request["messages"] = messages
+        return request
+
+    @staticmethod
+    def _extract_text(endpoint: LLMEndpoint, response) -> str:
+        """从提供商响应中提取文本"""
+        if endpoint.provider == 'anthropic':
+            return response.content[0].text
+        return response.choices[0].message.content
+
+    @staticmethod
+    def _extract_usage(endpoint: LLMEndpoint, usage) -> Dict[str, int]:
+        """从提供商返回的 usage 中提取token数（缺失的字段不返回）"""
+        if usage is None:
+            return {}
+        if endpoint.provider == 'anthropic':
+            fields = {
+                "prompt_tokens": "input_tokens",
+                "completion_tokens": "output_tokens",
+                "cache_read_tokens": "cache_read_input_tokens",
+            }
+        else:
+            fields = {"prompt_tokens": "prompt_tokens", "completion_tokens": "completion_tokens"}
+        result = {}
+        for key, attribute in fields.items():
+            value = getattr(usage, attribute, None)
+            if isinstance(value, int):
+                result[key] = value
+        return result
+
+    def _llm_span(self, endpoint: LLMEndpoint, stage: str, request: Dict[str, Any], streaming: bool = False):
+        """一次端点调用的追踪span"""
+        return trace_span(
+            "llm.call",
+            stage=stage,
+            endpoint=endpoint.name,
+            provider=endpoint.provider,
+            model=request["model"],
+            max_tokens=request["max_tokens"],
+            streaming=streaming
+        )
+
+    @contextmanager
+    def track_endpoints(self) -> Iterator[Dict[str, str]]:
+        """
+        记录范围内各阶段最后一次成功调用所用的端点和模型
+
+        Yields:
+            {阶段: "端点名/模型"}，范围内的调用（包括其中创建的任务）成功后写入
+        """
+        used: Dict[str, str] = {}
+        token = _used_endpoints.set(used)
+        try:
+            yield used
+        finally:
+            try:
+                _used_endpoints.reset(token)
+            except ValueError:
+                # 异步生成器在其他上下文中被关闭时无法reset
+                _used_endpoints.set(None)
+
+    @staticmethod
+    def _record_endpoint(endpoint: LLMEndpoint, stage: str, request: Dict[str, Any]):
+        used = _used_endpoints.get()
+        if used is not None:
+            used[stage] = f"{endpoint.name}/{request['model']}"
+
+    def configured_endpoints(self, stage: str = "generate") -> List[str]:
+        """按配置顺序列出全部端点在该阶段使用的 "端点名/模型"（与路由器的实时排序无关）"""
+        if self.router is None:
+            return []
+        return [f"{endpoint.name}/{endpoint.model_for(stage)}" for endpoint in self.router.endpoints]
+
+    def _candidates(self, stage: str) -> List[LLMEndpoint]:
+        if self.router is None or not self.router.endpoints:
+            raise RuntimeError("LLM客户端未初始化")
+        return self.router.candidates(stage)
+
+    def _complete(self, system_prompt: Optional[str], user_prompt: str,
+                  max_tokens: int, temperature: float, stage: str = "generate") -> str:
+        """同步调用LLM，返回原始文本；端点故障时依次切换到下一个端点"""
+        last_error = None
+        for endpoint in self._candidates(stage):
+            request = self._build_request(endpoint, stage, system_prompt, user_prompt, max_tokens, temperature)
+            with self._llm_span(endpoint, stage, request) as span:
+                started = time.perf_counter()
+                try:
+                    if endpoint.provider == 'anthropic':
+                        response = endpoint.client.messages.create(**request)
+                    else:
+                        response = endpoint.client.chat.completions.create(**request)
+                except Exception as e:
+                    if not is_endpoint_error(e):
+                        raise
+                    span.record_error(e)
+                    self.router.record_failure(endpoint, e)
+                    last_error = e
+                    continue
+                self.router.record_success(endpoint, stage, time.perf_counter() - started)
+                self._record_endpoint(endpoint, stage, request)
+                for key, value in self._extract_usage(endpoint, getattr(response, "usage", None)).items():
+                    span.set_attribute(key, value)
+                return self._extract_text(endpoint, response)
+        raise last_error
+
+    async def _acomplete(self, system_prompt: Optional[str], user_prompt: str,
+                         max_tokens: int, temperature: float, stage: str = "generate") -> str:
+        """异步调用LLM，返回原始文本（不阻塞事件循环）；端点故障时依次切换到下一个端点"""
+        last_error = None
+        for endpoint in self._candidates(stage):
+            request = self._build_request(endpoint, stage, system_prompt, user_prompt, max_tokens, temperature)
+            async_client = endpoint.get_async_client()
+            with self._llm_span(endpoint, stage, request) as span:
+                started = time.perf_counter()
+                try:
+                    if endpoint.provider == 'anthropic':
+                        response = await async_client.messages.create(**request)
+                    else:
+                        response = await async_client.chat.completions.create(**request)
+                except Exception as e:
+                    if not is_endpoint_error(e):
+                        raise
+                    span.record_error(e)
+                    self.router.record_failure(endpoint, e)
+                    last_error = e
+                    continue
+                self.router.record_success(endpoint, stage, time.perf_counter() - started)
+                self._record_endpoint(endpoint, stage, request)
+                for key, value in self._extract_usage(endpoint, getattr(response, "usage", None)).items():
+                    span.set_attribute(key, value)
+                return self._extract_text(endpoint, response)
+        raise last_error
+
+    async def _astream(self, system_prompt: Optional[str], user_prompt: str,
+                       max_tokens: int, temperature: float,
+                       stream_state: Dict[str, Any], stage: str = "generate") -> AsyncIterator[str]:
+        """
+        异步流式调用LLM，逐段产出文本
+
+        只在收到第一段文本之前切换端点；已产出部分文本后的错误直接抛出。
+
+        Args:
+            stream_state: 结束后写入 finish_reason（length/max_tokens 表示被截断）
+        """
+        last_error = None
+        for endpoint in self._candidates(stage):
+            request = self._build_request(endpoint, stage, system_prompt, user_prompt, max_tokens, temperature)
+            with self._llm_span(endpoint, stage, request, streaming=True) as span:
+                started = time.perf_counter()
+                produced = False
+                try:
+                    async for text in self._astream_endpoint(endpoint, request, stream_state):
+                        if not produced:
+                            span.set_attribute("first_chunk_ms", round((time.perf_counter() - started) * 1000, 1))
+                        produced = True
+                        yield text
+                except Exception as e:
+                    if produced or not is_endpoint_error(e):
+                        raise
+                    span.record_error(e)
+                    self.router.record_failure(endpoint, e)
+                    last_error = e
+                    continue
+                self.router.record_success(endpoint, stage, time.perf_counter() - started)
+                self._record_endpoint(endpoint, stage, request)
+                span.set_attribute("finish_reason", stream_state.get("finish_reason"))
+                for key, value in self._extract_usage(endpoint, stream_state.get("usage")).items():
+                    span.set_attribute(key, value)
+                return
+        raise last_error
+
+    @staticmethod
+    async def _astream_endpoint(endpoint: LLMEndpoint, request: Dict[str, Any],
+                                stream_state: Dict[str, Any]) -> AsyncIterator[str]:
+        """在指定端点上执行一次流式调用（结束后 stream_state 含 finish_reason 和 usage）"""
+        async_client = endpoint.get_async_client()
+        if endpoint.provider == 'anthropic':
+            async with async_client.messages.stream(**request) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                message = await stream.get_final_message()
+                stream_state["finish_reason"] = message.stop_reason
+                stream_state["usage"] = message.usage
+        else:
+            if endpoint.provider == 'openai':
+                # 兼容端点不一定支持 stream_options，只对官方接口请求末尾的用量统计
+                request = {**request, "stream_options": {"include_usage": True}}
+            response = await async_client.chat.completions.create(**request, stream=True)
+            async for chunk in response:
+                if getattr(chunk, "usage", None) is not None:
+                    stream_state["usage"] = chunk.usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.delta and choice.delta.content:
+                    yield choice.delta.content
+                if choice.finish_reason:
+                    stream_state["finish_reason"] = choice.finish_reason
+
+    def _call_llm(self, system_prompt: str, user_prompt: str, stage: str = "generate") -> Optional[Dict[str, Any]]:
+        """使用全局生成参数调用LLM并解析JSON"""
+        llm_config = self.config.get_llm_config()
+        try:
+            content = self._complete(
+                system_prompt, user_prompt,
+                max_tokens=llm_config.get('max_tokens', 4096),
+                temperature=llm_config.get('temperature', 0.1),
+                stage=stage
+            )
+            return self._parse_json_response(content)
+        except Exception as e:
+            self.logger.error(f"{self.provider} API调用失败: {e}")
+            return None
+
+    async def _acall_llm(self, system_prompt: str, user_prompt: str, stage: str = "generate") -> Optional[Dict[str, Any]]:
+        """_call_llm 的异步版本"""
+        llm_config = self.config.get_llm_config()
+        try:
+            content = await self._acomplete(
+                system_prompt, user_prompt,
+                max_tokens=llm_config.get('max_tokens', 4096),
+                temperature=llm_config.get('temperature', 0.1),
+                stage=stage
+            )
+            return self._parse_json_response(content)
+        except Exception as e:
+            self.logger.error(f"{self.provider} API调用失败: {e}")
+            return None
+
     def get_assembled_prompt(self) -> dict:
         """获取组装后的完整Prompt（用于预览）"""
         system_prompt = self._build_system_prompt()
@@ -97,78 +393,180 @@ class LLMClient:
             parameter_templates=parameter_templates,
             architecture_plan=architecture_plan
         )
+        return self._call_llm(system_prompt, user_prompt)
 
-        try:
-            if self.provider == 'anthropic':
-                return self._call_anthropic(system_prompt, user_prompt)
-            elif self.provider in ['openai', 'custom']:
-                return self._call_openai(system_prompt, user_prompt)
-            else:
-                return None
+    async def agenerate_workflow(self, user_requirement: str, context: Optional[Dict[str, Any]] = None, relevant_operations: Optional[list] = None, parameter_templates: Optional[Dict] = None, architecture_plan: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """generate_workflow 的异步版本"""
+        if not self.is_available():
+            self.logger.warning("LLM不可用，无法生成工作流")
+            return None
 
+        system_prompt = self._build_system_prompt()
+        examples = await asyncio.to_thread(self._select_examples, user_requirement)
+        user_prompt = self._build_user_prompt(
+            user_requirement, context, relevant_operations,
+            parameter_templates=parameter_templates,
+            architecture_plan=architecture_plan,
+            examples=examples
+        )
+        return await self._acall_llm(system_prompt, user_prompt)
+
+    async def astream_workflow(self, user_requirement: str, context: Optional[Dict[str, Any]] = None, relevant_operations: Optional[list] = None, parameter_templates: Optional[Dict] = None, architecture_plan: Optional[Dict] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式生成工作流：每个任务对象一旦完整即产出
+
+        Yields:
+            {"type": "task", "index": 序号, "task": 任务字典}
+            最后产出 {"type": "workflow", "workflow": 工作流字典或None, "truncated": 是否被截断}
+        """
+        if not self.is_available():
+            self.logger.warning("LLM不可用，无法生成工作流")
+            yield {"type": "workflow", "workflow": None, "truncated": False}
+            return
+
+        system_prompt = self._build_system_prompt()
+        examples = await asyncio.to_thread(self._select_examples, user_requirement)
+        user_prompt = self._build_user_prompt(
+            user_requirement, context, relevant_operations,
+            parameter_templates=parameter_templates,
+            architecture_plan=architecture_plan,
+            examples=examples
+        )
+        llm_config = self.config.get_llm_config()
+        parser = IncrementalTaskParser()
+        stream_state: Dict[str, Any] = {}
+
+        try:
+            async for text in self._astream(
+                system_prompt, user_prompt,
+                max_tokens=llm_config.get('max_tokens', 4096),
+                temperature=llm_config.get('temperature', 0.1),
+                stream_state=stream_state
+            ):
+                for index, task in parser.feed(text):
+                    yield {"type": "task", "index": index, "task": task}
         except Exception as e:
-            self.logger.error(f"LLM调用失败: {e}")
-            return None
+            self.logger.error(f"{self.provider} 流式调用失败: {e}")
+            if not parser.text:
+                yield {"type": "workflow", "workflow": None, "truncated": False}
+                return
+
+        truncated = stream_state.get("finish_reason") in ("length", "max_tokens") or not parser.is_complete
+        if truncated:
+            self.logger.warning(
+                f"LLM输出被截断 (finish_reason={stream_state.get('finish_reason')})，"
+                f"已完整接收 {len(parser.tasks)} 个任务"
+            )
+
+        yield {
+            "type": "workflow",
+            "workflow": self._parse_json_response(parser.text),
+            "truncated": truncated,
+        }
 
-    def identify_required_operations(self, user_requirement: str) -> Optional[List[Dict]]:
+    def _build_candidate_listing(self, candidate_services: Optional[Dict[str, List[str]]]) -> str:
         """
-        轻量级LLM调用：识别用户需求所需的服务和操作
+        候选服务的操作清单
 
-        Args:
-            user_requirement: 用户自然语言描述
+        每个候选服务先列出检索命中的操作，再补充资源创建类操作，总数不超过
+        agent.stage0_max_operations_per_service，超出时标注为节选及操作总数；
+        未指定候选服务时返回全部服务的完整清单。
 
-        Returns:
-            List[Dict] 每项包含 service, operation, reason；失败返回 None
+        Args:
+            candidate_services: 候选服务名 -> 优先列出的操作名
         """
-        if not self.is_available():
-            return None
+        if not candidate_services:
+            return self._get_service_operation_listing()
 
         from services.huawei_cloud_service_registry import get_registry
         registry = get_registry()
-        services_info = []
-        for name, service in registry.get_all_services().items():
-            ops = list(service.common_operations) if service.common_operations else []
-            services_info.append(f"- {name}: {service.description} | 操作: {', '.join(ops)}")
-        service_list = '\n'.join(services_info)
+        limit = int(self.config.get('agent.stage0_max_operations_per_service', 30))
+        provisioning = self._get_provisioning_operations()
+
+        lines = []
+        for name, priority_ops in candidate_services.items():
+            service = registry.get_service(name)
+            if service is None:
+                continue
+            known = set(service.common_operations or [])
+            ops = list(dict.fromkeys(
+                [op for op in priority_ops if op in known] + provisioning.get(name, [])
+            ))
+            if len(known) <= limit:
+                ops = list(dict.fromkeys(ops + list(service.common_operations)))
+            listed = ops[:limit]
+            if len(listed) < len(known):
+                label = f"操作（节选 {len(listed)}/{len(known)}）"
+            else:
+                label = "操作"
+            lines.append(f"- {name}: {service.description} | {label}: {', '.join(listed)}")
+        return '\n'.join(lines)
 
-        system_prompt = "你是华为云架构分析助手。根据用户需求和可用服务列表，识别需要调用的服务和操作。只返回JSON数组，不要其他文本。"
+    def _get_provisioning_operations(self) -> Dict[str, List[str]]:
+        """各服务的资源创建类操作（create/add/attach/associate等），按注册表指纹缓存"""
+        cached = self._prompt_cache.get("provisioning_operations")
+        fingerprint = self._registry_fingerprint()
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
 
-        user_prompt = f"""用户需求: "{user_requirement}"
+        from services.huawei_cloud_service_registry import get_registry
+        result = {
+            name: [op for op in (service.common_operations or []) if op.startswith(PROVISIONING_PREFIXES)]
+            for name, service in get_registry().get_all_services().items()
+        }
+        self._prompt_cache["provisioning_operations"] = (fingerprint, result)
+        return result
 
-可用服务和操作:
-{service_list}
+    def _stage0_max_tokens(self) -> int:
+        """Stage 0（操作识别/架构规划）输出token上限"""
+        return int(self.config.get('agent.stage0_max_tokens', 2048))
+
+    def _build_identify_prompts(self, user_requirement: str, candidate_services: Optional[Dict[str, List[str]]] = None):
+        """
+        构建操作识别（Stage 0 轻量级）的提示词
+
+        系统提示词只含精简服务目录（名称+描述，可缓存），用户提示词只展开候选服务的操作清单
+        """
+        system_prompt = self._memoized(
+            "identify_system", self._registry_fingerprint(),
+            lambda: f"""你是华为云架构分析助手。根据用户需求，识别需要调用的服务和操作。只返回JSON数组，不要其他文本。
+
+服务目录:
+{self._get_service_catalog()}
+
+用户消息中给出了候选服务及其操作列表（标注"节选"的服务只列出了部分操作），operation必须从列出的操作中选取。
 
 请返回一个JSON数组，每个元素包含:
-- "service": 服务名称（必须与上方列表完全一致）
-- "operation": 操作名称（必须与上方列表完全一致）
-- "reason": 为什么需要这个操作
+- "service": 服务名称（必须与服务目录完全一致）
+- "operation": 操作名称（必须与候选操作列表完全一致）
+- "reason": 为什么需要这个操作（不超过15字）
 
 只返回JSON数组，不要markdown代码块或其他文本。"""
+        )
 
-        try:
-            if self.provider == 'anthropic':
-                response = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=1024,
-                    temperature=0.0,
-                    system=system_prompt,
-                    messages=[{"role": "user", "content": user_prompt}]
-                )
-                content = response.content[0].text
-            elif self.provider in ['openai', 'custom']:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    max_tokens=1024,
-                    temperature=0.0,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ]
-                )
-                content = response.choices[0].message.content
-            else:
-                return None
+        user_prompt = (
+            f"候选服务和操作:\n{self._build_candidate_listing(candidate_services)}\n\n"
+            f'用户需求: "{user_requirement}"'
+        )
+        return system_prompt, user_prompt
 
+    def identify_required_operations(self, user_requirement: str, candidate_services: Optional[Dict[str, List[str]]] = None) -> Optional[List[Dict]]:
+        """
+        轻量级LLM调用：识别用户需求所需的服务和操作
+
+        Args:
+            user_requirement: 用户自然语言描述
+            candidate_services: 候选服务名 -> 检索命中的操作，只展开这些服务的操作；为None时展开全部服务
+
+        Returns:
+            List[Dict] 每项包含 service, operation, reason；失败返回 None
+        """
+        if not self.is_available():
+            return None
+
+        system_prompt, user_prompt = self._build_identify_prompts(user_requirement, candidate_services)
+        try:
+            content = self._complete(system_prompt, user_prompt, max_tokens=self._stage0_max_tokens(), temperature=0.0, stage="stage0")
             result = self._parse_json_response(content)
             if isinstance(result, list):
                 return result
@@ -178,76 +576,94 @@ class LLMClient:
             self.logger.error(f"identify_required_operations 失败: {e}")
             return None
 
-    def generate_architecture_plan(self, user_requirement: str) -> Optional[Dict]:
-        """
-        生成架构计划（Step 1）：分析需求，输出架构模式、DFX级别、所需服务和依赖图
+    async def aidentify_required_operations(self, user_requirement: str, candidate_services: Optional[Dict[str, List[str]]] = None) -> Optional[List[Dict]]:
+        """identify_required_operations 的异步版本"""
+        if not self.is_available():
+            return None
 
-        Args:
-            user_requirement: 用户自然语言描述
+        system_prompt, user_prompt = self._build_identify_prompts(user_requirement, candidate_services)
+        try:
+            content = await self._acomplete(system_prompt, user_prompt, max_tokens=self._stage0_max_tokens(), temperature=0.0, stage="stage0")
+            result = self._parse_json_response(content)
+            if isinstance(result, list):
+                return result
+            return None
 
-        Returns:
-            架构计划字典，失败返回None
-        """
-        if not self.is_available():
+        except Exception as e:
+            self.logger.error(f"identify_required_operations 失败: {e}")
             return None
 
-        from services.huawei_cloud_service_registry import get_registry
-        registry = get_registry()
-        services_info = []
-        for name, service in registry.get_all_services().items():
-            ops = list(service.common_operations) if service.common_operations else []
-            services_info.append(f"- {name}: {service.description} | 操作: {', '.join(ops)}")
-        service_list = '\n'.join(services_info)
+    def _build_architecture_prompts(self, user_requirement: str, candidate_services: Optional[Dict[str, List[str]]] = None):
+        """
+        构建架构规划（Stage 0）的提示词
 
-        system_prompt = (
-            "你是华为云架构规划专家。分析用户需求，输出架构计划JSON。"
-            "只返回JSON对象，不要其他文本。"
-        )
+        系统提示词只含精简服务目录（名称+描述，可缓存），用户提示词只展开候选服务的操作清单
+        """
+        system_prompt = self._memoized(
+            "architecture_system", self._registry_fingerprint(),
+            lambda: f"""你是华为云架构规划专家。分析用户需求，输出架构计划JSON。只返回JSON对象，不要其他文本。
 
-        user_prompt = f"""用户需求: "{user_requirement}"
+服务目录:
+{self._get_service_catalog()}
 
-可用服务和操作:
-{service_list}
+用户消息中给出了候选服务及其操作列表（标注"节选"的服务只列出了部分操作），services_needed中的operation必须从列出的操作中选取。
 
 请返回一个JSON对象，包含以下字段:
 {{
   "pattern": "架构模式(single/ha/cluster/serverless)",
   "dfx_level": "DFX级别(basic/standard/advanced)",
   "services_needed": [
-    {{"service": "服务名", "operation": "操作名", "reason": "原因"}}
+    {{"service": "服务名", "operation": "操作名", "reason": "原因（不超过15字）"}}
   ],
   "dependency_graph": {{
     "层级名": ["该层包含的服务操作"]
   }},
-  "notes": "架构说明"
+  "notes": "架构说明（不超过50字）"
 }}
 
 只返回JSON对象，不要markdown代码块或其他文本。"""
+        )
+
+        user_prompt = (
+            f"候选服务和操作:\n{self._build_candidate_listing(candidate_services)}\n\n"
+            f'用户需求: "{user_requirement}"'
+        )
+        return system_prompt, user_prompt
+
+    def generate_architecture_plan(self, user_requirement: str, candidate_services: Optional[Dict[str, List[str]]] = None) -> Optional[Dict]:
+        """
+        生成架构计划（Step 1）：分析需求，输出架构模式、DFX级别、所需服务和依赖图
+
+        Args:
+            user_requirement: 用户自然语言描述
+            candidate_services: 候选服务名 -> 检索命中的操作，只展开这些服务的操作；为None时展开全部服务
+
+        Returns:
+            架构计划字典，失败返回None
+        """
+        if not self.is_available():
+            return None
 
+        system_prompt, user_prompt = self._build_architecture_prompts(user_requirement, candidate_services)
         try:
-            if self.provider == 'anthropic':
-                response = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=1024,
-                    temperature=0.0,
-                    system=system_prompt,
-                    messages=[{"role": "user", "content": user_prompt}]
-                )
-                content = response.content[0].text
-            elif self.provider in ['openai', 'custom']:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    max_tokens=1024,
-                    temperature=0.0,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ]
-                )
-                content = response.choices[0].message.content
-            else:
-                return None
+            content = self._complete(system_prompt, user_prompt, max_tokens=self._stage0_max_tokens(), temperature=0.0, stage="stage0")
+            result = self._parse_json_response(content)
+            if isinstance(result, dict):
+                return result
+            return None
 
+        except Exception as e:
+            self.logger.error(f"generate_architecture_plan 失败: {e}")
+            return None
+
+    async def agenerate_architecture_plan(self, user_requirement: str, candidate_services: Optional[Dict[str, List[str]]] = None) -> Optional[Dict]:
+        """generate_architecture_plan 的异步版本"""
+        if not self.is_available():
+            return None
+
+        system_prompt, user_prompt = self._build_architecture_prompts(user_requirement, candidate_services)
+        try:
+            content = await self._acomplete(system_prompt, user_prompt, max_tokens=self._stage0_max_tokens(), temperature=0.0, stage="stage0")
             result = self._parse_json_response(content)
             if isinstance(result, dict):
                 return result
@@ -257,11 +673,79 @@ class LLMClient:
             self.logger.error(f"generate_architecture_plan 失败: {e}")
             return None
 
+    def _memoized(self, name: str, key: Any, builder: Callable[[], str]) -> str:
+        """
+        返回缓存的提示词片段，缓存键变化时重新构建
+
+        Args:
+            name: 片段名称
+            key: 缓存键（注册表指纹、配置内容等），变化即失效
+            builder: 构建函数
+
+        Returns:
+            提示词文本
+        """
+        cached = self._prompt_cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        value = builder()
+        self._prompt_cache[name] = (key, value)
+        return value
+
+    def _registry_fingerprint(self) -> str:
+        """服务注册表指纹"""
+        from services.huawei_cloud_service_registry import get_registry
+        return get_registry().fingerprint
+
+    def prompt_version(self) -> str:
+        """
+        提示词版本：系统提示词、示例和注册表内容的摘要
+
+        任一变化都会改变版本号，依赖生成结果的缓存据此失效。
+        """
+        agent_config = self.config.get('agent', {}) or {}
+        digest = hashlib.md5()
+        digest.update(self._registry_fingerprint().encode("utf-8"))
+        digest.update(agent_config.get('system_prompt', '').encode("utf-8"))
+        digest.update(json.dumps(agent_config.get('examples', []), ensure_ascii=False, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _get_service_operation_listing(self) -> str:
+        """服务+操作完整清单"""
+        def build():
+            from services.huawei_cloud_service_registry import get_registry
+            registry = get_registry()
+            services_info = []
+            for name, service in registry.get_all_services().items():
+                ops = list(service.common_operations) if service.common_operations else []
+                services_info.append(f"- {name}: {service.description} | 操作: {', '.join(ops)}")
+            return '\n'.join(services_info)
+
+        return self._memoized("service_operation_listing", self._registry_fingerprint(), build)
+
+    def _get_service_catalog(self) -> str:
+        """精简服务目录（只含服务名+描述）"""
+        def build():
+            from services.huawei_cloud_service_registry import get_registry
+            return '\n'.join(
+                f"- {name}: {service.description}"
+                for name, service in get_registry().get_all_services().items()
+            )
+
+        return self._memoized("service_catalog", self._registry_fingerprint(), build)
+
     def _build_system_prompt(self) -> str:
-        """构建系统提示词"""
+        """构建系统提示词（按注册表指纹和agent.system_prompt缓存）"""
         config = self.config.get('agent', {})
         system_prompt = config.get('system_prompt', '')
+        cache_key = (self._registry_fingerprint(), system_prompt)
+        return self._memoized(
+            "workflow_system", cache_key,
+            lambda: self._assemble_system_prompt(system_prompt)
+        )
 
+    def _assemble_system_prompt(self, system_prompt: str) -> str:
+        """组装系统提示词"""
         # 获取可用的服务列表（精简：只保留服务名+描述，节省token）
         from services.huawei_cloud_service_registry import get_registry
         registry = get_registry()
@@ -286,8 +770,18 @@ class LLMClient:
 5. 自检：任务名唯一性、依赖无环、outputs路径正确、参数结构合规
 """
 
-    def _build_user_prompt(self, user_requirement: str, context: Optional[Dict[str, Any]], relevant_operations: Optional[list] = None, parameter_templates: Optional[Dict] = None, architecture_plan: Optional[Dict] = None) -> str:
-        """构建用户提示词"""
+    def _select_examples(self, user_requirement: str) -> List[Dict[str, Any]]:
+        """选择与需求最相似的 agent.examples_top_k 个示例"""
+        examples = self.config.get('agent.examples', []) or []
+        top_k = int(self.config.get('agent.examples_top_k', 3))
+        return get_example_store().select(user_requirement, examples, top_k)
+
+    def _build_user_prompt(self, user_requirement: str, context: Optional[Dict[str, Any]], relevant_operations: Optional[list] = None, parameter_templates: Optional[Dict] = None, architecture_plan: Optional[Dict] = None, examples: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        构建用户提示词（检索结果、参数模板、架构计划、示例各自受token预算约束）
+
+        examples 为None时按相似度选择示例（见 _select_examples）
+        """
         context_info = ""
         if context:
             context_info = f"""
@@ -299,46 +793,16 @@ class LLMClient:
 - 可用区: {context.get('availability_zone', '')}
 """
 
-        # 添加向量搜索到的相关API操作（含完整参数定义）
-        operations_text = ""
-        if relevant_operations:
-            operations_text = "\n# 相关API操作（含参数定义）\n\n"
-            operations_text += "以下是与用户需求最相关的华为云API操作及其参数定义，请严格使用这些操作和参数：\n\n"
-            for i, op in enumerate(relevant_operations, 1):
-                operations_text += f"## 操作 {i}: {op.get('service_name', '')}.{op.get('operation_name', '')}\n"
-                operations_text += f"{op.get('document', '')}\n\n"
-
-        # 添加参数模板
-        templates_text = ""
-        if parameter_templates:
-            templates_text = "\n# Exact Parameter Templates\n\n"
-            templates_text += "以下是各操作的精确参数结构模板，生成工作流时必须严格遵循这些参数结构：\n\n"
-            for op_name, template in parameter_templates.items():
-                templates_text += f"## {op_name}\n```json\n"
-                templates_text += json.dumps(template, indent=2, ensure_ascii=False)
-                templates_text += "\n```\n\n"
-
-        # 添加架构计划
-        arch_plan_text = ""
-        if architecture_plan:
-            arch_plan_text = "\n# Architecture Plan\n\n"
-            arch_plan_text += json.dumps(architecture_plan, indent=2, ensure_ascii=False)
-            arch_plan_text += "\n\n请严格按照上述架构计划生成工作流。\n"
-
-        # 添加示例
-        config = self.config.get('agent', {})
-        examples = config.get('examples', [])
-
-        examples_text = ""
-        if examples:
-            examples_text = "\n# 示例工作流\n\n"
-            for i, example in enumerate(examples, 1):
-                examples_text += f"""
-## 示例 {i}: {example['name']}
-用户: {example['user_requirement']}
-工作流:
-{example['workflow']}
-"""
+        # 各分段按 agent.prompt_budget 的token预算裁剪
+        assembler = self.prompt_assembler
+        stats = {}
+        operations_text = assembler.operations_section(relevant_operations, stats)
+        templates_text = assembler.templates_section(parameter_templates, stats)
+        arch_plan_text = assembler.architecture_section(architecture_plan, stats)
+        if examples is None:
+            examples = self._select_examples(user_requirement)
+        examples_text = assembler.examples_section(examples, stats)
+        self.logger.info(f"用户提示词分段token: {stats}")
 
         return f"""# 用户需求
 
@@ -356,192 +820,97 @@ class LLMClient:
 5. 包含必要的资源（如VPC先于ECS）
 6. 返回合法的JSON格式"""
 
-    def _call_anthropic(self, system_prompt: str, user_prompt: str) -> Optional[Dict[str, Any]]:
-        """调用Anthropic API"""
-        llm_config = self.config.get_llm_config()
-
-        try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=llm_config.get('max_tokens', 4096),
-                temperature=llm_config.get('temperature', 0.1),
-                system=system_prompt,
-                messages=[{
-                    "role": "user",
-                    "content": user_prompt
-                }]
-            )
-
-            content = response.content[0].text
-            return self._parse_json_response(content)
-
-        except Exception as e:
-            self.logger.error(f"Anthropic API调用失败: {e}")
-            return None
-
-    def _call_openai(self, system_prompt: str, user_prompt: str) -> Optional[Dict[str, Any]]:
-        """调用OpenAI API"""
-        llm_config = self.config.get_llm_config()
-
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                max_tokens=llm_config.get('max_tokens', 4096),
-                temperature=llm_config.get('temperature', 0.1),
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
-
-            content = response.choices[0].message.content
-            return self._parse_json_response(content)
-
-        except Exception as e:
-            self.logger.error(f"OpenAI API调用失败: {e}")
-            return None
-
     def _parse_json_response(self, content: str) -> Optional[Dict[str, Any]]:
-        """从LLM响应中解析JSON（含截断修复）"""
-        # 临时调试：保存原始响应
-        try:
-            with open('/tmp/llm_raw_response.txt', 'w') as f:
-                f.write(content)
-        except Exception:
-            pass
+        """从LLM响应中解析JSON（单遍容错解析，含代码块提取、尾部逗号/括号错配/截断修复）"""
         try:
-            # 提取JSON代码块
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0]
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0]
-
-            content = content.strip()
-
-            # 第一次尝试：直接解析
-            import json
-            try:
-                workflow = json.loads(content)
-                self.logger.info("成功从LLM响应解析工作流JSON")
-                return workflow
-            except json.JSONDecodeError:
-                pass
-
-            # 第二次尝试：修复常见问题（尾部逗号、截断）
-            import re
-            fixed = content
-            # 移除尾部逗号
-            fixed = re.sub(r',\s*([}\]])', r'\1', fixed)
-
-            try:
-                workflow = json.loads(fixed)
-                self.logger.info("修复尾部逗号后成功解析JSON")
-                return workflow
-            except json.JSONDecodeError:
-                pass
-
-            # 第三次尝试：修复括号不匹配（LLM常见错误：漏掉}或]）
-            fixed = self._repair_json_brackets(fixed)
-            try:
-                workflow = json.loads(fixed)
-                self.logger.info("修复括号不匹配后成功解析JSON")
-                return workflow
-            except json.JSONDecodeError:
-                pass
-
-            # 第四次尝试：修复截断的JSON（补全括号）
-            open_braces = fixed.count('{') - fixed.count('}')
-            open_brackets = fixed.count('[') - fixed.count(']')
-            if open_braces > 0 or open_brackets > 0:
-                # 去掉最后一个不完整的键值对
-                last_complete = max(fixed.rfind('}'), fixed.rfind(']'))
-                if last_complete > 0:
-                    fixed = fixed[:last_complete + 1]
-                # 补全缺失的括号
-                open_braces = fixed.count('{') - fixed.count('}')
-                open_brackets = fixed.count('[') - fixed.count(']')
-                fixed += ']' * open_brackets + '}' * open_braces
-
-                try:
-                    workflow = json.loads(fixed)
-                    self.logger.info("修复截断JSON后成功解析")
-                    return workflow
-                except json.JSONDecodeError:
-                    pass
+            result, repairs = parse_json_tolerant(content)
+        except Exception as e:
+            self.logger.error(f"解析LLM响应时发生异常: {e}")
+            result, repairs = None, []
 
+        if result is None:
             # 最终尝试：使用json_repair库
             try:
                 from json_repair import repair_json
                 repaired = repair_json(content, return_objects=True)
-                if isinstance(repaired, dict):
-                    self.logger.info("使用json_repair库成功修复并解析JSON")
-                    return repaired
+                if isinstance(repaired, (dict, list)) and repaired:
+                    result = repaired
+                    repairs.append("json_repair")
             except ImportError:
                 pass
             except Exception as repair_err:
                 self.logger.warning(f"json_repair也失败: {repair_err}")
 
-            self.logger.error(f"解析LLM响应的JSON失败，所有修复尝试均失败")
+        self._capture_raw_response(content, repairs, failed=result is None)
+
+        if result is None:
+            self.logger.error("解析LLM响应的JSON失败")
             self.logger.error(f"原始响应前500字符: {content[:500]}")
             return None
 
-        except Exception as e:
-            self.logger.error(f"解析LLM响应时发生异常: {e}")
-            return None
+        if repairs:
+            self.logger.info(f"修复后成功解析JSON: {', '.join(repairs)}")
+        else:
+            self.logger.info("成功从LLM响应解析JSON")
+        return result
 
-    def _repair_json_brackets(self, text: str) -> str:
+    def _capture_raw_response(self, content: str, repairs: List[str], failed: bool):
         """
-        基于栈的JSON括号修复：当遇到]但栈顶是{时，插入}；反之亦然。
-        处理LLM常见的漏掉闭合括号问题。
+        按采样率将原始响应记录到内存环形缓冲区（解析失败的响应总是记录）
+
+        采样率 llm.debug_capture_rate，缓冲区大小 llm.debug_capture_size
         """
-        result = []
-        stack = []
-        in_string = False
-        escape = False
+        rate = float(self.config.get('llm.debug_capture_rate', 0.05))
+        if not failed and (rate <= 0 or random.random() >= rate):
+            return
+        _get_debug_captures().append({
+            "captured_at": datetime.now().isoformat(),
+            "provider": self.provider,
+            "model": self.model,
+            "failed": failed,
+            "repairs": list(repairs),
+            "content": content,
+        })
+
+    @staticmethod
+    def get_debug_captures() -> List[Dict[str, Any]]:
+        """获取采样记录的原始LLM响应（最新在后）"""
+        return list(_get_debug_captures())
+
+    def _format_operation_reference(self, relevant_operations: Optional[list], services: Optional[List[str]] = None) -> str:
+        """正确API操作参考（最多20个，指定服务的操作优先）"""
+        if not relevant_operations:
+            return ""
+        if services:
+            relevant_operations = sorted(
+                relevant_operations,
+                key=lambda op: op.get('service_name') not in services
+            )
+        ops_ref = "\n# 正确的API操作参考\n\n"
+        for op in relevant_operations[:20]:
+            ops_ref += f"- {op.get('service_name','')}.{op.get('operation_name','')}\n"
+        return ops_ref
 
-        for ch in text:
-            if escape:
-                result.append(ch)
-                escape = False
-                continue
-            if ch == '\\' and in_string:
-                result.append(ch)
-                escape = True
-                continue
-            if ch == '"' and not escape:
-                in_string = not in_string
-                result.append(ch)
-                continue
-            if in_string:
-                result.append(ch)
-                continue
+    def _build_correction_prompts(self, workflow_dict: Dict[str, Any], validation_errors: List[str], relevant_operations: Optional[list] = None):
+        """构建工作流修正的提示词"""
+        workflow_json = json.dumps(workflow_dict, indent=2, ensure_ascii=False)
+        errors_text = "\n".join(f"- {e}" for e in validation_errors)
+        ops_ref = self._format_operation_reference(relevant_operations)
 
-            if ch == '{':
-                stack.append('{')
-                result.append(ch)
-            elif ch == '[':
-                stack.append('[')
-                result.append(ch)
-            elif ch == '}':
-                # 弹出匹配的{，如果栈顶是[则先补]
-                while stack and stack[-1] == '[':
-                    result.append(']')
-                    stack.pop()
-                if stack and stack[-1] == '{':
-                    stack.pop()
-                result.append(ch)
-            elif ch == ']':
-                # 弹出匹配的[，如果栈顶是{则先补}
-                while stack and stack[-1] == '{':
-                    result.append('}')
-                    stack.pop()
-                if stack and stack[-1] == '[':
-                    stack.pop()
-                result.append(ch)
-            else:
-                result.append(ch)
+        system_prompt = "你是华为云工作流修正专家。只修复指出的问题，不要改变其他部分。返回完整的修正后工作流JSON。"
+
+        user_prompt = f"""# 当前工作流
+
+```json
+{workflow_json}
+```
 
-        return ''.join(result)
+# 验证发现的错误
+
+{errors_text}
+{ops_ref}
+请修正上述错误，返回完整的修正后工作流JSON。只修复列出的问题，保持其他部分不变。"""
+        return system_prompt, user_prompt
 
     def correct_workflow(self, workflow_dict: Dict[str, Any], validation_errors: List[str], relevant_operations: Optional[list] = None) -> Optional[Dict[str, Any]]:
         """
@@ -558,39 +927,88 @@ class LLMClient:
         if not self.is_available():
             return None
 
-        workflow_json = json.dumps(workflow_dict, indent=2, ensure_ascii=False)
+        system_prompt, user_prompt = self._build_correction_prompts(
+            workflow_dict, validation_errors, relevant_operations
+        )
+        return self._call_llm(system_prompt, user_prompt, stage="correct")
+
+    async def acorrect_workflow(self, workflow_dict: Dict[str, Any], validation_errors: List[str], relevant_operations: Optional[list] = None) -> Optional[Dict[str, Any]]:
+        """correct_workflow 的异步版本"""
+        if not self.is_available():
+            return None
+
+        system_prompt, user_prompt = self._build_correction_prompts(
+            workflow_dict, validation_errors, relevant_operations
+        )
+        return await self._acall_llm(system_prompt, user_prompt, stage="correct")
+
+    def _build_patch_correction_prompts(self, workflow_dict: Dict[str, Any], validation_errors: List[str], failed_tasks: List[str], relevant_operations: Optional[list] = None):
+        """构建补丁式修正的提示词：只发送出错的任务，要求返回 RFC 6902 JSON Patch"""
+        tasks = workflow_dict.get('tasks', [])
+        failed_text = ""
+        failed_services = []
+        for index, task in enumerate(tasks):
+            if task.get('name') in failed_tasks:
+                failed_services.append(task.get('service'))
+                task_json = json.dumps(task, ensure_ascii=False, separators=(',', ':'))
+                failed_text += f"## /tasks/{index}\n```json\n{task_json}\n```\n\n"
+        task_names = "\n".join(f"- /tasks/{i}: {task.get('name', '')}" for i, task in enumerate(tasks))
         errors_text = "\n".join(f"- {e}" for e in validation_errors)
+        ops_ref = self._format_operation_reference(relevant_operations, failed_services)
 
-        ops_ref = ""
-        if relevant_operations:
-            ops_ref = "\n# 正确的API操作参考\n\n"
-            for op in relevant_operations[:20]:
-                ops_ref += f"- {op.get('service_name','')}.{op.get('operation_name','')}\n"
+        system_prompt = (
+            "你是华为云工作流修正专家。只针对指出的问题输出 RFC 6902 JSON Patch 操作数组，"
+            "path 必须位于出错任务的路径之下（如 /tasks/2/operation），不要修改其他任务。"
+            "只返回JSON数组，不要其他文本。"
+        )
 
-        system_prompt = "你是华为云工作流修正专家。只修复指出的问题，不要改变其他部分。返回完整的修正后工作流JSON。"
+        user_prompt = f"""# 出错的任务
 
-        user_prompt = f"""# 当前工作流
+{failed_text}# 工作流全部任务（供 depends_on 参考）
 
-```json
-{workflow_json}
-```
+{task_names}
 
 # 验证发现的错误
 
 {errors_text}
 {ops_ref}
-请修正上述错误，返回完整的修正后工作流JSON。只修复列出的问题，保持其他部分不变。"""
+请返回修正这些错误的 JSON Patch 数组，例如:
+[{{"op": "replace", "path": "/tasks/2/operation", "value": "create_vpc"}}]"""
+        return system_prompt, user_prompt
 
-        try:
-            if self.provider == 'anthropic':
-                return self._call_anthropic(system_prompt, user_prompt)
-            elif self.provider in ['openai', 'custom']:
-                return self._call_openai(system_prompt, user_prompt)
+    def correct_workflow_patch(self, workflow_dict: Dict[str, Any], validation_errors: List[str], failed_tasks: List[str], relevant_operations: Optional[list] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        根据验证错误生成只涉及出错任务的 JSON Patch
+
+        Args:
+            workflow_dict: 当前工作流JSON
+            validation_errors: 验证发现的错误列表
+            failed_tasks: 出错的任务名
+            relevant_operations: 相关API操作（提供正确的schema参考）
+
+        Returns:
+            RFC 6902 补丁操作列表，失败返回None
+        """
+        if not self.is_available():
             return None
-        except Exception as e:
-            self.logger.error(f"correct_workflow 失败: {e}")
+
+        system_prompt, user_prompt = self._build_patch_correction_prompts(
+            workflow_dict, validation_errors, failed_tasks, relevant_operations
+        )
+        result = self._call_llm(system_prompt, user_prompt, stage="correct")
+        return result if isinstance(result, list) else None
+
+    async def acorrect_workflow_patch(self, workflow_dict: Dict[str, Any], validation_errors: List[str], failed_tasks: List[str], relevant_operations: Optional[list] = None) -> Optional[List[Dict[str, Any]]]:
+        """correct_workflow_patch 的异步版本"""
+        if not self.is_available():
             return None
 
+        system_prompt, user_prompt = self._build_patch_correction_prompts(
+            workflow_dict, validation_errors, failed_tasks, relevant_operations
+        )
+        result = await self._acall_llm(system_prompt, user_prompt, stage="correct")
+        return result if isinstance(result, list) else None
+
     def improve_workflow(self, workflow: Dict[str, Any], feedback: str) -> Optional[Dict[str, Any]]:
         """
         根据反馈改进工作流
@@ -617,10 +1035,21 @@ class LLMClient:
 
         workflow_json = json.dumps(workflow, indent=2, ensure_ascii=False)
 
-        if self.provider == 'anthropic':
-            return self._call_anthropic(system_prompt.format(workflow_json=workflow_json), user_prompt)
-        else:
-            return self._call_openai(system_prompt.format(workflow_json=workflow_json), user_prompt)
+        return self._call_llm(system_prompt.format(workflow_json=workflow_json), user_prompt)
+
+    def _build_explain_prompt(self, workflow: Dict[str, Any]) -> str:
+        """构建工作流解释的提示词"""
+        workflow_json = json.dumps(workflow, indent=2, ensure_ascii=False)
+
+        return f"""请解释以下工作流的用途和执行步骤：
+
+{workflow_json}
+
+请用中文简要说明：
+1. 这个工作流的目的是什么
+2. 包含哪些任务
+3. 执行顺序和依赖关系
+4. 会创建哪些云资源"""
 
     def explain_workflow(self, workflow: Dict[str, Any]) -> Optional[str]:
         """
@@ -635,38 +1064,20 @@ class LLMClient:
         if not self.is_available():
             return "LLM不可用，无法提供解释"
 
-        workflow_json = json.dumps(workflow, indent=2, ensure_ascii=False)
-
-        user_prompt = f"""请解释以下工作流的用途和执行步骤：
+        try:
+            return self._complete(None, self._build_explain_prompt(workflow), max_tokens=1000, temperature=0.3, stage="explain")
 
-{workflow_json}
+        except Exception as e:
+            self.logger.error(f"生成解释失败: {e}")
+            return None
 
-请用中文简要说明：
-1. 这个工作流的目的是什么
-2. 包含哪些任务
-3. 执行顺序和依赖关系
-4. 会创建哪些云资源"""
+    async def aexplain_workflow(self, workflow: Dict[str, Any]) -> Optional[str]:
+        """explain_workflow 的异步版本"""
+        if not self.is_available():
+            return "LLM不可用，无法提供解释"
 
         try:
-            if self.provider == 'anthropic':
-                response = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=1000,
-                    temperature=0.3,
-                    messages=[{
-                        "role": "user",
-                        "content": user_prompt
-                    }]
-                )
-                return response.content[0].text
-            else:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    max_tokens=1000,
-                    temperature=0.3,
-                    messages=[{"role": "user", "content": user_prompt}]
-                )
-                return response.choices[0].message.content
+            return await self._acomplete(None, self._build_explain_prompt(workflow), max_tokens=1000, temperature=0.3, stage="explain")
 
         except Exception as e:
             self.logger.error(f"生成解释失败: {e}")
@@ -0,0 +1,314 @@
+"""
+LLM多端点路由
+在多个已配置的LLM端点之间按延迟和错误率路由请求，端点故障时自动切换
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+
+import anthropic
+import httpx
+import openai
+
+# 调用阶段：Stage 0（操作识别/架构规划）可配置为更小更快的模型
+STAGES = ("generate", "stage0", "correct", "explain")
+
+# 正在后台关闭的异步客户端（保持引用直到关闭完成）
+_closing_tasks = set()
+
+# 端点级故障（换一个端点可能成功）；其余错误（如400参数错误）不触发切换
+_ENDPOINT_ERRORS = (
+    openai.APIConnectionError,      # 含 APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+    anthropic.APIConnectionError,   # 含 APITimeoutError
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    httpx.TransportError,
+)
+
+
+def is_endpoint_error(error: Exception) -> bool:
+    """判断异常是否属于端点故障（超时、连接失败、限流、5xx）"""
+    if isinstance(error, _ENDPOINT_ERRORS):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and (status_code == 429 or status_code >= 500)
+
+
+class LLMEndpoint:
+    """
+    单个LLM端点
+
+    持有同步客户端和按事件循环缓存的异步客户端，并按调用阶段记录
+    EWMA延迟、EWMA错误率和连续失败次数。
+    """
+
+    def __init__(self, name: str, settings: Dict[str, Any], defaults: Dict[str, Any], max_retries: int = 2):
+        self.name = name
+        self.provider = settings.get('provider', 'anthropic')
+        self.model = settings.get('model', 'claude-3-sonnet-20240229')
+        self.base_url = settings.get('endpoint')
+        self.stage_models: Dict[str, str] = dict(settings.get('stage_models') or {})
+        self._api_key = settings.get('api_key')
+        self._defaults = defaults
+        self._max_retries = max_retries
+        self.client = self._create_client()
+        # 异步客户端按事件循环缓存：httpx连接池绑定创建它的事件循环
+        self._async_clients = weakref.WeakKeyDictionary()
+
+        self._lock = threading.Lock()
+        self.ewma_latency: Dict[str, float] = {}
+        self.ewma_error_rate = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def _create_client(self):
+        """创建同步客户端；缺少密钥或端点地址时返回None"""
+        if not self._api_key:
+            return None
+        if self.provider == 'anthropic':
+            return anthropic.Anthropic(api_key=self._api_key, max_retries=self._max_retries)
+        if self.provider == 'openai':
+            return openai.OpenAI(api_key=self._api_key, max_retries=self._max_retries)
+        if self.provider == 'custom':
+            if not self.base_url:
+                return None
+            return openai.OpenAI(api_key=self._api_key, base_url=self.base_url, max_retries=self._max_retries)
+        raise ValueError(f"不支持的LLM提供商: {self.provider}")
+
+    def _create_async_client(self):
+        """
+        为当前事件循环创建异步客户端
+
+        所有请求共享一个带连接上限的httpx连接池，保持keep-alive以复用TLS连接。
+        """
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self._defaults.get('max_connections', 20),
+                max_keepalive_connections=self._defaults.get('max_keepalive_connections', 10)
+            ),
+            timeout=httpx.Timeout(self._defaults.get('timeout', 120), connect=10.0)
+        )
+
+        if self.provider == 'anthropic':
+            return anthropic.AsyncAnthropic(
+                api_key=self._api_key, http_client=http_client, max_retries=self._max_retries
+            )
+        if self.provider == 'openai':
+            return openai.AsyncOpenAI(api_key=self._api_key, http_client=http_client, max_retries=self._max_retries)
+        if self.provider == 'custom':
+            return openai.AsyncOpenAI(
+                api_key=self._api_key, base_url=self.base_url, http_client=http_client, max_retries=self._max_retries
+            )
+        raise ValueError(f"不支持的LLM提供商: {self.provider}")
+
+    def get_async_client(self):
+        """获取当前事件循环对应的异步客户端（懒加载）"""
+        loop = asyncio.get_running_loop()
+        async_client = self._async_clients.get(loop)
+        if async_client is None:
+            async_client = self._create_async_client()
+            self._async_clients[loop] = async_client
+        return async_client
+
+    async def aclose(self):
+        """关闭当前事件循环上的异步客户端及其连接池"""
+        async_client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if async_client is not None:
+            await async_client.close()
+
+    def close(self):
+        """
+        关闭同步客户端和所有事件循环上的异步客户端（端点被替换时调用）
+
+        异步客户端只能在创建它的事件循环上关闭：当前线程的事件循环上创建关闭任务，
+        其他线程中运行的事件循环上线程安全地提交，已停止的事件循环上的客户端直接丢弃。
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for loop, async_client in list(self._async_clients.items()):
+            self._async_clients.pop(loop, None)
+            if loop is running:
+                task = loop.create_task(async_client.close())
+                _closing_tasks.add(task)
+                task.add_done_callback(_closing_tasks.discard)
+            elif loop.is_running() and not loop.is_closed():
+                asyncio.run_coroutine_threadsafe(async_client.close(), loop)
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+
+    def model_for(self, stage: str) -> str:
+        """获取指定阶段使用的模型（未单独配置时使用端点默认模型）"""
+        return self.stage_models.get(stage) or self.model
+
+    def record_success(self, stage: str, latency: float, alpha: float):
+        with self._lock:
+            previous = self.ewma_latency.get(stage)
+            self.ewma_latency[stage] = latency if previous is None else alpha * latency + (1 - alpha) * previous
+            self.ewma_error_rate = (1 - alpha) * self.ewma_error_rate
+            self.consecutive_failures = 0
+            self.cooldown_until = 0.0
+            self.calls += 1
+
+    def record_failure(self, error: Exception, alpha: float, failure_threshold: int, cooldown: float):
+        with self._lock:
+            self.ewma_error_rate = alpha + (1 - alpha) * self.ewma_error_rate
+            self.consecutive_failures += 1
+            self.calls += 1
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"[:200]
+            if self.consecutive_failures >= failure_threshold:
+                self.cooldown_until = time.monotonic() + cooldown
+
+    def is_healthy(self) -> bool:
+        """是否可正常路由（不在冷却期）"""
+        return time.monotonic() >= self.cooldown_until
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "provider": self.provider,
+                "model": self.model,
+                "stage_models": dict(self.stage_models),
+                "available": self.client is not None,
+                "healthy": self.is_healthy(),
+                "ewma_latency_ms": {stage: round(value * 1000, 1) for stage, value in self.ewma_latency.items()},
+                "ewma_error_rate": round(self.ewma_error_rate, 4),
+                "consecutive_failures": self.consecutive_failures,
+                "calls": self.calls,
+                "failures": self.failures,
+                "last_error": self.last_error,
+            }
+
+
+class LLMRouter:
+    """
+    LLM端点路由器
+
+    端点来自 llm 配置本身（主端点，名称 primary）以及 llm.endpoints 列表。
+    列表项未填写 provider 时继承主端点的 provider；只有 provider 和 endpoint 都与主端点相同时
+    才继承 api_key 和 model，避免把主端点的密钥发给其他服务商或网关。
+
+    路由策略（llm.routing）:
+    - 健康端点按 阶段EWMA延迟 × (1 + error_penalty × EWMA错误率) 升序排列，
+      尚无该阶段延迟数据的端点按已测量端点的平均延迟计分，错误率同样会降低其优先级
+    - 连续失败 failure_threshold 次的端点进入 cooldown_seconds 冷却期，
+      冷却期内排在健康端点之后，仅作为最后的兜底
+    """
+
+    def __init__(self, llm_config: Dict[str, Any], logger=None):
+        self.logger = logger
+        routing = llm_config.get('routing', {}) or {}
+        self.alpha = float(routing.get('ewma_alpha', 0.3))
+        self.error_penalty = float(routing.get('error_penalty', 4.0))
+        self.failure_threshold = int(routing.get('failure_threshold', 3))
+        self.cooldown = float(routing.get('cooldown_seconds', 30))
+        # 有备用端点时关闭SDK内置重试（带退避等待），由路由器直接切换到下一个端点
+        self.max_retries = 0 if llm_config.get('endpoints') else 2
+
+        self.endpoints: List[LLMEndpoint] = []
+        self._add_endpoint("primary", llm_config, llm_config)
+        for i, settings in enumerate(llm_config.get('endpoints', []) or []):
+            settings = settings or {}
+            inherited_keys = ['provider']
+            same_service = (
+                settings.get('provider', llm_config.get('provider')) == llm_config.get('provider')
+                and settings.get('endpoint') == llm_config.get('endpoint')
+            )
+            if same_service:
+                inherited_keys += ['model', 'api_key']
+            inherited = {key: llm_config.get(key) for key in inherited_keys if llm_config.get(key)}
+            inherited.update(settings)
+            name = inherited.get('name') or f"endpoint_{i + 1}"
+            if not inherited.get('model'):
+                if self.logger:
+                    self.logger.warning(f"LLM端点 {name} 未配置model，已跳过")
+                continue
+            # 与主端点默认模型相同的备用端点继承 llm.stage_models，自身配置的阶段模型优先
+            if inherited.get('model') == llm_config.get('model'):
+                inherited['stage_models'] = {
+                    **(llm_config.get('stage_models') or {}),
+                    **(settings.get('stage_models') or {}),
+                }
+            self._add_endpoint(name, inherited, llm_config)
+
+    def _add_endpoint(self, name: str, settings: Dict[str, Any], defaults: Dict[str, Any]):
+        try:
+            endpoint = LLMEndpoint(name, settings, defaults, self.max_retries)
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"初始化LLM端点 {name} 失败: {e}")
+            return
+        if endpoint.client is None:
+            if self.logger:
+                self.logger.warning(f"LLM端点 {name} 缺少API密钥或endpoint，已跳过")
+            return
+        self.endpoints.append(endpoint)
+
+    @property
+    def primary(self) -> Optional[LLMEndpoint]:
+        """第一个可用端点"""
+        return self.endpoints[0] if self.endpoints else None
+
+    def _score(self, endpoint: LLMEndpoint, stage: str, prior: float) -> float:
+        latency = endpoint.ewma_latency.get(stage, prior)
+        return latency * (1 + self.error_penalty * endpoint.ewma_error_rate)
+
+    def _latency_prior(self, stage: str) -> float:
+        """未测量端点的中性延迟：已测量端点的平均延迟，都未测量时为1秒"""
+        measured = [endpoint.ewma_latency[stage] for endpoint in self.endpoints if stage in endpoint.ewma_latency]
+        return sum(measured) / len(measured) if measured else 1.0
+
+    def candidates(self, stage: str) -> List[LLMEndpoint]:
+        """
+        按优先级返回本次调用依次尝试的端点
+
+        Args:
+            stage: 调用阶段（见 STAGES）
+
+        Returns:
+            端点列表：健康端点按得分排序，冷却中的端点按冷却结束时间排在最后
+        """
+        order = {id(endpoint): i for i, endpoint in enumerate(self.endpoints)}
+        healthy = [endpoint for endpoint in self.endpoints if endpoint.is_healthy()]
+        cooling = [endpoint for endpoint in self.endpoints if not endpoint.is_healthy()]
+        prior = self._latency_prior(stage)
+        healthy.sort(key=lambda endpoint: (self._score(endpoint, stage, prior), order[id(endpoint)]))
+        cooling.sort(key=lambda endpoint: endpoint.cooldown_until)
+        return healthy + cooling
+
+    def record_success(self, endpoint: LLMEndpoint, stage: str, latency: float):
+        endpoint.record_success(stage, latency, self.alpha)
+
+    def record_failure(self, endpoint: LLMEndpoint, error: Exception):
+        endpoint.record_failure(error, self.alpha, self.failure_threshold, self.cooldown)
+        if self.logger:
+            state = "，进入冷却" if not endpoint.is_healthy() else ""
+            self.logger.warning(f"LLM端点 {endpoint.name} 调用失败{state}: {error}")
+
+    async def aclose(self):
+        """关闭所有端点在当前事件循环上的异步客户端"""
+        for endpoint in self.endpoints:
+            await endpoint.aclose()
+
+    def close(self):
+        """关闭所有端点的客户端（路由器被替换时调用）"""
+        for endpoint in self.endpoints:
+            endpoint.close()
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """各端点的路由统计"""
+        return [endpoint.get_stats() for endpoint in self.endpoints]
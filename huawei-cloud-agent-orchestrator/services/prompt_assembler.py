@@ -0,0 +1,230 @@
+"""
+提示词组装器
+按分段token预算组装工作流生成的用户提示词，检索结果越多提示词也不会无限增长
+"""
+
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.config_manager import get_config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 各分段默认token预算，可通过 agent.prompt_budget 覆盖
+DEFAULT_BUDGETS = {
+    "operations": 6000,
+    "templates": 3000,
+    "architecture_plan": 1000,
+    "examples": 6000,
+}
+
+# 压缩模式下参数描述保留的最大字符数
+COMPRESSED_DESCRIPTION_CHARS = 40
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+_PARAM_LINE_PATTERN = re.compile(r'^(\s*-\s+\S+\s+\([^)]*\)):?\s*(.*)$')
+
+
+def _load_tokenizer() -> Optional[Callable[[str], int]]:
+    """加载本地tokenizer（tiktoken为可选依赖，不可用时返回None）"""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except ImportError:
+        logger.info("未安装tiktoken，使用启发式token估算")
+    except Exception as e:
+        logger.warning(f"加载tiktoken编码失败，使用启发式token估算: {e}")
+    return None
+
+
+def heuristic_tokens(text: str) -> int:
+    """启发式token估算（不依赖分词器）：中日韩字符约1 token/字，其余约4字符/token"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _compact_json(value: Any) -> str:
+    """紧凑JSON序列化（去除缩进和多余空白）"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+class PromptAssembler:
+    """
+    按token预算组装提示词分段
+
+    - 相关API操作：按相似度降序排列，预算内放入完整文档，预算紧张时改用压缩文档（参数描述截断），
+      放不下的低相关操作被丢弃
+    - 参数模板 / 架构计划 / 示例：紧凑JSON序列化，按顺序放入直到预算用尽
+
+    各方法可传入 stats 字典，记录分段的token数、放入/压缩/丢弃数量。
+    """
+
+    def __init__(self):
+        self.config = get_config()
+        self._count_tokens = _load_tokenizer() or heuristic_tokens
+
+    def estimate_tokens(self, text: str) -> int:
+        """估算文本token数"""
+        if not text:
+            return 0
+        return self._count_tokens(text)
+
+    def budget(self, section: str) -> int:
+        """获取分段token预算（agent.prompt_budget.<section>）"""
+        budgets = self.config.get('agent.prompt_budget', {}) or {}
+        return int(budgets.get(section, DEFAULT_BUDGETS[section]))
+
+    def _fill(self, section: str, header: str, candidates: List[Tuple[str, Optional[str]]],
+              stats: Optional[Dict[str, Dict[str, int]]] = None) -> str:
+        """
+        在预算内依次放入候选片段
+
+        Args:
+            section: 分段名称
+            header: 分段标题（计入预算）
+            candidates: [(完整片段, 压缩片段或None)]，按优先级排列
+            stats: 可选，写入本分段统计
+
+        Returns:
+            组装后的分段文本；没有任何片段放入时返回空串
+        """
+        remaining = self.budget(section) - self.estimate_tokens(header)
+        parts = []
+        compressed = 0
+        for full, short in candidates:
+            piece, cost = full, self.estimate_tokens(full)
+            if cost > remaining and short is not None:
+                piece, cost = short, self.estimate_tokens(short)
+            if cost > remaining:
+                continue  # 放不下则跳过，较小的低优先级片段仍可能放入
+            parts.append(piece)
+            remaining -= cost
+            if piece is not full:
+                compressed += 1
+
+        text = header + "".join(parts) if parts else ""
+        if stats is not None:
+            stats[section] = {
+                "tokens": self.estimate_tokens(text),
+                "included": len(parts),
+                "compressed": compressed,
+                "dropped": len(candidates) - len(parts),
+            }
+        return text
+
+    def operations_section(self, relevant_operations: Optional[List[Dict[str, Any]]],
+                           stats: Optional[Dict[str, Dict[str, int]]] = None) -> str:
+        """相关API操作分段（按相似度排序并裁剪）"""
+        if not relevant_operations:
+            return ""
+
+        ranked = sorted(
+            enumerate(relevant_operations),
+            key=lambda item: (-item[1].get('similarity', 0), item[0])
+        )
+        candidates = []
+        seen = set()
+        for _, op in ranked:
+            name = f"{op.get('service_name', '')}.{op.get('operation_name', '')}"
+            if name in seen:
+                continue
+            seen.add(name)
+            document = op.get('document', '')
+            candidates.append((name, document, self.compress_operation_document(document)))
+
+        header = "\n# 相关API操作（含参数定义）\n\n" \
+                 "以下是与用户需求最相关的华为云API操作及其参数定义，请严格使用这些操作和参数：\n\n"
+        return self._fill("operations", header, [
+            (f"## 操作 {i}: {name}\n{document}\n\n", f"## 操作 {i}: {name}\n{short}\n\n")
+            for i, (name, document, short) in enumerate(candidates, 1)
+        ], stats)
+
+    @staticmethod
+    def compress_operation_document(document: str) -> str:
+        """
+        压缩操作文档：参数描述截断，输出参数只保留名称
+
+        Args:
+            document: vector_store 生成的操作文档
+
+        Returns:
+            压缩后的文档
+        """
+        lines = []
+        in_output = False
+        output_names = []
+        for line in document.splitlines():
+            if line.startswith("输出参数"):
+                in_output = True
+                continue
+            if line and not line.startswith(" ") and in_output:
+                in_output = False
+            match = _PARAM_LINE_PATTERN.match(line)
+            if in_output:
+                if match:
+                    output_names.append(match.group(1).strip().lstrip("- ").split(" ")[0])
+                continue
+            if match:
+                signature, description = match.groups()
+                description = description.strip()
+                if len(description) > COMPRESSED_DESCRIPTION_CHARS:
+                    description = description[:COMPRESSED_DESCRIPTION_CHARS] + "…"
+                lines.append(f"{signature}: {description}" if description else signature)
+            else:
+                lines.append(line)
+        if output_names:
+            lines.append(f"输出参数: {', '.join(output_names)}")
+        return "\n".join(lines)
+
+    def templates_section(self, parameter_templates: Optional[Dict[str, Any]],
+                          stats: Optional[Dict[str, Dict[str, int]]] = None) -> str:
+        """参数模板分段（紧凑JSON）"""
+        if not parameter_templates:
+            return ""
+
+        header = "\n# Exact Parameter Templates\n\n" \
+                 "以下是各操作的精确参数结构模板，生成工作流时必须严格遵循这些参数结构：\n\n"
+        return self._fill("templates", header, [
+            (f"## {op_name}\n```json\n{_compact_json(template)}\n```\n\n", None)
+            for op_name, template in parameter_templates.items()
+        ], stats)
+
+    def architecture_section(self, architecture_plan: Optional[Dict[str, Any]],
+                             stats: Optional[Dict[str, Dict[str, int]]] = None) -> str:
+        """架构计划分段（紧凑JSON，超出预算时只保留模式和所需服务）"""
+        if not architecture_plan:
+            return ""
+
+        essentials = {
+            key: architecture_plan[key]
+            for key in ("pattern", "dfx_level", "services_needed")
+            if key in architecture_plan
+        }
+        footer = "\n\n请严格按照上述架构计划生成工作流。\n"
+        return self._fill("architecture_plan", "\n# Architecture Plan\n\n", [
+            (_compact_json(architecture_plan) + footer, _compact_json(essentials) + footer)
+        ], stats)
+
+    def examples_section(self, examples: Optional[List[Dict[str, Any]]],
+                         stats: Optional[Dict[str, Dict[str, int]]] = None) -> str:
+        """示例工作流分段（工作流JSON紧凑化，按顺序放入直到预算用尽）"""
+        if not examples:
+            return ""
+
+        candidates = []
+        for i, example in enumerate(examples, 1):
+            workflow = example.get('workflow', '')
+            try:
+                workflow = _compact_json(json.loads(workflow))
+            except (TypeError, ValueError):
+                pass
+            candidates.append((
+                f"\n## 示例 {i}: {example.get('name', '')}\n"
+                f"用户: {example.get('user_requirement', '')}\n"
+                f"工作流:\n{workflow}\n",
+                None
+            ))
+        return self._fill("examples", "\n# 示例工作流\n\n", candidates, stats)
@@ -0,0 +1,256 @@
+"""
+服务注册表索引
+预先构建服务名与各服务操作名的只读索引（精确映射 + 三元组/前缀索引），
+未知名称按包含关系、词集合和编辑距离排序给出确定的候选，用于注册表验证和自动修正
+"""
+
+import bisect
+import threading
+from collections import Counter
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 候选召回：与查询共享的三元组数不少于查询三元组数的该比例
+MIN_TRIGRAM_OVERLAP = 0.5
+# 候选接受：编辑距离不超过 max(2, 查询长度 × 该比例)，或与查询存在包含关系
+MAX_DISTANCE_RATIO = 0.34
+# 只对三元组重合最多的前若干个召回名称计算编辑距离
+MAX_EDIT_DISTANCE_CHECKS = 16
+# 每个索引缓存的模糊查询结果数（LLM常重复同样的错误名称）
+CANDIDATE_CACHE_SIZE = 1024
+
+
+def normalize_name(name: str) -> str:
+    """名称归一化：小写、去首尾空白、连字符和空格统一为下划线"""
+    return name.strip().lower().replace("-", "_").replace(" ", "_")
+
+
+def _tokens(name: str) -> Tuple[str, ...]:
+    """按下划线切分的词（去掉复数后缀 s），用于词集合比较和动词判断"""
+    return tuple(
+        token[:-1] if len(token) > 3 and token.endswith("s") else token
+        for token in name.split("_") if token
+    )
+
+
+def _trigrams(text: str) -> List[str]:
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def levenshtein(a: str, b: str, max_distance: Optional[int] = None) -> int:
+    """
+    编辑距离（插入/删除/替换）
+
+    Args:
+        max_distance: 可选上限，距离超过上限时提前返回 max_distance + 1
+
+    Returns:
+        编辑距离
+    """
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            cost = previous[j - 1] + (ca != cb)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current.append(cost)
+            if cost < row_min:
+                row_min = cost
+        if max_distance is not None and row_min > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class NameIndex:
+    """
+    名称集合的只读索引
+
+    - 精确查找：归一化名称 -> 规范名称
+    - 候选召回：三元组倒排表 + 有序前缀表（bisect），只对召回的名称计算编辑距离
+    - 候选排序：先按匹配层级（字符串包含 < 词集合包含 < 首词相同 < 其他），
+      再按 (编辑距离, -三元组重合度, 长度差, 名称)，结果与名称集合的输入顺序无关
+    - 自动修正只采用与查询动词（首词）一致或编辑距离不超过1的候选，见 correction
+    """
+
+    __slots__ = ("_exact", "_normalized", "_postings", "_trigram_counts", "_candidate_cache")
+
+    def __init__(self, names: Iterable[str]):
+        exact: Dict[str, str] = {}
+        for name in sorted(set(names)):
+            exact.setdefault(normalize_name(name), name)
+
+        normalized = tuple(sorted(exact))
+        postings: Dict[str, List[int]] = {}
+        trigram_counts = []
+        for i, key in enumerate(normalized):
+            grams = set(_trigrams(key))
+            trigram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+
+        self._exact = MappingProxyType(exact)
+        self._normalized = normalized  # 已排序，供前缀二分查找
+        self._postings = MappingProxyType({gram: tuple(ids) for gram, ids in postings.items()})
+        self._trigram_counts = tuple(trigram_counts)
+        self._candidate_cache: Dict[Tuple[str, int], Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._normalized)
+
+    def __contains__(self, name: str) -> bool:
+        return normalize_name(name) in self._exact
+
+    def get(self, name: str) -> Optional[str]:
+        """精确查找（忽略大小写和连字符/下划线差异），返回规范名称"""
+        return self._exact.get(normalize_name(name))
+
+    def _prefix_matches(self, prefix: str) -> List[int]:
+        start = bisect.bisect_left(self._normalized, prefix)
+        end = bisect.bisect_left(self._normalized, prefix + "\uffff")
+        return list(range(start, end))
+
+    def candidates(self, name: str, limit: int = 5) -> List[str]:
+        """
+        模糊匹配候选
+
+        Args:
+            name: 查询名称
+            limit: 最多返回的候选数
+
+        Returns:
+            按匹配程度降序排列的规范名称；没有足够相近的名称时返回空列表
+        """
+        query = normalize_name(name)
+        if not query:
+            return []
+        cached = self._candidate_cache.get((query, limit))
+        if cached is not None:
+            return list(cached)
+
+        query_grams = set(_trigrams(query))
+        shared = Counter()
+        for gram in query_grams:
+            for i in self._postings.get(gram, ()):
+                shared[i] += 1
+        threshold = max(1, int(len(query_grams) * MIN_TRIGRAM_OVERLAP))
+        recalled = {i for i, count in shared.items() if count >= threshold}
+        recalled.update(self._prefix_matches(query))
+
+        max_distance = max(2, int(len(query) * MAX_DISTANCE_RATIO))
+        query_tokens = _tokens(query)
+        query_token_set = set(query_tokens)
+        ranked: List[Tuple[int, int, float, int, str]] = []
+        checks = 0
+        for i in sorted(recalled, key=lambda i: (-shared.get(i, 0), i)):
+            key = self._normalized[i]
+            key_tokens = _tokens(key)
+            if query in key or key in query:
+                tier = 0
+                distance = abs(len(key) - len(query))  # 包含关系下编辑距离即长度差
+            elif query_token_set <= set(key_tokens) or set(key_tokens) <= query_token_set:
+                # 词集合包含（如 reboot_server / batch_reboot_servers）：不受编辑距离上限约束
+                tier = 1
+                distance = levenshtein(query, key)
+            elif abs(len(key) - len(query)) > max_distance or checks >= MAX_EDIT_DISTANCE_CHECKS:
+                continue
+            elif max(len(query_grams), self._trigram_counts[i]) - shared.get(i, 0) > 3 * max_distance:
+                continue  # 每次编辑至多影响3个三元组，重合度过低时编辑距离必然超限
+            else:
+                checks += 1
+                distance = levenshtein(query, key, max_distance)
+                if distance > max_distance:
+                    continue
+                tier = 2 if key_tokens[:1] == query_tokens[:1] else 3
+            overlap = shared.get(i, 0) / (len(query_grams) + self._trigram_counts[i] - shared.get(i, 0))
+            ranked.append((tier, distance, -overlap, abs(len(key) - len(query)), key))
+
+        ranked.sort()
+        result = tuple(self._exact[key] for *_, key in ranked[:limit])
+        if len(self._candidate_cache) >= CANDIDATE_CACHE_SIZE:
+            self._candidate_cache.clear()
+        self._candidate_cache[(query, limit)] = result
+        return list(result)
+
+    def correction(self, name: str) -> Optional[str]:
+        """
+        可自动修正的候选
+
+        排名第一的候选包含查询的动词（首词，如 reboot_server 的 reboot），或与查询的编辑距离
+        不超过1时返回该候选；否则返回None（如 reboot_server 不会被修正为 resize_server）。
+        """
+        candidates = self.candidates(name, limit=1)
+        if not candidates:
+            return None
+        query = normalize_name(name)
+        key = normalize_name(candidates[0])
+        query_tokens = _tokens(query)
+        if query_tokens and query_tokens[0] in _tokens(key):
+            return candidates[0]
+        if levenshtein(query, key, 1) <= 1:
+            return candidates[0]
+        return None
+
+    def best(self, name: str) -> Optional[str]:
+        """精确匹配或可自动修正的候选（见 correction）"""
+        exact = self.get(name)
+        if exact is not None:
+            return exact
+        return self.correction(name)
+
+
+class RegistryIndex:
+    """
+    服务注册表索引（只读）
+
+    使用示例:
+        index = get_registry_index()
+        service = index.services.get("ECS")                  # "ecs"
+        index.operation_index("ecs").candidates("create_server")   # ["create_servers", ...]
+    """
+
+    def __init__(self, registry):
+        all_services = registry.get_all_services()
+        self.fingerprint = registry.fingerprint
+        self.services = NameIndex(all_services.keys())
+        self._operations = MappingProxyType({
+            name: NameIndex(service.common_operations or [])
+            for name, service in all_services.items()
+        })
+
+    def operation_index(self, service: str) -> NameIndex:
+        """获取服务（规范名称）的操作索引；未知服务返回空索引"""
+        return self._operations.get(service) or _EMPTY_INDEX
+
+
+_EMPTY_INDEX = NameIndex([])
+
+# 全局实例（注册表内容变化时重建）
+_registry_index: Optional[RegistryIndex] = None
+_registry_index_lock = threading.Lock()
+
+
+def get_registry_index() -> RegistryIndex:
+    """获取全局注册表索引实例"""
+    global _registry_index
+    from services.huawei_cloud_service_registry import get_registry
+    registry = get_registry()
+    index = _registry_index
+    if index is None or index.fingerprint != registry.fingerprint:
+        with _registry_index_lock:
+            if _registry_index is None or _registry_index.fingerprint != registry.fingerprint:
+                _registry_index = RegistryIndex(registry)
+            index = _registry_index
+    return index
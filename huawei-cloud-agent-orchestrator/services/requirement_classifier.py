@@ -0,0 +1,400 @@
+"""
+需求分类器
+将用户需求归类到规则引擎的工作流模板（关键词匹配 + 标注需求的向量近邻投票），
+高置信度命中时可直接使用规则模板生成，LLM只用于新颖的需求
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import chromadb
+from chromadb.config import Settings
+
+from utils.config_manager import get_config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+COLLECTION_NAME = "requirement_classifier"
+
+# 规则模板：标签 -> (构建方法, 关键词)。顺序即规则引擎的匹配优先级
+RULE_PATTERNS: "OrderedDict[str, Tuple[str, Tuple[str, ...]]]" = OrderedDict([
+    ("ha_web", ("_create_ha_web_workflow", ('高可用', '负载均衡', 'elb', 'load balanc', 'ha '))),
+    ("web_app", ("_create_web_application_workflow", ('web', '网站', '应用'))),
+    ("cce", ("_create_cce_workflow", ('容器', 'cce', 'kubernetes', 'k8s'))),
+    ("obs", ("_create_obs_workflow", ('存储', 'obs', '桶', 'bucket'))),
+    ("security", ("_create_security_workflow", ('安全', 'waf', '防火墙', '防护'))),
+    ("monitoring", ("_create_monitoring_workflow", ('监控', '告警', 'ces'))),
+    ("gaussdb", ("_create_gaussdb_workflow", ('gaussdb', '高斯'))),
+    ("ecs", ("_create_ecs_workflow", ('ecs', '服务器'))),
+    ("vpc", ("_create_vpc_workflow", ('vpc', '网络'))),
+    ("rds", ("_create_rds_workflow", ('rds', '数据库', 'mysql', 'postgresql'))),
+    # 与高可用模板关键词相同，规则引擎中优先级更低，只能经向量近邻区分
+    ("elb_ecs", ("_create_elb_ecs_workflow", ('负载均衡', 'elb', 'load balanc'))),
+])
+
+# 规则模板都是资源创建类工作流；需求中出现这些操作词时不走快速路径
+NON_PROVISIONING_VERBS_ZH = (
+    '删除', '销毁', '释放', '退订', '停止', '关机', '重启', '启动', '修改', '变更', '更新', '扩容', '缩容',
+    '升级', '迁移', '查询', '查看', '列出', '回滚', '解绑', '卸载', '恢复',
+)
+NON_PROVISIONING_VERBS_EN = (
+    'delete', 'remove', 'destroy', 'release', 'terminate', 'stop', 'shut down', 'shutdown', 'reboot', 'restart',
+    'start', 'resize', 'scale', 'upgrade', 'modify', 'update', 'change', 'migrate', 'list', 'query', 'show',
+    'describe', 'rollback', 'roll back', 'detach', 'unbind', 'restore',
+)
+
+# 各模板创建的主要实例数量（ECS等）；未列出的模板为1
+TEMPLATE_INSTANCE_COUNTS: Dict[str, int] = {"ha_web": 2, "elb_ecs": 2}
+
+_CN_DIGITS = {'一': 1, '二': 2, '两': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+_EN_NUMBERS = {
+    'one': 1, 'a': 1, 'an': 1, 'single': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+}
+_CN_COUNT_PATTERN = re.compile(r'(\d+|[一二两三四五六七八九十]+|多|几|若干)\s*(?:台|个|套|节点|实例|组)')
+_EN_COUNT_PATTERN = re.compile(
+    r'\b(\d+|one|an?|single|two|three|four|five|six|seven|eight|nine|ten|multiple|several|many)\s+'
+    r'(?:[a-z]+\s+)?(?:servers?|instances?|nodes?|vms?|ecs|buckets?|databases?|clusters?|vpcs?)\b'
+)
+
+
+def _parse_count(token: str) -> Optional[int]:
+    """数量词转整数；多/几/若干/multiple 等不确定数量返回None"""
+    if token.isdigit():
+        return int(token)
+    if token in _EN_NUMBERS:
+        return _EN_NUMBERS[token]
+    if token and all(ch in _CN_DIGITS or ch == '十' for ch in token):
+        if '十' not in token:
+            return _CN_DIGITS[token] if len(token) == 1 else None
+        tens, _, ones = token.partition('十')
+        return _CN_DIGITS.get(tens, 1) * 10 + _CN_DIGITS.get(ones, 0)
+    return None
+
+
+def non_provisioning_verbs(requirement: str) -> List[str]:
+    """需求中出现的非创建类操作词（删除、停止、重启、修改等）"""
+    text = requirement.lower()
+    found = [verb for verb in NON_PROVISIONING_VERBS_ZH if verb in requirement]
+    found += [verb for verb in NON_PROVISIONING_VERBS_EN if re.search(rf'\b{re.escape(verb)}\b', text)]
+    return found
+
+
+def requested_counts(requirement: str) -> List[Optional[int]]:
+    """需求中的实例数量（如 "3台ECS" → 3），不确定的数量（多台、several）为None"""
+    text = requirement.lower()
+    tokens = [match.group(1) for match in _CN_COUNT_PATTERN.finditer(text)]
+    tokens += [match.group(1) for match in _EN_COUNT_PATTERN.finditer(text)]
+    return [_parse_count(token) for token in tokens]
+
+
+# 内置标注需求（可通过 agent.rule_fast_path.labelled_requirements 追加）
+DEFAULT_LABELLED_REQUIREMENTS: List[Tuple[str, str]] = [
+    ("ha_web", "搭建高可用Web应用，两台ECS挂载到ELB负载均衡，配置弹性公网IP，后端使用RDS数据库"),
+    ("ha_web", "部署高可用网站架构：VPC、安全组、双ECS、负载均衡、EIP和MySQL数据库"),
+    ("ha_web", "Deploy a highly available web application with two ECS servers behind an ELB and an RDS database"),
+    ("elb_ecs", "创建两台云服务器并通过负载均衡对外提供服务"),
+    ("elb_ecs", "创建VPC和两台ECS，前面加一个ELB负载均衡器"),
+    ("elb_ecs", "Create two ECS instances behind a load balancer in a new VPC"),
+    ("web_app", "部署一个Web应用，创建VPC、子网、安全组和一台ECS服务器"),
+    ("web_app", "搭建一个网站，需要一台云服务器和网络环境"),
+    ("web_app", "Deploy a simple web application on one ECS server in a new VPC"),
+    ("cce", "创建CCE集群并添加一个节点池"),
+    ("cce", "创建一个Kubernetes容器集群"),
+    ("cce", "Create a CCE Kubernetes cluster in a new VPC"),
+    ("obs", "创建一个OBS桶用于存储静态网站文件"),
+    ("obs", "创建对象存储桶"),
+    ("obs", "Create an OBS bucket for backups"),
+    ("security", "为Web应用配置WAF防护策略和防护域名"),
+    ("security", "开启Web应用防火墙保护网站"),
+    ("monitoring", "为云服务器配置CPU使用率监控告警"),
+    ("monitoring", "创建云监控告警规则"),
+    ("gaussdb", "创建一个GaussDB数据库实例"),
+    ("gaussdb", "部署高斯数据库"),
+    ("ecs", "创建一台ECS云服务器"),
+    ("ecs", "创建一台规格为s6.large.2的云服务器"),
+    ("ecs", "Create an ECS instance"),
+    ("vpc", "创建一个VPC和子网"),
+    ("vpc", "创建虚拟私有云网络，CIDR为192.168.0.0/16"),
+    ("vpc", "Create a VPC with one subnet"),
+    ("rds", "创建一个RDS MySQL数据库实例"),
+    ("rds", "创建PostgreSQL数据库"),
+    ("rds", "Create an RDS for MySQL instance"),
+]
+
+
+def keyword_labels(requirement: str) -> List[str]:
+    """按规则引擎优先级返回关键词命中的所有模板标签"""
+    text = requirement.lower()
+    return [label for label, (_, keywords) in RULE_PATTERNS.items() if any(word in text for word in keywords)]
+
+
+def mentioned_services(requirement: str) -> List[str]:
+    """
+    需求中直接提及的服务（服务名/简称作为独立单词出现，或包含服务中文名称）
+
+    Args:
+        requirement: 用户需求
+
+    Returns:
+        服务名列表（注册表顺序）
+    """
+    from services.huawei_cloud_service_registry import get_registry
+    from services.service_dependency_analyzer import SERVICE_CATEGORIES
+
+    text = requirement.lower()
+    services = []
+    for name, service in get_registry().get_all_services().items():
+        category = SERVICE_CATEGORIES.get(name, {})
+        aliases = [name, category.get("short", "").lower()]
+        labels = [service.description, category.get("label", "")]
+        if any(alias and re.search(rf'(?<![a-z]){re.escape(alias)}(?![a-z])', text) for alias in aliases) \
+                or any(label and label in requirement for label in labels):
+            services.append(name)
+    return services
+
+
+@dataclass
+class RequirementClassification:
+    """需求分类结果"""
+    label: Optional[str] = None            # 近邻投票得到的模板标签
+    builder: Optional[str] = None          # 模板构建方法名
+    confidence: float = 0.0                # 与最近的同标签标注需求的相似度
+    margin: float = 0.0                    # confidence 与最近的其他标签需求相似度之差
+    keyword_labels: List[str] = field(default_factory=list)
+    mentioned_services: List[str] = field(default_factory=list)
+    fast_path: bool = False                # 是否可直接使用规则模板
+    reason: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class RequirementClassifier:
+    """
+    需求分类器
+
+    1. 关键词：得到候选模板集合（与规则引擎相同的关键词表）
+    2. 向量近邻：在标注需求集合（余弦距离）中取 top-k，按相似度加权投票
+    3. 近邻标签属于关键词候选、置信度不低于阈值且与其他标签拉开足够差距时，判定可走规则快速路径
+    4. 一致性：需求包含非创建类操作（删除、停止等），或要求的实例数量与模板不符时不走快速路径
+
+    结果按需求文本缓存（LRU），标注集变化时缓存与向量索引一并失效。
+    """
+
+    def __init__(self, persist_directory: str = "./data/vector_db"):
+        self.config = get_config()
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+        self.collection = self._get_or_create_collection()
+        self._lock = threading.Lock()
+        self._indexed_digest: Optional[str] = None
+        # 索引不可用（如嵌入模型无法加载）时记录 (时间, 原因)，重试间隔内直接跳过快速路径，不再访问 Chroma
+        self._index_error: Optional[Tuple[float, str]] = None
+        self._index_retry_interval = 300  # 5分钟
+        self._cache: "OrderedDict[Tuple[str, str], RequirementClassification]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def _get_or_create_collection(self):
+        """获取或创建标注需求集合（余弦距离）"""
+        return self.client.get_or_create_collection(
+            name=COLLECTION_NAME,
+            metadata={
+                "description": "规则模板标注需求索引",
+                "hnsw:space": "cosine"
+            }
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('agent.rule_fast_path.enabled', True))
+
+    @property
+    def confidence_threshold(self) -> float:
+        return float(self.config.get('agent.rule_fast_path.confidence_threshold', 0.8))
+
+    @property
+    def min_margin(self) -> float:
+        return float(self.config.get('agent.rule_fast_path.min_margin', 0.05))
+
+    def labelled_requirements(self) -> List[Tuple[str, str]]:
+        """内置标注需求 + 配置追加的标注需求（忽略未知标签）"""
+        labelled = list(DEFAULT_LABELLED_REQUIREMENTS)
+        for item in self.config.get('agent.rule_fast_path.labelled_requirements', []) or []:
+            label, requirement = item.get('label'), item.get('requirement')
+            if label in RULE_PATTERNS and requirement:
+                labelled.append((label, requirement))
+            else:
+                logger.warning(f"忽略无效的标注需求: {item}")
+        return labelled
+
+    def _ensure_indexed(self, labelled: List[Tuple[str, str]]) -> str:
+        """确保向量索引与当前标注集一致，必要时重建"""
+        digest = hashlib.md5(json.dumps(labelled, ensure_ascii=False).encode("utf-8")).hexdigest()
+        with self._lock:
+            if self._indexed_digest == digest:
+                return digest
+
+            existing = self.collection.get(where={"digest": digest}, include=[])
+            if len(existing["ids"]) != len(labelled):
+                # 条目ID包含摘要，重复写入是幂等的，写入失败时集合中的旧条目也不受影响
+                self.collection.upsert(
+                    ids=[f"labelled_{digest}_{i}" for i in range(len(labelled))],
+                    documents=[requirement for _, requirement in labelled],
+                    metadatas=[{"label": label, "digest": digest} for label, _ in labelled]
+                )
+                try:
+                    self.collection.delete(where={"digest": {"$ne": digest}})
+                except Exception as e:
+                    logger.warning(f"清理旧标注索引失败: {e}")
+                logger.info(f"需求分类索引已重建，共 {len(labelled)} 条标注需求")
+
+            self._indexed_digest = digest
+            self._cache.clear()
+            return digest
+
+    def classify(self, requirement: str) -> RequirementClassification:
+        """
+        分类需求
+
+        Args:
+            requirement: 用户需求
+
+        Returns:
+            分类结果；向量检索失败时 fast_path 为 False
+        """
+        with self._lock:
+            index_error = self._index_error
+        if index_error is not None and time.time() - index_error[0] < self._index_retry_interval:
+            return RequirementClassification(reason=f"分类索引不可用: {index_error[1]}")
+
+        labelled = self.labelled_requirements()
+        try:
+            digest = self._ensure_indexed(labelled)
+        except Exception as e:
+            logger.warning(f"需求分类索引不可用，{self._index_retry_interval}秒内不再重试: {e}")
+            with self._lock:
+                self._index_error = (time.time(), str(e))
+            return RequirementClassification(reason=f"分类索引不可用: {e}")
+        with self._lock:
+            self._index_error = None
+
+        key = (digest, requirement.strip())
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return cached
+            self._misses += 1
+
+        result = self._classify(requirement, digest)
+
+        with self._lock:
+            self._cache[key] = result
+            cache_size = int(self.config.get('agent.rule_fast_path.cache_size', 512))
+            while len(self._cache) > max(cache_size, 0):
+                self._cache.popitem(last=False)
+        return result
+
+    def _classify(self, requirement: str, digest: str) -> RequirementClassification:
+        result = RequirementClassification(
+            keyword_labels=keyword_labels(requirement),
+            mentioned_services=mentioned_services(requirement)
+        )
+        if not result.keyword_labels:
+            result.reason = "无关键词命中"
+            return result
+        verbs = non_provisioning_verbs(requirement)
+        if verbs:
+            result.reason = f"需求包含非创建类操作 {verbs}，规则模板只能创建资源"
+            return result
+
+        neighbors = int(self.config.get('agent.rule_fast_path.neighbors', 5))
+        try:
+            hits = self.collection.query(
+                query_texts=[requirement],
+                n_results=neighbors,
+                where={"digest": digest},
+                include=["metadatas", "distances"]
+            )
+        except Exception as e:
+            logger.warning(f"需求分类向量检索失败，{self._index_retry_interval}秒内不再重试: {e}")
+            with self._lock:
+                self._index_error = (time.time(), str(e))
+            result.reason = f"向量检索失败: {e}"
+            return result
+
+        votes: Dict[str, float] = {}
+        best_similarity: Dict[str, float] = {}
+        for metadata, distance in zip(hits["metadatas"][0], hits["distances"][0]):
+            similarity = max(0.0, 1 - distance)
+            label = metadata["label"]
+            votes[label] = votes.get(label, 0.0) + similarity
+            best_similarity[label] = max(best_similarity.get(label, 0.0), similarity)
+        if not any(votes.values()):
+            result.reason = "无相近的标注需求"
+            return result
+
+        label = max(votes, key=lambda name: (votes[name], best_similarity[name]))
+        result.label = label
+        result.builder = RULE_PATTERNS[label][0]
+        result.confidence = round(best_similarity[label], 4)
+        runner_up = max((value for name, value in best_similarity.items() if name != label), default=0.0)
+        result.margin = round(best_similarity[label] - runner_up, 4)
+
+        if label not in result.keyword_labels:
+            result.reason = f"近邻标签 {label} 与关键词候选 {result.keyword_labels} 不一致"
+        elif result.confidence < self.confidence_threshold:
+            result.reason = f"置信度 {result.confidence:.3f} 低于阈值 {self.confidence_threshold}"
+        elif result.margin < self.min_margin:
+            result.reason = f"与其他模板的相似度差距 {result.margin:.3f} 小于 {self.min_margin}"
+        elif not self._counts_match(label, requirement):
+            result.reason = f"需求中的数量 {requested_counts(requirement)} 与模板 {label} 不符"
+        else:
+            result.fast_path = True
+            result.reason = "命中"
+        return result
+
+    @staticmethod
+    def _counts_match(label: str, requirement: str) -> bool:
+        """需求中的每个数量都是1或模板创建的实例数"""
+        allowed = {1, TEMPLATE_INSTANCE_COUNTS.get(label, 1)}
+        return all(count in allowed for count in requested_counts(requirement))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """分类缓存统计"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "cache_entries": len(self._cache),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+            }
+
+
+# 全局实例
+_requirement_classifier: Optional[RequirementClassifier] = None
+
+
+def get_requirement_classifier() -> RequirementClassifier:
+    """获取全局需求分类器实例"""
+    global _requirement_classifier
+    if _requirement_classifier is None:
+        _requirement_classifier = RequirementClassifier()
+    return _requirement_classifier
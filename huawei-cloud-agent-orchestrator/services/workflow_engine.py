@@ -12,6 +12,7 @@ from concurrent.futures import ThreadPoolExecutor
 
 from models.workflow import Workflow, Task, TaskStatus, WorkflowStatus
 from services.task_executor import TaskExecutor
+from services.workflow_verifier import ADVISORY_ISSUE_CODES, get_workflow_verifier
 from utils.logger import setup_logger
 
 
@@ -67,13 +68,20 @@ class WorkflowEngine:
             task_outputs={}
         )
 
-        # 验证工作流
-        errors = workflow.validate()
-        if errors:
+        # 验证工作流（静态验证：依赖、依赖环、输出引用），避免执行到一半才失败；
+        # 缺少必填参数只作为警告（参数定义的命名可能与模板不一致，以API调用结果为准）
+        issues = await asyncio.to_thread(get_workflow_verifier().verify, workflow)
+        warnings = [issue for issue in issues if issue.code in ADVISORY_ISSUE_CODES]
+        issues = [issue for issue in issues if issue.code not in ADVISORY_ISSUE_CODES]
+        for warning in warnings:
+            self.logger.warning(f"工作流验证警告: {warning.message} [位置: {warning.location}]")
+        if issues:
             return {
                 "execution_id": execution_id,
                 "status": "failed",
-                "errors": errors
+                "errors": [issue.message for issue in issues],
+                "issues": [issue.to_dict() for issue in issues],
+                "warnings": [warning.to_dict() for warning in warnings]
             }
 
         if dry_run:
@@ -81,7 +89,8 @@ class WorkflowEngine:
             return {
                 "execution_id": execution_id,
                 "status": "validated",
-                "message": "工作流验证通过"
+                "message": "工作流验证通过",
+                "warnings": [warning.to_dict() for warning in warnings]
             }
 
         # 更新工作流状态
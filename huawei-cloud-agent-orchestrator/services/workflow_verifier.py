@@ -0,0 +1,417 @@
+"""
+工作流静态验证
+在调用LLM修正或执行之前，于本地检查工作流的结构与参数：
+字段类型、重复任务名、悬空依赖、依赖环、引用非上游任务的输出、缺少必填参数。
+每个问题都带有 JSON Pointer 形式的精确位置（如 /tasks/2/depends_on/0）。
+"""
+
+import re
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from models.workflow import Workflow
+from services.registry_index import normalize_name
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 与 WorkflowEngine._resolve_parameters 的引用语法保持一致
+_OUTPUT_REFERENCE = re.compile(r'{{\s*outputs\.([\w\.]+)\s*}}')
+
+# 操作参数定义提供者：[操作ID] -> {操作ID: input_params}
+SchemaProvider = Callable[[List[str]], Dict[str, Dict[str, Any]]]
+
+# 提示性问题：参数定义来自SDK解析，命名可能与模板写法不一致，执行前只作为警告，不阻止执行
+ADVISORY_ISSUE_CODES = frozenset({"missing_required_parameter"})
+
+
+@dataclass
+class VerificationIssue:
+    """验证问题"""
+    code: str                   # 问题类型，如 dangling_dependency
+    message: str                # 可直接反馈给LLM的描述
+    location: str               # JSON Pointer，如 /tasks/1/parameters/server/name
+    task: Optional[str] = None  # 所属任务名（用于限定修正范围）
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _pointer(*parts: Any) -> str:
+    """拼接 JSON Pointer（RFC 6901 转义）"""
+    return "".join("/" + str(part).replace("~", "~0").replace("/", "~1") for part in parts)
+
+
+def _vector_store_schemas(operation_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """默认参数定义来源：向量数据库元数据中的 input_params"""
+    try:
+        from utils.vector_store import get_vector_store
+        return get_vector_store().get_input_params(operation_ids)
+    except Exception as e:
+        logger.warning(f"读取操作参数定义失败，跳过必填参数检查: {e}")
+        return {}
+
+
+class WorkflowVerifier:
+    """
+    工作流静态验证器
+
+    使用示例:
+        verifier = get_workflow_verifier()
+        fixes = verifier.fix(workflow)          # 可安全在本地完成的修正
+        issues = verifier.verify(workflow)      # 剩余问题
+        for issue in issues:
+            print(issue.location, issue.message)
+    """
+
+    def __init__(self, schema_provider: Optional[SchemaProvider] = None):
+        """
+        初始化验证器
+
+        Args:
+            schema_provider: 参数定义来源，默认读取向量数据库
+        """
+        self.schema_provider = schema_provider or _vector_store_schemas
+
+    def verify(self, workflow: Workflow, check_parameters: bool = True) -> List[VerificationIssue]:
+        """验证 Workflow 对象，见 verify_dict"""
+        return self.verify_dict(workflow.to_dict(), check_parameters=check_parameters)
+
+    def verify_dict(self, workflow_dict: Dict[str, Any], check_parameters: bool = True) -> List[VerificationIssue]:
+        """
+        验证工作流定义
+
+        Args:
+            workflow_dict: 工作流字典（Workflow.to_dict() 或API提交的原始定义）
+            check_parameters: 是否按参数定义检查必填参数
+
+        Returns:
+            问题列表，为空表示验证通过
+        """
+        if not isinstance(workflow_dict, dict):
+            return [VerificationIssue("invalid_workflow", "工作流定义必须是JSON对象", "")]
+        tasks = workflow_dict.get("tasks") or []
+        if not isinstance(tasks, list):
+            return [VerificationIssue("invalid_tasks", "tasks 必须是任务数组", "/tasks")]
+        if not tasks:
+            return [VerificationIssue("no_tasks", "工作流必须至少包含一个任务", "/tasks")]
+
+        issues: List[VerificationIssue] = []
+        tasks = self._check_types(tasks, issues)
+        positions = self._check_names(tasks, issues)
+        graph = self._check_dependencies(tasks, positions, issues)
+        self._check_cycles(tasks, graph, issues)
+        self._check_output_references(tasks, positions, graph, issues)
+        if check_parameters:
+            self._check_required_parameters(tasks, issues)
+        return issues
+
+    def fix(self, workflow: Workflow) -> List[str]:
+        """
+        在本地完成无歧义的修正（原地修改），不需要LLM参与
+
+        - 依赖名仅大小写/连字符不同：改为实际任务名
+        - 参数引用了其他任务的输出但未声明依赖：补充依赖（不会形成环时）
+
+        Returns:
+            修正说明列表
+        """
+        fixes = []
+        names = {task.name for task in workflow.tasks}
+        by_normalized: Dict[str, str] = {}
+        for task in workflow.tasks:
+            by_normalized.setdefault(normalize_name(task.name), task.name)
+
+        for task in workflow.tasks:
+            if not isinstance(task.depends_on, list):
+                continue  # 类型错误由 verify 报告
+            for j, dependency in enumerate(task.depends_on):
+                if not isinstance(dependency, str) or dependency in names:
+                    continue
+                actual = by_normalized.get(normalize_name(dependency))
+                if actual is not None and actual != task.name:
+                    task.depends_on[j] = actual
+                    fixes.append(f"任务 '{task.name}': 依赖 '{dependency}' → '{actual}'")
+
+        graph = {
+            task.name: [d for d in task.depends_on if isinstance(d, str) and d in names]
+            if isinstance(task.depends_on, list) else []
+            for task in workflow.tasks
+        }
+        for task in workflow.tasks:
+            if not isinstance(task.depends_on, list):
+                continue
+            for _, referenced in self._iter_output_references(task.parameters, ()):
+                if referenced == task.name or referenced not in names:
+                    continue
+                if referenced in self._ancestors(task.name, graph):
+                    continue
+                if task.name in self._ancestors(referenced, graph):
+                    continue  # 补充依赖会形成环，交给LLM处理
+                task.depends_on.append(referenced)
+                graph[task.name].append(referenced)
+                fixes.append(f"任务 '{task.name}': 引用了 '{referenced}' 的输出，已补充依赖")
+        return fixes
+
+    # ---------- 各项检查 ----------
+
+    @staticmethod
+    def _check_types(tasks: List[Any], issues: List[VerificationIssue]) -> List[Dict[str, Any]]:
+        """
+        检查任务及 name / depends_on / parameters 的类型，返回供后续检查使用的规范化副本
+
+        类型错误的字段在副本中被清空（任务名为None、依赖为空、参数为空对象），
+        depends_on 中类型错误的元素替换为None以保持下标，后续检查不再重复报告。
+        """
+        checked = []
+        for i, task in enumerate(tasks):
+            if not isinstance(task, dict):
+                issues.append(VerificationIssue("invalid_task", f"第 {i + 1} 个任务必须是JSON对象", _pointer("tasks", i)))
+                checked.append({"name": None, "depends_on": [], "parameters": {}})
+                continue
+            task = dict(task)
+
+            name = task.get("name")
+            if not name:
+                issues.append(VerificationIssue("missing_task_name", f"第 {i + 1} 个任务缺少名称", _pointer("tasks", i, "name")))
+                task["name"] = None
+            elif not isinstance(name, str):
+                issues.append(VerificationIssue("invalid_task_name", f"第 {i + 1} 个任务的名称必须是字符串", _pointer("tasks", i, "name")))
+                task["name"] = None
+            name = task["name"]
+
+            depends_on = task.get("depends_on")
+            if depends_on is None:
+                task["depends_on"] = []
+            elif not isinstance(depends_on, list):
+                issues.append(VerificationIssue(
+                    "invalid_depends_on", f"任务 '{name}': depends_on 必须是任务名数组",
+                    _pointer("tasks", i, "depends_on"), name
+                ))
+                task["depends_on"] = []
+            else:
+                task["depends_on"] = list(depends_on)
+                for j, dependency in enumerate(depends_on):
+                    if not isinstance(dependency, str):
+                        issues.append(VerificationIssue(
+                            "invalid_dependency", f"任务 '{name}': 依赖必须是任务名字符串",
+                            _pointer("tasks", i, "depends_on", j), name
+                        ))
+                        task["depends_on"][j] = None
+
+            parameters = task.get("parameters")
+            if parameters is not None and not isinstance(parameters, dict):
+                issues.append(VerificationIssue(
+                    "invalid_parameters", f"任务 '{name}': parameters 必须是JSON对象",
+                    _pointer("tasks", i, "parameters"), name
+                ))
+                task["parameters"] = {}
+            checked.append(task)
+        return checked
+
+    @staticmethod
+    def _check_names(tasks: List[Dict[str, Any]], issues: List[VerificationIssue]) -> Dict[str, int]:
+        """检查任务名重复（缺失/类型错误已由 _check_types 报告），返回 任务名 -> 首次出现的位置"""
+        positions: Dict[str, int] = {}
+        for i, task in enumerate(tasks):
+            name = task.get("name")
+            if name is None:
+                continue
+            if name in positions:
+                issues.append(VerificationIssue(
+                    "duplicate_task_name",
+                    f"任务 '{name}': 名称与第 {positions[name] + 1} 个任务重复",
+                    _pointer("tasks", i, "name"), name
+                ))
+                continue
+            positions[name] = i
+        return positions
+
+    @staticmethod
+    def _check_dependencies(tasks: List[Dict[str, Any]], positions: Dict[str, int],
+                            issues: List[VerificationIssue]) -> Dict[str, List[str]]:
+        """检查悬空依赖，返回依赖图 任务名 -> [有效依赖]"""
+        graph: Dict[str, List[str]] = {}
+        for i, task in enumerate(tasks):
+            name = task.get("name")
+            valid = []
+            for j, dependency in enumerate(task.get("depends_on") or []):
+                if dependency is None:
+                    continue
+                if dependency in positions:
+                    valid.append(dependency)
+                    continue
+                issues.append(VerificationIssue(
+                    "dangling_dependency",
+                    f"任务 '{name}': 依赖的任务 '{dependency}' 不存在",
+                    _pointer("tasks", i, "depends_on", j), name
+                ))
+            if name and name not in graph:
+                graph[name] = valid
+        return graph
+
+    @staticmethod
+    def _check_cycles(tasks: List[Dict[str, Any]], graph: Dict[str, List[str]], issues: List[VerificationIssue]):
+        """检查依赖环（迭代DFS，每个环在闭合的依赖边处报告一次）"""
+        positions = {}
+        for i, task in enumerate(tasks):
+            positions.setdefault(task.get("name"), i)
+
+        WHITE, GRAY, BLACK = 0, 1, 2
+        color = {name: WHITE for name in graph}
+        for root in graph:
+            if color[root] != WHITE:
+                continue
+            stack: List[Tuple[str, int]] = [(root, 0)]
+            path = [root]
+            color[root] = GRAY
+            while stack:
+                node, edge = stack[-1]
+                dependencies = graph[node]
+                if edge >= len(dependencies):
+                    stack.pop()
+                    path.pop()
+                    color[node] = BLACK
+                    continue
+                stack[-1] = (node, edge + 1)
+                dependency = dependencies[edge]
+                if color[dependency] == WHITE:
+                    color[dependency] = GRAY
+                    stack.append((dependency, 0))
+                    path.append(dependency)
+                elif color[dependency] == GRAY:
+                    cycle = path[path.index(dependency):] + [dependency]
+                    i = positions[node]
+                    j = (tasks[i].get("depends_on") or []).index(dependency)
+                    issues.append(VerificationIssue(
+                        "dependency_cycle",
+                        f"任务 '{node}': 依赖形成环 {' → '.join(cycle)}",
+                        _pointer("tasks", i, "depends_on", j), node
+                    ))
+
+    def _check_output_references(self, tasks: List[Dict[str, Any]], positions: Dict[str, int],
+                                 graph: Dict[str, List[str]], issues: List[VerificationIssue]):
+        """检查 {{ outputs.X.* }} 引用的X是否为该任务的（传递）上游任务"""
+        for i, task in enumerate(tasks):
+            name = task.get("name")
+            ancestors = self._ancestors(name, graph) if name in graph else set()
+            for path, referenced in self._iter_output_references(task.get("parameters") or {}, ()):
+                location = _pointer("tasks", i, "parameters", *path)
+                if referenced not in positions:
+                    issues.append(VerificationIssue(
+                        "undefined_output_reference",
+                        f"任务 '{name}': 参数引用了不存在的任务 '{referenced}' 的输出",
+                        location, name
+                    ))
+                elif referenced == name:
+                    issues.append(VerificationIssue(
+                        "self_output_reference",
+                        f"任务 '{name}': 参数引用了自身的输出",
+                        location, name
+                    ))
+                elif referenced not in ancestors:
+                    issues.append(VerificationIssue(
+                        "non_upstream_output_reference",
+                        f"任务 '{name}': 参数引用了 '{referenced}' 的输出，但 '{referenced}' 不是其上游任务"
+                        f"（需在 depends_on 中直接或间接依赖）",
+                        location, name
+                    ))
+
+    def _check_required_parameters(self, tasks: List[Dict[str, Any]], issues: List[VerificationIssue]):
+        """按向量数据库中的参数定义检查必填参数（一次批量读取所有操作的定义）"""
+        api_tasks = [
+            (i, task) for i, task in enumerate(tasks)
+            if isinstance(task.get("service"), str) and isinstance(task.get("operation"), str)
+            and task["service"] and task["operation"]
+        ]
+        if not api_tasks:
+            return
+        schemas = self.schema_provider([f"{task['service']}:{task['operation']}" for _, task in api_tasks])
+
+        for i, task in api_tasks:
+            input_params = schemas.get(f"{task['service']}:{task['operation']}")
+            if not input_params:
+                continue
+            parameters = task.get("parameters") or {}
+            for param_name, definition in input_params.items():
+                if not isinstance(definition, dict) or not definition.get("required"):
+                    continue
+                for path in self._missing_paths(parameters, param_name.split("."), ()):
+                    issues.append(VerificationIssue(
+                        "missing_required_parameter",
+                        f"任务 '{task.get('name')}': 缺少必填参数 '{param_name}'"
+                        f"（{task['service']}.{task['operation']}）",
+                        _pointer("tasks", i, "parameters", *path), task.get("name")
+                    ))
+
+    # ---------- 工具方法 ----------
+
+    @staticmethod
+    def _ancestors(name: str, graph: Dict[str, List[str]]) -> Set[str]:
+        """任务的全部传递上游（存在环时同样终止）"""
+        seen: Set[str] = set()
+        stack = list(graph.get(name, ()))
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            stack.extend(graph.get(current, ()))
+        return seen
+
+    def _iter_output_references(self, value: Any, path: Tuple[Any, ...]):
+        """遍历参数值，产出 (参数路径, 被引用的任务名)"""
+        if isinstance(value, str):
+            for match in _OUTPUT_REFERENCE.finditer(value):
+                yield path, match.group(1).split(".")[0]
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                yield from self._iter_output_references(item, path + (key,))
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                yield from self._iter_output_references(item, path + (index,))
+
+    def _missing_paths(self, container: Any, segments: List[str], path: Tuple[Any, ...]):
+        """
+        按点分参数名（如 server.nics[].subnet_id）查找缺失位置
+
+        只有父级存在时才检查子级（可选的父对象整体缺失不算缺少子参数）；
+        父级是模板字符串等非对象值时无法静态判断，跳过。参数名比较忽略大小写。
+        """
+        if not isinstance(container, dict):
+            return
+        segment = segments[0]
+        is_array = segment.endswith("[]")
+        key = segment[:-2] if is_array else segment
+        if key not in container:
+            key = next((name for name in container if isinstance(name, str) and name.lower() == key.lower()), key)
+        value = container.get(key)
+
+        if len(segments) == 1:
+            if value is None or value == "":
+                yield path + (key,)
+            return
+        if value is None:
+            return
+        if is_array:
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    yield from self._missing_paths(item, segments[1:], path + (key, index))
+            return
+        yield from self._missing_paths(value, segments[1:], path + (key,))
+
+
+# 全局验证器实例
+_workflow_verifier: Optional[WorkflowVerifier] = None
+_workflow_verifier_lock = threading.Lock()
+
+
+def get_workflow_verifier() -> WorkflowVerifier:
+    """获取全局工作流验证器实例"""
+    global _workflow_verifier
+    if _workflow_verifier is None:
+        with _workflow_verifier_lock:
+            if _workflow_verifier is None:
+                _workflow_verifier = WorkflowVerifier()
+    return _workflow_verifier
@@ -160,38 +160,17 @@ async function generateWorkflow() {
     hideError();
 
     try {
-        const autoExecute = document.getElementById('autoExecute').checked;
-        const explainWorkflow = document.getElementById('explainWorkflow').checked;
-
-        const response = await fetch('/api/auto/generate', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                requirement: requirement,
-                auto_execute: autoExecute,
-                generate_explanation: explainWorkflow
-            })
-        });
-
-        const result = await response.json();
-
-        if (result.success) {
-            currentWorkflow = result.workflow;
-            displayWorkflow(currentWorkflow);
-
-            if (result.explanation) {
-                displayExplanation(result.explanation);
-            }
-
-            if (autoExecute && result.execution) {
-                displayExecutionResult(result.execution);
-            }
-
-            showSuccess('工作流生成成功！');
+        // 解释不随生成请求返回，工作流显示后再按记录ID单独获取
+        const payload = {
+            requirement: requirement,
+            auto_execute: document.getElementById('autoExecute').checked,
+            generate_explanation: false
+        };
+
+        if (window.ReadableStream && window.TextDecoder) {
+            await generateWorkflowStream(payload);
         } else {
-            showError(result.error || '生成失败');
+            await generateWorkflowOnce(payload);
         }
 
     } catch (error) {
@@ -203,6 +182,110 @@ async function generateWorkflow() {
     }
 }
 
+// 一次性生成（不支持流式读取的浏览器）
+async function generateWorkflowOnce(payload) {
+    const response = await fetch('/api/auto/generate', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(payload)
+    });
+
+    const result = await response.json();
+
+    if (result.success) {
+        currentWorkflow = result.workflow;
+        displayWorkflow(currentWorkflow);
+        loadExplanation(result.record_id);
+
+        if (payload.auto_execute && result.execution) {
+            displayExecutionResult(result.execution);
+        }
+
+        showSuccess('工作流生成成功！');
+    } else {
+        showError(result.error || '生成失败');
+    }
+}
+
+// 流式生成：任务一经解析即渲染，最终以验证后的工作流替换
+async function generateWorkflowStream(payload) {
+    const response = await fetch('/api/auto/generate/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(payload)
+    });
+
+    if (!response.ok || !response.body) {
+        const result = await response.json().catch(function() { return {}; });
+        showError(result.error || '生成失败');
+        return;
+    }
+
+    var partial = { name: '生成中...', description: 'AI正在逐个生成任务', tasks: [] };
+    var finished = false;
+
+    function handleEvent(event, data) {
+        if (event === 'stage') {
+            setLoadingStage(data.message);
+        } else if (event === 'task') {
+            partial.tasks.push(data.task);
+            showLoading(false);
+            displayWorkflow(partial);
+        } else if (event === 'workflow') {
+            currentWorkflow = data.workflow;
+            displayWorkflow(currentWorkflow);
+            showLoading(false);
+            loadExplanation(data.record_id);
+            if (data.truncated) {
+                showError('LLM输出被截断，工作流可能不完整');
+            }
+        } else if (event === 'explanation') {
+            displayExplanation(data.explanation);
+        } else if (event === 'execution') {
+            displayExecutionResult(data.execution);
+        } else if (event === 'error') {
+            finished = true;
+            showError(data.error || '生成失败');
+        } else if (event === 'done') {
+            finished = true;
+            showSuccess('工作流生成成功！');
+        }
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    var buffer = '';
+
+    while (true) {
+        const chunk = await reader.read();
+        if (chunk.done) break;
+        buffer += decoder.decode(chunk.value, { stream: true });
+
+        var boundary;
+        while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+            var frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            var event = 'message', dataLines = [];
+            frame.split('\n').forEach(function(line) {
+                if (line.indexOf('event:') === 0) event = line.slice(6).trim();
+                else if (line.indexOf('data:') === 0) dataLines.push(line.slice(5).trim());
+            });
+            if (dataLines.length) {
+                handleEvent(event, JSON.parse(dataLines.join('\n')));
+            }
+        }
+    }
+
+    if (!finished) {
+        showError('连接中断，工作流可能不完整');
+    }
+}
+
 // 显示生成的工作流 — 流程图模式
 function displayWorkflow(workflow) {
     document.getElementById('emptyState').classList.add('d-none');
@@ -479,6 +562,23 @@ function drawFlowLines(canvas, tasks, layers, pos, nameMap, svgW, svgH, startCx,
     });
 }
 
+// 按需获取工作流解释（服务端已缓存时立即返回）
+async function loadExplanation(recordId) {
+    if (!recordId || !document.getElementById('explainWorkflow').checked) {
+        return;
+    }
+
+    try {
+        const response = await fetch('/api/workflows/history/' + encodeURIComponent(recordId) + '/explanation');
+        const result = await response.json();
+        if (result.success && result.explanation) {
+            displayExplanation(result.explanation);
+        }
+    } catch (error) {
+        console.error('获取工作流解释失败:', error);
+    }
+}
+
 // 显示解释
 function displayExplanation(explanation) {
     const explanationDiv = document.getElementById('workflowExplanation');
@@ -561,12 +661,20 @@ function exportWorkflow() {
 function showLoading(show) {
     const overlay = document.getElementById('loadingOverlay');
     if (show) {
+        setLoadingStage('请稍候');
         overlay.classList.remove('d-none');
     } else {
         overlay.classList.add('d-none');
     }
 }
 
+function setLoadingStage(message) {
+    const stage = document.getElementById('loadingStage');
+    if (stage) {
+        stage.textContent = message;
+    }
+}
+
 function showError(message) {
     const errorDiv = document.getElementById('errorState');
     document.getElementById('errorMessage').textContent = message;
@@ -0,0 +1,59 @@
+"""嵌入向量持久化缓存单元测试"""
+
+import pytest
+
+from utils.embedding_cache import EmbeddingCache, embedding_key
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache" / "embeddings.db"))
+    yield cache
+    cache.close()
+
+
+def test_key_depends_on_model_and_text():
+    assert embedding_key("m", "a") == embedding_key("m", "a")
+    assert embedding_key("m", "a") != embedding_key("n", "a")
+    assert embedding_key("m", "ab") != embedding_key("ma", "b")
+
+
+def test_only_missing_texts_are_embedded(cache):
+    embedder = CountingEmbedder()
+    assert cache.embed(["a", "bb"], embedder, "m") == [[1.0, 0.5], [2.0, 0.5]]
+    assert cache.embed(["bb", "ccc", "ccc"], embedder, "m") == [[2.0, 0.5], [3.0, 0.5], [3.0, 0.5]]
+    assert embedder.calls == [["a", "bb"], ["ccc"]]
+    # 同一批中重复的文本只计算一次
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (2, 3)
+    assert cache.count() == 3
+
+
+def test_entries_are_scoped_by_model(cache):
+    embedder = CountingEmbedder()
+    cache.embed(["a"], embedder, "m")
+    cache.embed(["a"], embedder, "n")
+    assert embedder.calls == [["a"], ["a"]]
+    assert cache.count("m") == 1 and cache.count("n") == 1
+
+
+def test_vectors_persist_across_instances(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    first = EmbeddingCache(path)
+    first.put_many("m", ["a"], [[0.25, -1.5]])
+    first.close()
+
+    second = EmbeddingCache(path)
+    try:
+        assert second.get_many("m", ["a", "b"]) == {"a": [0.25, -1.5]}
+    finally:
+        second.close()
@@ -0,0 +1,76 @@
+"""分块并行导入流水线单元测试"""
+
+from utils.embedding_cache import EmbeddingCache
+from utils.ingestion import IngestionPipeline
+
+
+class FakeVectorStore:
+    """记录写入的向量存储；fail_writes 为需要失败的写入次数（按块首个ID计）"""
+
+    embedding_model_name = "fake"
+
+    def __init__(self, batch_size=100, fail_writes=None):
+        self.batch_size = batch_size
+        self.fail_writes = dict(fail_writes or {})
+        self.written = []
+        self.embedded = 0
+
+    def max_batch_size(self):
+        return self.batch_size
+
+    def build_record(self, op):
+        return f"doc {op['operation_id']}", {"operation_id": op["operation_id"]}
+
+    def embed_documents(self, documents):
+        self.embedded += len(documents)
+        return [[float(len(d))] for d in documents]
+
+    def upsert_records(self, ids, documents, metadatas, embeddings):
+        if self.fail_writes.get(ids[0], 0) > 0:
+            self.fail_writes[ids[0]] -= 1
+            raise RuntimeError("write failed")
+        self.written.extend(ids)
+
+
+def operations(count):
+    return ({"operation_id": f"svc:op{i}"} for i in range(count))
+
+
+def test_chunks_are_written_in_order():
+    store = FakeVectorStore()
+    progress = []
+    pipeline = IngestionPipeline(store, chunk_size=7, workers=3, progress_callback=lambda r: progress.append(r.written))
+    report = pipeline.run(operations(50), total=50)
+    assert store.written == [f"svc:op{i}" for i in range(50)]
+    assert (report.total, report.written, report.chunks, report.failed_chunks) == (50, 50, 8, 0)
+    assert progress == sorted(progress) and progress[-1] == 50
+
+
+def test_chunk_size_is_capped_by_store_batch_size():
+    assert IngestionPipeline(FakeVectorStore(batch_size=5), chunk_size=256).chunk_size == 5
+
+
+def test_failed_writes_are_retried():
+    store = FakeVectorStore(fail_writes={"svc:op0": 2})
+    report = IngestionPipeline(store, chunk_size=5, max_retries=2, retry_backoff=0).run(operations(10))
+    assert report.written == 10 and report.failed_ids == []
+
+
+def test_chunk_failing_after_retries_is_reported_and_others_continue():
+    store = FakeVectorStore(fail_writes={"svc:op5": 99})
+    report = IngestionPipeline(store, chunk_size=5, max_retries=1, retry_backoff=0).run(operations(15))
+    assert report.failed_ids == [f"svc:op{i}" for i in range(5, 10)]
+    assert report.written == 10 and report.failed_chunks == 1
+    assert store.written == [f"svc:op{i}" for i in [*range(5), *range(10, 15)]]
+    assert report.to_dict()["failed"] == 5
+
+
+def test_embedding_cache_skips_known_documents(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"))
+    try:
+        store = FakeVectorStore()
+        IngestionPipeline(store, chunk_size=4, embedding_cache=cache).run(operations(8))
+        IngestionPipeline(store, chunk_size=4, embedding_cache=cache).run(operations(10))
+        assert store.embedded == 10
+    finally:
+        cache.close()
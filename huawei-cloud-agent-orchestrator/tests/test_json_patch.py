@@ -0,0 +1,128 @@
+"""JSON Patch (RFC 6902) 单元测试"""
+
+import pytest
+
+from utils.json_patch import JsonPatchError, apply_patch, parse_pointer
+
+DOCUMENT = {
+    "tasks": [
+        {"name": "a", "parameters": {"x": 1}},
+        {"name": "b", "parameters": {}},
+    ],
+    "variables": {"a/b": 1, "m~n": 2},
+}
+
+
+def test_parse_pointer_unescapes_tokens():
+    assert parse_pointer("") == []
+    assert parse_pointer("/variables/a~1b") == ["variables", "a/b"]
+    assert parse_pointer("/variables/m~0n") == ["variables", "m~n"]
+    with pytest.raises(JsonPatchError):
+        parse_pointer("tasks/0")
+
+
+def test_original_document_is_not_modified():
+    apply_patch(DOCUMENT, [{"op": "replace", "path": "/tasks/0/parameters/x", "value": 2}])
+    assert DOCUMENT["tasks"][0]["parameters"]["x"] == 1
+
+
+@pytest.mark.parametrize("patch, check", [
+    ([{"op": "add", "path": "/tasks/1/parameters/y", "value": 3}],
+     lambda d: d["tasks"][1]["parameters"] == {"y": 3}),
+    ([{"op": "add", "path": "/tasks/-", "value": {"name": "c"}}],
+     lambda d: d["tasks"][-1] == {"name": "c"}),
+    ([{"op": "add", "path": "/tasks/0", "value": {"name": "first"}}],
+     lambda d: [t["name"] for t in d["tasks"]] == ["first", "a", "b"]),
+    ([{"op": "remove", "path": "/tasks/0"}],
+     lambda d: [t["name"] for t in d["tasks"]] == ["b"]),
+    ([{"op": "replace", "path": "/variables/a~1b", "value": 9}],
+     lambda d: d["variables"]["a/b"] == 9),
+    ([{"op": "move", "from": "/tasks/0/parameters/x", "path": "/tasks/1/parameters/x"}],
+     lambda d: d["tasks"][0]["parameters"] == {} and d["tasks"][1]["parameters"] == {"x": 1}),
+    ([{"op": "copy", "from": "/tasks/0/parameters", "path": "/tasks/1/parameters"}],
+     lambda d: d["tasks"][1]["parameters"] == {"x": 1}),
+    ([{"op": "test", "path": "/tasks/1/name", "value": "b"}, {"op": "remove", "path": "/tasks/1"}],
+     lambda d: len(d["tasks"]) == 1),
+])
+def test_operations(patch, check):
+    assert check(apply_patch(DOCUMENT, patch))
+
+
+def test_copy_is_independent_of_source():
+    result = apply_patch(DOCUMENT, [
+        {"op": "copy", "from": "/tasks/0/parameters", "path": "/tasks/1/parameters"},
+        {"op": "replace", "path": "/tasks/1/parameters/x", "value": 5},
+    ])
+    assert result["tasks"][0]["parameters"]["x"] == 1
+
+
+def test_operations_apply_in_order():
+    result = apply_patch(DOCUMENT, [
+        {"op": "remove", "path": "/tasks/0"},
+        {"op": "replace", "path": "/tasks/0/name", "value": "renamed"},
+    ])
+    assert [t["name"] for t in result["tasks"]] == ["renamed"]
+
+
+@pytest.mark.parametrize("patch", [
+    {"op": "remove", "path": "/tasks/0"},                                     # 不是数组
+    [{"op": "remove"}],                                                       # 缺少 path
+    [{"op": "remove", "path": 0}],                                            # path 不是字符串
+    [{"op": "add", "path": "/tasks/0"}],                                      # 缺少 value
+    [{"op": "move", "path": "/tasks/0"}],                                     # 缺少 from
+    [{"op": "copy", "from": ["x"], "path": "/tasks/0"}],                      # from 不是字符串
+    [{"op": "rename", "path": "/tasks/0"}],                                   # 不支持的操作
+    [{"op": "remove", "path": "/tasks/2"}],                                   # 下标越界
+    [{"op": "add", "path": "/tasks/3", "value": {}}],                         # 插入位置越界
+    [{"op": "replace", "path": "/tasks/01/name", "value": "x"}],              # 前导零
+    [{"op": "replace", "path": "/tasks/-", "value": {}}],                     # - 只能用于 add
+    [{"op": "remove", "path": "/tasks/0/missing"}],                           # 路径不存在
+    [{"op": "remove", "path": ""}],                                           # 文档根
+    [{"op": "move", "from": "/tasks/0", "path": "/tasks/0/parameters/self"}], # 移动到子路径
+    [{"op": "test", "path": "/tasks/0/name", "value": "b"}],                  # test 不通过
+])
+def test_invalid_patches_raise(patch):
+    with pytest.raises(JsonPatchError):
+        apply_patch(DOCUMENT, patch)
+
+
+class TestPatchScope:
+    """修正补丁只能修改出错的任务（LLMOrchestrationAgent._check_patch_scope）"""
+
+    @pytest.fixture
+    def check(self):
+        from agents.llm_orchestration_agent import LLMOrchestrationAgent
+        return LLMOrchestrationAgent._check_patch_scope
+
+    def test_patch_on_failed_task_is_allowed(self, check):
+        check([{"op": "replace", "path": "/tasks/1/name", "value": "c"}], DOCUMENT, ["b"])
+
+    def test_patch_on_other_task_is_rejected(self, check):
+        with pytest.raises(JsonPatchError):
+            check([{"op": "replace", "path": "/tasks/0/parameters/x", "value": 2}], DOCUMENT, ["b"])
+
+    def test_patch_outside_tasks_is_rejected(self, check):
+        with pytest.raises(JsonPatchError):
+            check([{"op": "replace", "path": "/variables/m~0n", "value": 3}], DOCUMENT, ["a", "b"])
+
+    def test_indices_are_resolved_after_earlier_operations(self, check):
+        document = {"tasks": [{"name": "a"}, {"name": "b"}, {"name": "c"}]}
+        # 删除 a 之后 /tasks/0 指向 b，/tasks/1 指向 c
+        check([
+            {"op": "remove", "path": "/tasks/0"},
+            {"op": "replace", "path": "/tasks/0/name", "value": "b2"},
+        ], document, ["a", "b"])
+        with pytest.raises(JsonPatchError):
+            check([
+                {"op": "remove", "path": "/tasks/0"},
+                {"op": "replace", "path": "/tasks/1/name", "value": "c2"},
+            ], document, ["a", "b"])
+
+    def test_adding_a_whole_task_is_rejected(self, check):
+        with pytest.raises(JsonPatchError):
+            check([{"op": "add", "path": "/tasks/1", "value": {"name": "b"}}], DOCUMENT, ["b"])
+
+    def test_malformed_patch_is_rejected(self, check):
+        for patch in ({"op": "remove"}, ["remove"], [{"op": "remove", "path": None}]):
+            with pytest.raises(JsonPatchError):
+                check(patch, DOCUMENT, ["a"])
@@ -0,0 +1,110 @@
+"""流式JSON解析（IncrementalTaskParser、parse_json_tolerant）单元测试"""
+
+import json
+import random
+
+import pytest
+
+from utils.json_stream import IncrementalTaskParser, parse_json_tolerant
+
+WORKFLOW = {
+    "name": "web",
+    "variables": {"region": "cn-north-4", "note": "braces } ] and \"quotes\""},
+    "tasks": [
+        {"name": "create_vpc", "parameters": {"cidr": "192.168.0.0/16", "tags": [{"k": "v"}]}},
+        {"name": "create_subnet", "depends_on": ["create_vpc"], "parameters": {"text": "a ```json b"}},
+        {"name": "create_ecs", "depends_on": ["create_subnet"], "parameters": {}},
+    ],
+}
+
+
+def split_randomly(text, rng):
+    cuts = sorted(rng.sample(range(1, len(text)), rng.randint(1, 20)))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+class TestIncrementalTaskParser:
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_tasks_complete_with_stable_indices_for_any_chunking(self, seed):
+        text = "```json\n" + json.dumps(WORKFLOW, ensure_ascii=False, indent=2) + "\n```"
+        parser = IncrementalTaskParser()
+        completed = []
+        for chunk in split_randomly(text, random.Random(seed)):
+            completed.extend(parser.feed(chunk))
+        assert completed == list(enumerate(WORKFLOW["tasks"]))
+        assert parser.is_complete
+        assert parser.text == text
+
+    def test_task_is_returned_as_soon_as_it_closes(self):
+        parser = IncrementalTaskParser()
+        assert parser.feed('{"tasks": [{"name": "a"') == []
+        assert parser.feed('}, {"name"') == [(0, {"name": "a"})]
+        assert parser.feed(': "b"}]}') == [(1, {"name": "b"})]
+
+    def test_nested_tasks_key_is_ignored(self):
+        parser = IncrementalTaskParser()
+        completed = parser.feed('{"meta": {"tasks": [{"name": "x"}]}, "tasks": [{"name": "y"}]}')
+        assert completed == [(0, {"name": "y"})]
+
+    def test_truncated_output_is_not_complete(self):
+        parser = IncrementalTaskParser()
+        completed = parser.feed('{"tasks": [{"name": "a"}, {"name": "b", "parameters": {')
+        assert completed == [(0, {"name": "a"})]
+        assert not parser.is_complete
+
+    def test_trailing_comma_inside_task_is_tolerated(self):
+        parser = IncrementalTaskParser()
+        assert parser.feed('{"tasks": [{"name": "a", "depends_on": ["x",],},]}') == [
+            (0, {"name": "a", "depends_on": ["x"]})
+        ]
+
+
+class TestParseJsonTolerant:
+
+    def test_valid_json_needs_no_repairs(self):
+        assert parse_json_tolerant('{"a": [1, 2]}') == ({"a": [1, 2]}, [])
+
+    def test_code_fence_and_trailing_text(self):
+        value, repairs = parse_json_tolerant('Here it is:\n```json\n{"a": 1}\n```\nDone.')
+        assert value == {"a": 1}
+        assert "code_fence" in repairs
+
+    def test_fence_inside_string_is_not_a_code_block(self):
+        value, repairs = parse_json_tolerant('{"doc": "use ```json blocks"} trailing')
+        assert value == {"doc": "use ```json blocks"}
+        assert "code_fence" not in repairs
+
+    def test_trailing_comma(self):
+        value, repairs = parse_json_tolerant('{"a": [1, 2,], "b": 3,}')
+        assert value == {"a": [1, 2], "b": 3}
+        assert repairs == ["trailing_comma"]
+
+    def test_bracket_mismatch(self):
+        value, repairs = parse_json_tolerant('{"a": [1, 2}')
+        assert value == {"a": [1, 2]}
+        assert "bracket_mismatch" in repairs
+
+    def test_extra_closer(self):
+        value, repairs = parse_json_tolerant('{"a": 1}}')
+        assert value == {"a": 1}
+        value, repairs = parse_json_tolerant('{"a": [1]]}')
+        assert value == {"a": [1]}
+        assert "extra_closer" in repairs
+
+    def test_control_character_in_string(self):
+        value, repairs = parse_json_tolerant('{"a": "line1\nline2"} x')
+        assert value == {"a": "line1\nline2"}
+        assert "control_character" in repairs
+
+    def test_truncation_falls_back_to_last_complete_value(self):
+        value, repairs = parse_json_tolerant('{"tasks": [{"name": "a"}, {"name": "b", "params')
+        assert value == {"tasks": [{"name": "a"}, {"name": "b"}]}
+        assert "truncated" in repairs
+
+    def test_truncated_number_is_kept(self):
+        value, _ = parse_json_tolerant('{"a": 1, "b": 23')
+        assert value == {"a": 1, "b": 23}
+
+    def test_no_json(self):
+        assert parse_json_tolerant("sorry, I cannot help") == (None, [])
@@ -0,0 +1,91 @@
+"""LLMRouter 路由排序、冷却与端点继承单元测试"""
+
+import pytest
+
+from services.llm_router import LLMRouter
+
+PRIMARY = {
+    "provider": "custom",
+    "endpoint": "https://primary.example.com/v1",
+    "api_key": "primary-key",
+    "model": "primary-model",
+    "stage_models": {"stage0": "small-model"},
+}
+
+
+def make_router(endpoints, **routing):
+    return LLMRouter({**PRIMARY, "endpoints": endpoints, "routing": routing})
+
+
+def names(endpoints):
+    return [endpoint.name for endpoint in endpoints]
+
+
+@pytest.fixture
+def router():
+    return make_router([
+        {"name": "b", "endpoint": "https://b.example.com/v1", "api_key": "b-key", "model": "b-model"},
+        {"name": "c", "endpoint": "https://c.example.com/v1", "api_key": "c-key", "model": "c-model"},
+    ], failure_threshold=3, cooldown_seconds=30)
+
+
+def test_unmeasured_endpoints_keep_configuration_order(router):
+    assert names(router.candidates("generate")) == ["primary", "b", "c"]
+
+
+def test_faster_endpoint_ranks_first(router):
+    primary, b, c = router.endpoints
+    router.record_success(primary, "generate", 2.0)
+    router.record_success(b, "generate", 0.5)
+    router.record_success(c, "generate", 1.0)
+    assert names(router.candidates("generate")) == ["b", "c", "primary"]
+    # 延迟按阶段统计
+    assert names(router.candidates("stage0")) == ["primary", "b", "c"]
+
+
+def test_failing_unmeasured_endpoint_is_demoted(router):
+    primary, b, c = router.endpoints
+    router.record_success(b, "generate", 1.0)
+    router.record_success(c, "generate", 1.2)
+    router.record_failure(primary, RuntimeError("timeout"))
+    assert names(router.candidates("generate"))[0] == "b"
+    assert names(router.candidates("generate"))[-1] == "primary"
+
+
+def test_failing_endpoint_demoted_before_any_measurement(router):
+    router.record_failure(router.endpoints[0], RuntimeError("timeout"))
+    assert names(router.candidates("generate")) == ["b", "c", "primary"]
+
+
+def test_cooldown_moves_endpoint_last(router):
+    primary, b, c = router.endpoints
+    router.record_success(primary, "generate", 0.1)
+    for _ in range(3):
+        router.record_failure(primary, RuntimeError("timeout"))
+    assert not primary.is_healthy()
+    assert names(router.candidates("generate")) == ["b", "c", "primary"]
+
+    router.record_success(primary, "generate", 0.1)
+    assert primary.is_healthy() and primary.consecutive_failures == 0
+
+
+def test_backup_on_same_service_inherits_key_model_and_stage_models():
+    router = make_router([{"name": "same", "endpoint": PRIMARY["endpoint"]}])
+    backup = router.endpoints[1]
+    assert backup._api_key == "primary-key"
+    assert backup.model == "primary-model"
+    assert backup.model_for("stage0") == "small-model"
+
+
+def test_backup_on_other_service_does_not_inherit_key():
+    router = make_router([
+        {"name": "other", "endpoint": "https://third-party.example.com/v1", "model": "m"},
+        {"name": "other-provider", "provider": "openai", "endpoint": PRIMARY["endpoint"], "model": "m"},
+    ])
+    # 没有自己的密钥，两个端点都被跳过
+    assert names(router.endpoints) == ["primary"]
+
+
+def test_backup_on_other_service_without_model_is_skipped():
+    router = make_router([{"name": "other", "endpoint": "https://third-party.example.com/v1", "api_key": "k"}])
+    assert names(router.endpoints) == ["primary"]
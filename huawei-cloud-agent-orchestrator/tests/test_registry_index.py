@@ -0,0 +1,62 @@
+"""服务注册表名称索引（NameIndex）单元测试"""
+
+import pytest
+
+from services.registry_index import NameIndex, levenshtein, normalize_name
+
+OPERATIONS = [
+    "create_server", "create_servers", "delete_server", "batch_reboot_servers", "batch_stop_servers",
+    "resize_server", "list_servers", "show_server", "create_vpc", "create_subnet",
+]
+
+
+@pytest.fixture
+def index():
+    return NameIndex(OPERATIONS)
+
+
+def test_normalize_and_levenshtein():
+    assert normalize_name(" Create-Server ") == "create_server"
+    assert levenshtein("kitten", "sitting") == 3
+    assert levenshtein("abc", "abc") == 0
+    assert levenshtein("abcdef", "a", max_distance=2) == 3
+
+
+def test_exact_lookup_ignores_case_and_separators(index):
+    assert index.get("Create-Server") == "create_server"
+    assert "CREATE SERVER" in index
+    assert index.get("create_servr") is None
+
+
+def test_ranking_is_independent_of_input_order():
+    assert NameIndex(OPERATIONS).candidates("create_servr") == NameIndex(reversed(OPERATIONS)).candidates(
+        "create_servr"
+    )
+
+
+def test_containment_ranks_first(index):
+    assert index.candidates("reboot_server")[0] == "batch_reboot_servers"
+    assert index.candidates("vpc")[0] == "create_vpc"
+
+
+def test_typo_is_corrected(index):
+    assert index.correction("resize_servr") == "resize_server"
+    assert index.best("create_subnett") == "create_subnet"
+
+
+def test_token_containment_is_corrected_with_same_verb(index):
+    assert index.correction("reboot_server") == "batch_reboot_servers"
+
+
+def test_no_correction_across_verbs(index):
+    # 最接近的名称动词不同时只作为候选提示，交给LLM修正
+    assert index.candidates("stop_serverx")[0] == "show_server"
+    assert index.correction("stop_serverx") is None
+    assert index.candidates("restart_server")[0] == "resize_server"
+    assert index.correction("restart_server") is None
+    assert index.best("remove_server") is None
+
+
+def test_unrelated_name_has_no_candidates(index):
+    assert index.candidates("zzzz_qqqq") == []
+    assert index.best("zzzz_qqqq") is None
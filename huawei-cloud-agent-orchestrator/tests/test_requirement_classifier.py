@@ -0,0 +1,64 @@
+"""规则快速路径一致性检查单元测试"""
+
+import pytest
+
+from services.requirement_classifier import RequirementClassifier, non_provisioning_verbs, requested_counts
+
+
+@pytest.mark.parametrize("requirement", ["删除ECS服务器", "停止ECS服务器", "Reboot the ECS server", "shut down my vm"])
+def test_non_provisioning_verbs_detected(requirement):
+    assert non_provisioning_verbs(requirement)
+
+
+@pytest.mark.parametrize("requirement", ["创建一台ECS云服务器", "Create a scalable web app", "Create a bucket for restored logs"])
+def test_provisioning_requirements_have_no_verbs(requirement):
+    assert non_provisioning_verbs(requirement) == []
+
+
+def test_requested_counts():
+    assert requested_counts("创建3台ECS") == [3]
+    assert requested_counts("创建两台ECS和十二个桶") == [2, 12]
+    assert requested_counts("Create two ECS instances") == [2]
+    assert requested_counts("创建多台服务器") == [None]
+
+
+@pytest.mark.parametrize("label, requirement, expected", [
+    ("ecs", "创建一台ECS", True),
+    ("ecs", "创建3台ECS", False),
+    ("ecs", "创建多台ECS", False),
+    ("ha_web", "两台ECS挂载到ELB", True),
+    ("elb_ecs", "3 servers behind ELB", False),
+])
+def test_counts_match_template(label, requirement, expected):
+    assert RequirementClassifier._counts_match(label, requirement) is expected
+
+
+class _BrokenCollection:
+    """嵌入模型不可用时的集合：任何读写都失败"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            self.calls += 1
+            raise RuntimeError("embedding model unavailable")
+        return fail
+
+
+def test_index_failure_skips_chroma_until_retry_interval(tmp_path):
+    classifier = RequirementClassifier(str(tmp_path))
+    broken = _BrokenCollection()
+    classifier.collection = broken
+
+    first = classifier.classify("创建一台ECS云服务器")
+    calls = broken.calls
+    second = classifier.classify("创建一台ECS云服务器")
+
+    assert not first.fast_path and not second.fast_path
+    assert "分类索引不可用" in second.reason
+    assert calls > 0 and broken.calls == calls
+
+    classifier._index_error = (0.0, "expired")
+    classifier.classify("创建一台ECS云服务器")
+    assert broken.calls > calls
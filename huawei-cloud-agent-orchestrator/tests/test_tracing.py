@@ -0,0 +1,103 @@
+"""生成链路追踪单元测试"""
+
+import asyncio
+import json
+
+import pytest
+
+from utils.tracing import Tracer, current_span, to_otlp
+
+
+class StubConfig:
+    def __init__(self, **values):
+        self.values = values
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer()
+    tracer.config = StubConfig(**{"tracing.enabled": True})
+    return tracer
+
+
+def test_nested_spans_share_trace_and_link_parents(tracer):
+    with tracer.span("plan", request_id="r1") as root:
+        with tracer.span("llm.call", prompt_tokens=10, completion_tokens=5) as child:
+            assert current_span() is child
+        assert current_span() is root
+    assert current_span() is None
+
+    assert child.trace_id == root.trace_id and child.parent_id == root.span_id
+    assert [span.name for span in tracer.get_spans()] == ["llm.call", "plan"]
+    summary, = tracer.list_traces()
+    assert (summary["root"], summary["request_id"], summary["llm_calls"], summary["prompt_tokens"]) == (
+        "plan", "r1", 1, 10
+    )
+
+
+def test_concurrent_tasks_get_separate_children(tracer):
+    async def stage(name):
+        with tracer.span(name):
+            await asyncio.sleep(0)
+            return current_span().parent_id
+
+    async def main():
+        with tracer.span("plan") as root:
+            parents = await asyncio.gather(stage("a"), stage("b"))
+        return root, parents
+
+    root, parents = asyncio.run(main())
+    assert parents == [root.span_id, root.span_id]
+
+
+def test_errors_are_recorded_and_reraised(tracer):
+    with pytest.raises(KeyError):
+        with tracer.span("vector.search"):
+            raise KeyError("x")
+    span, = tracer.get_spans()
+    assert span.status == "error" and "KeyError" in span.error
+    assert tracer.summarize()[0]["errors"] == 1
+
+
+def test_attributes_are_scalar_and_truncated(tracer):
+    with tracer.span("s", items=[1, 2], text="x" * 600, skipped=None) as span:
+        pass
+    assert span.attributes["items"] == "[1, 2]"
+    assert len(span.attributes["text"]) == 503
+    assert "skipped" not in span.attributes
+
+
+def test_disabled_tracer_records_nothing(tracer):
+    tracer.config = StubConfig(**{"tracing.enabled": False})
+    with tracer.span("s"):
+        pass
+    assert tracer.get_spans() == []
+
+
+def test_otlp_export_writes_one_request_per_trace(tracer, tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer.config = StubConfig(**{
+        "tracing.enabled": True, "tracing.export_path": str(path), "tracing.export_format": "otlp"
+    })
+    with tracer.span("plan"):
+        with tracer.span("llm.call", ok=True, tokens=3, ratio=0.5):
+            pass
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [span["name"] for span in spans] == ["llm.call", "plan"]
+    assert spans[0]["parentSpanId"] == spans[1]["spanId"]
+    assert {a["key"]: a["value"] for a in spans[0]["attributes"]} == {
+        "ok": {"boolValue": True}, "tokens": {"intValue": "3"}, "ratio": {"doubleValue": 0.5}
+    }
+
+
+def test_otlp_error_status(tracer):
+    with pytest.raises(RuntimeError):
+        with tracer.span("s"):
+            raise RuntimeError("boom")
+    status = to_otlp(tracer.get_spans())["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["status"]
+    assert status == {"code": 2, "message": "RuntimeError: boom"}
@@ -0,0 +1,147 @@
+"""OperationVectorStore 单元测试（使用字符n-gram哈希嵌入代替嵌入模型，不需要下载模型）"""
+
+import hashlib
+
+import numpy as np
+import pytest
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+from utils.vector_store import OperationVectorStore
+
+
+def make_op(service, operation, description="d"):
+    return {
+        "operation_id": f"{service}:{operation}",
+        "service_name": service,
+        "operation_name": operation,
+        "description": description,
+        "input_params": {},
+        "output_params": {},
+    }
+
+
+def fake_embeddings(documents, dim=64):
+    """字符1-3元组哈希到固定维度并归一化，文本越相近向量越接近"""
+    vectors = []
+    for text in documents:
+        vector = np.zeros(dim, dtype=np.float32)
+        text = text.lower()
+        for n in (1, 2, 3):
+            for i in range(len(text) - n + 1):
+                vector[int(hashlib.md5(text[i:i + n].encode()).hexdigest()[:8], 16) % dim] += 1.0
+        norm = np.linalg.norm(vector)
+        vectors.append(vector / norm if norm else vector)
+    return vectors
+
+
+def open_store(path, monkeypatch):
+    monkeypatch.setattr(ONNXMiniLM_L6_V2, "__call__", lambda self, documents: fake_embeddings(documents))
+    store = OperationVectorStore(str(path))
+    monkeypatch.setattr(store, "embed_documents", lambda documents: [v.tolist() for v in fake_embeddings(documents)])
+    return store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    return open_store(tmp_path, monkeypatch)
+
+
+def changes(summary):
+    return {key: value for key, value in summary.items() if value and key != "error"}
+
+
+def test_sync_adds_updates_and_skips_unchanged(store):
+    assert changes(store.sync_operations([make_op("ecs", "a"), make_op("ecs", "b")], "registry")) == {
+        "added": ["ecs:a", "ecs:b"]
+    }
+    summary = store.sync_operations([make_op("ecs", "a"), make_op("ecs", "b", "new")], "registry")
+    assert changes(summary) == {"unchanged": ["ecs:a"], "updated": ["ecs:b"]}
+
+
+def test_deletion_is_opt_in_and_scoped_to_source(store):
+    store.sync_operations([make_op("ecs", "a"), make_op("ecs", "b")], "registry")
+    store.sync_operations([make_op("ims", "c")], "sdk")
+
+    assert store.sync_operations([make_op("ecs", "a")], "registry")["deleted"] == []
+    assert store.sync_operations([make_op("ecs", "a")], "registry", delete_missing=True)["deleted"] == ["ecs:b"]
+    assert sorted(store.collection.get()["ids"]) == ["ecs:a", "ims:c"]
+
+
+def test_untagged_records_are_adopted_but_never_deleted(store):
+    store.batch_add_operations([make_op("legacy", "x"), make_op("ecs", "a")])
+    summary = store.sync_operations([make_op("ecs", "a")], "registry", delete_missing=True)
+    assert summary["updated"] == ["ecs:a"]
+    assert summary["deleted"] == []
+    assert store.collection.get(ids=["ecs:a"])["metadatas"][0]["source"] == "registry"
+
+
+def test_ids_owned_by_another_source_are_reported_as_conflicts(store):
+    store.sync_operations([make_op("ecs", "a", "from registry")], "registry")
+    for _ in range(2):
+        summary = store.sync_operations([make_op("ecs", "a", "from sdk")], "sdk", delete_missing=True)
+        assert changes(summary) == {"conflicts": ["ecs:a"]}
+    assert changes(store.sync_operations([make_op("ecs", "a", "from registry")], "registry")) == {
+        "unchanged": ["ecs:a"]
+    }
+    metadata = store.collection.get(ids=["ecs:a"])["metadatas"][0]
+    assert metadata["source"] == "registry" and metadata["description"] == "from registry"
+
+
+def test_expired_index_recounts_services_from_ids(tmp_path, monkeypatch):
+    reader = open_store(tmp_path, monkeypatch)
+    writer = open_store(tmp_path, monkeypatch)
+    writer.batch_add_operations([make_op("ecs", "a")])
+    assert reader.lookup_operation("ecs", "a") is not None
+    assert reader.get_service_counts() == {"ecs": 1}
+
+    writer.batch_add_operations([make_op("vpc", "b"), make_op("vpc", "c")])
+    reader._id_index_loaded_at -= reader._id_index_ttl
+    reader._service_counts = None
+    monkeypatch.setattr(reader, "max_batch_size", lambda: 2)  # 分页
+    assert reader.get_service_counts() == {"ecs": 1, "vpc": 2}
+
+
+def test_service_counts_fall_back_to_metadata_for_unparsed_ids(store):
+    store.batch_add_operations([make_op("ecs", "a"), {**make_op("obs", "b"), "operation_id": "legacy-id"}])
+    assert store.get_service_counts() == {"ecs": 1, "obs": 1}
+
+
+def test_lookup_operation_is_exact_and_ignores_case_and_separators(store):
+    store.batch_add_operations([make_op("ecs", "create_server")])
+    hit = store.lookup_operation("ECS", "create-server")
+    assert hit["operation_id"] == "ecs:create_server" and hit["distance"] == 0.0
+    assert store.lookup_operation("ecs", "create_servers") is None
+
+
+def test_search_results_are_cached_until_the_next_write(store):
+    store.batch_add_operations([make_op("ecs", "create_server"), make_op("vpc", "create_vpc")])
+    first = store.search("create server", n_results=1)
+    first[0]["similarity"] = -1  # 调用方修改结果不影响缓存
+    second = store.search("create server", n_results=1)
+    assert second[0]["operation_id"] == "ecs:create_server" and second[0]["similarity"] != -1
+    assert store.get_search_cache_stats()["hits"] == 1
+
+    store.batch_add_operations([make_op("ecs", "create_servers")])
+    store.search("create server", n_results=1)
+    assert store.get_search_cache_stats()["hits"] == 1
+
+
+def test_search_by_service_operations_matches_per_service_search(store):
+    store.batch_add_operations([
+        make_op("ecs", "create_server"), make_op("ecs", "delete_server"), make_op("ecs", "resize_server"),
+        make_op("vpc", "create_vpc"), make_op("vpc", "create_subnet"), make_op("rds", "create_instance"),
+    ])
+    pairs = [
+        {"service": "ecs", "operation": "create_server"},     # 精确命中，不做向量检索
+        {"service": "vpc", "operation": "make_subnet"},
+        {"service": "rds", "operation": "new_instance"},
+        {"service": "vpc", "operation": "make_subnet"},       # 重复的对只检索一次
+        {"service": "", "operation": "ignored"},
+    ]
+    results = store.search_by_service_operations(pairs, n_results_per_op=1)
+
+    expected = ["ecs:create_server"]
+    for service, operation in (("vpc", "make_subnet"), ("rds", "new_instance")):
+        expected += [hit["operation_id"] for hit in store.search(operation, n_results=1, service_filter=service)]
+    assert [hit["operation_id"] for hit in results] == expected
+    assert results[0]["distance"] == 0.0
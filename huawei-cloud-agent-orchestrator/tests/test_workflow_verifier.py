@@ -0,0 +1,167 @@
+"""WorkflowVerifier 单元测试"""
+
+import pytest
+
+from models.workflow import Task, Workflow
+from services.workflow_verifier import WorkflowVerifier
+
+
+def make_task(name, depends_on=None, parameters=None, service=None, operation=None):
+    return {
+        "name": name,
+        "depends_on": depends_on or [],
+        "parameters": parameters or {},
+        "service": service,
+        "operation": operation,
+    }
+
+
+@pytest.fixture
+def verifier():
+    return WorkflowVerifier(schema_provider=lambda operation_ids: {})
+
+
+def codes(issues):
+    return [issue.code for issue in issues]
+
+
+def test_valid_workflow(verifier):
+    workflow = {"tasks": [
+        make_task("vpc"),
+        make_task("ecs", ["vpc"], {"vpc_id": "{{ outputs.vpc.id }}"}),
+    ]}
+    assert verifier.verify_dict(workflow) == []
+
+
+def test_no_tasks(verifier):
+    assert codes(verifier.verify_dict({"tasks": []})) == ["no_tasks"]
+
+
+def test_dependency_cycle(verifier):
+    workflow = {"tasks": [
+        make_task("a", ["c"]),
+        make_task("b", ["a"]),
+        make_task("c", ["b"]),
+    ]}
+    issues = verifier.verify_dict(workflow)
+    assert codes(issues) == ["dependency_cycle"]
+    assert issues[0].location.startswith("/tasks/")
+    assert "→" in issues[0].message
+
+
+def test_self_dependency_is_cycle(verifier):
+    issues = verifier.verify_dict({"tasks": [make_task("a", ["a"])]})
+    assert codes(issues) == ["dependency_cycle"]
+    assert issues[0].location == "/tasks/0/depends_on/0"
+
+
+def test_dangling_dependency(verifier):
+    issues = verifier.verify_dict({"tasks": [make_task("a"), make_task("b", ["a", "missing"])]})
+    assert codes(issues) == ["dangling_dependency"]
+    assert issues[0].location == "/tasks/1/depends_on/1"
+    assert issues[0].task == "b"
+
+
+def test_duplicate_task_name(verifier):
+    issues = verifier.verify_dict({"tasks": [make_task("a"), make_task("a")]})
+    assert codes(issues) == ["duplicate_task_name"]
+    assert issues[0].location == "/tasks/1/name"
+
+
+def test_non_upstream_output_reference(verifier):
+    workflow = {"tasks": [
+        make_task("vpc"),
+        make_task("subnet", ["vpc"]),
+        make_task("ecs", ["vpc"], {"nics": [{"subnet_id": "{{ outputs.subnet.id }}"}]}),
+    ]}
+    issues = verifier.verify_dict(workflow)
+    assert codes(issues) == ["non_upstream_output_reference"]
+    assert issues[0].location == "/tasks/2/parameters/nics/0/subnet_id"
+
+
+def test_transitive_upstream_reference_is_valid(verifier):
+    workflow = {"tasks": [
+        make_task("vpc"),
+        make_task("subnet", ["vpc"]),
+        make_task("ecs", ["subnet"], {"vpc_id": "{{ outputs.vpc.id }}"}),
+    ]}
+    assert verifier.verify_dict(workflow) == []
+
+
+def test_undefined_and_self_output_reference(verifier):
+    workflow = {"tasks": [
+        make_task("a", parameters={"x": "{{ outputs.ghost.id }}", "y": "{{ outputs.a.id }}"}),
+    ]}
+    assert sorted(codes(verifier.verify_dict(workflow))) == ["self_output_reference", "undefined_output_reference"]
+
+
+def test_invalid_shapes_are_reported_not_raised(verifier):
+    workflow = {"tasks": [
+        "not a task",
+        make_task("a"),
+        {"name": "b", "depends_on": "a"},
+        {"name": "c", "depends_on": [["a"], "a"]},
+        {"name": ["d"]},
+        {"name": "e", "parameters": "oops"},
+    ]}
+    issues = verifier.verify_dict(workflow)
+    assert codes(issues) == [
+        "invalid_task", "invalid_depends_on", "invalid_dependency", "invalid_task_name", "invalid_parameters",
+    ]
+    assert issues[2].location == "/tasks/3/depends_on/0"
+
+
+@pytest.mark.parametrize("workflow, code", [
+    ([], "invalid_workflow"),
+    ({"tasks": {"a": {}}}, "invalid_tasks"),
+])
+def test_invalid_workflow_container(verifier, workflow, code):
+    assert codes(verifier.verify_dict(workflow)) == [code]
+
+
+def test_required_parameters_are_case_insensitive():
+    schemas = {"obs:create_bucket": {"Bucket": {"required": True}, "acl": {"required": False}}}
+    verifier = WorkflowVerifier(schema_provider=lambda operation_ids: schemas)
+
+    ok = {"tasks": [make_task("b", parameters={"bucket": "demo"}, service="obs", operation="create_bucket")]}
+    assert verifier.verify_dict(ok) == []
+
+    missing = {"tasks": [make_task("b", service="obs", operation="create_bucket")]}
+    issues = verifier.verify_dict(missing)
+    assert codes(issues) == ["missing_required_parameter"]
+    assert issues[0].location == "/tasks/0/parameters/Bucket"
+    assert verifier.verify_dict(missing, check_parameters=False) == []
+
+
+def test_fix_normalizes_dependency_names(verifier):
+    workflow = Workflow(tasks=[Task(name="create_vpc"), Task(name="create_ecs", depends_on=["Create-VPC"])])
+    fixes = verifier.fix(workflow)
+    assert workflow.tasks[1].depends_on == ["create_vpc"]
+    assert len(fixes) == 1
+    assert verifier.verify(workflow) == []
+
+
+def test_fix_adds_missing_dependency_for_output_reference(verifier):
+    workflow = Workflow(tasks=[
+        Task(name="vpc"),
+        Task(name="ecs", parameters={"vpc_id": "{{ outputs.vpc.id }}"}),
+    ])
+    verifier.fix(workflow)
+    assert workflow.tasks[1].depends_on == ["vpc"]
+    assert verifier.verify(workflow) == []
+
+
+def test_fix_does_not_create_cycle(verifier):
+    workflow = Workflow(tasks=[
+        Task(name="a", depends_on=["b"]),
+        Task(name="b", parameters={"x": "{{ outputs.a.id }}"}),
+    ])
+    assert verifier.fix(workflow) == []
+    assert workflow.tasks[1].depends_on == []
+    assert "non_upstream_output_reference" in codes(verifier.verify(workflow))
+
+
+def test_fix_ignores_invalid_depends_on(verifier):
+    workflow = Workflow(tasks=[Task(name="a"), Task(name="b", depends_on="a")])
+    assert verifier.fix(workflow) == []
+    assert "invalid_depends_on" in codes(verifier.verify(workflow))
@@ -0,0 +1,43 @@
+"""
+异步运行工具
+为同步调用方（脚本/CLI）提供执行协程的统一入口
+"""
+
+import asyncio
+import threading
+from typing import Any, Coroutine, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """获取常驻后台事件循环（首次调用时启动守护线程）"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=_loop.run_forever,
+                name="async-runner",
+                daemon=True
+            )
+            thread.start()
+        return _loop
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """
+    在后台事件循环中执行协程并阻塞等待结果
+
+    后台循环常驻，因此异步HTTP连接池可以在多次同步调用之间复用；
+    即使调用方自身处于事件循环中也可安全使用。
+
+    Args:
+        coro: 待执行的协程
+
+    Returns:
+        协程返回值
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    return future.result()
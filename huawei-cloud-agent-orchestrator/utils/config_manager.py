@@ -47,7 +47,10 @@ class ConfigManager:
                 "endpoint": "",
                 "model": "claude-3-5-sonnet-20241022",
                 "max_tokens": 4096,
-                "temperature": 0.1
+                "temperature": 0.1,
+                "timeout": 120,
+                "max_connections": 20,
+                "max_keepalive_connections": 10
             },
             "huaweicloud": {
                 "ak": os.environ.get("HUAWEICLOUD_SDK_AK", ""),
@@ -7,7 +7,7 @@ import uuid
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
-from sqlalchemy import create_engine, Column, String, Text, Integer, DateTime, Boolean
+from sqlalchemy import create_engine, inspect, text, Column, String, Text, Integer, DateTime, Boolean
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 
 Base = declarative_base()
@@ -28,6 +28,8 @@ class WorkflowRecord(Base):
     services_used = Column(String(512), default="")
     status = Column(String(32), default="generated")
     created_at = Column(DateTime, default=datetime.now)
+    explanation = Column(Text, nullable=True)
+    explanation_hash = Column(String(64), nullable=True, index=True)  # 生成解释时的工作流内容哈希
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -44,6 +46,8 @@ class WorkflowRecord(Base):
     def to_detail_dict(self) -> Dict[str, Any]:
         d = self.to_dict()
         d["workflow_json"] = json.loads(self.workflow_json) if self.workflow_json else {}
+        d["explanation"] = self.explanation
+        d["explanation_hash"] = self.explanation_hash
         return d
 
 
@@ -60,10 +64,25 @@ def init_db():
 
     _engine = create_engine(f"sqlite:///{DB_PATH}", echo=False)
     Base.metadata.create_all(_engine)
+    _migrate_columns(_engine)
     _SessionLocal = sessionmaker(bind=_engine)
     print(f"数据库初始化完成（SQLite: {DB_PATH}）")
 
 
+def _migrate_columns(engine):
+    """为旧版数据库补充新增列（create_all 不会修改已存在的表）"""
+    existing = {column["name"] for column in inspect(engine).get_columns("workflow_records")}
+    with engine.begin() as conn:
+        if "explanation" not in existing:
+            conn.execute(text("ALTER TABLE workflow_records ADD COLUMN explanation TEXT"))
+        if "explanation_hash" not in existing:
+            conn.execute(text("ALTER TABLE workflow_records ADD COLUMN explanation_hash VARCHAR(64)"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_workflow_records_explanation_hash "
+                "ON workflow_records (explanation_hash)"
+            ))
+
+
 def get_session() -> Session:
     if _SessionLocal is None:
         init_db()
@@ -123,3 +142,27 @@ def delete_workflow_record(record_id: str) -> bool:
             session.commit()
             return True
         return False
+
+
+def save_workflow_explanation(record_id: str, content_hash: str, explanation: str) -> bool:
+    """保存工作流解释及其对应的工作流内容哈希"""
+    with get_session() as session:
+        record = session.get(WorkflowRecord, record_id)
+        if not record:
+            return False
+        record.explanation = explanation
+        record.explanation_hash = content_hash
+        session.commit()
+        return True
+
+
+def find_explanation_by_hash(content_hash: str) -> Optional[str]:
+    """按工作流内容哈希查找已生成的解释（任意记录）"""
+    with get_session() as session:
+        record = (
+            session.query(WorkflowRecord)
+            .filter(WorkflowRecord.explanation_hash == content_hash)
+            .filter(WorkflowRecord.explanation.isnot(None))
+            .first()
+        )
+        return record.explanation if record else None
@@ -0,0 +1,167 @@
+"""
+嵌入向量持久化缓存
+按 sha256(模型名 + 文档文本) 把嵌入向量保存在本地 SQLite 中，重新导入时只对文本变化的文档调用嵌入模型
+
+使用示例:
+    cache = get_embedding_cache()
+    embeddings = cache.embed(documents, embedding_function, model_name=EMBEDDING_MODEL_NAME)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_PATH = "./data/embedding_cache.db"
+# 单条 SQL 中的参数上限（SQLite 默认 999）
+_SQL_BATCH = 500
+
+
+def embedding_key(model_name: str, text: str) -> str:
+    """缓存键：sha256(模型名 + NUL + 文本)"""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    内容寻址的嵌入向量缓存
+
+    向量以 float32 字节串保存；同一文本在不同模型下是不同的条目，换模型后旧条目不会被误用。
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        批量读取缓存
+
+        Returns:
+            {文本: 向量}，只包含命中的文本
+        """
+        keys = {embedding_key(model_name, text): text for text in texts}
+        found: Dict[str, List[float]] = {}
+        key_list = list(keys)
+        with self._lock:
+            for start in range(0, len(key_list), _SQL_BATCH):
+                chunk = key_list[start:start + _SQL_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[keys[key]] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model_name: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]]):
+        """批量写入缓存（已存在的键覆盖）"""
+        now = time.time()
+        rows = [
+            (embedding_key(model_name, text), model_name, len(vector), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, embeddings)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def embed(
+        self,
+        texts: Sequence[str],
+        embedding_function: Callable[[List[str]], Any],
+        model_name: str
+    ) -> List[List[float]]:
+        """
+        获取一批文本的嵌入向量：命中的直接读取，未命中的一次批量调用嵌入函数后写入缓存
+
+        Args:
+            texts: 文档文本
+            embedding_function: 嵌入函数（接收文本列表，返回向量列表）
+            model_name: 模型名，参与缓存键
+
+        Returns:
+            与 texts 一一对应的向量
+        """
+        cached = self.get_many(model_name, texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in cached))
+        if missing:
+            computed = [
+                [float(x) for x in vector]
+                for vector in embedding_function(missing)
+            ]
+            self.put_many(model_name, missing, computed)
+            cached.update(zip(missing, computed))
+        logger.info(f"嵌入缓存: {len(texts)} 条文本，新计算 {len(missing)} 条")
+
+        with self._lock:
+            self._hits += len(texts) - len(missing)
+            self._misses += len(missing)
+        return [cached[text] for text in texts]
+
+    def count(self, model_name: Optional[str] = None) -> int:
+        """缓存条目数（可按模型过滤）"""
+        with self._lock:
+            if model_name:
+                row = self._conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model_name,)).fetchone()
+            else:
+                row = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return row[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """本进程内的命中统计"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "path": self.path,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# 全局实例
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache(path: str = DEFAULT_CACHE_PATH) -> EmbeddingCache:
+    """获取全局嵌入缓存实例"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(path)
+    return _embedding_cache
@@ -0,0 +1,138 @@
+"""
+示例工作流向量索引
+为 agent.examples 建立向量索引，生成时只注入与需求最相似的 top-k 个示例
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+import chromadb
+from chromadb.config import Settings
+
+from utils.config_manager import get_config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+COLLECTION_NAME = "agent_examples"
+
+
+class ExampleStore:
+    """
+    示例工作流向量索引
+
+    索引文档为示例名称 + 用户需求，元数据记录示例在 agent.examples 中的下标和示例集摘要。
+    示例集变化（摘要不一致）时在下次查询前自动重建索引：按摘要区分的条目ID做 upsert，
+    查询只匹配当前摘要，集合本身不删除重建，其他进程的并发查询不受影响。
+    """
+
+    def __init__(self, persist_directory: str = "./data/vector_db"):
+        self.config = get_config()
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+        self.collection = self._get_or_create_collection()
+        self._lock = threading.Lock()
+        self._indexed_digest: Optional[str] = None
+
+    def _get_or_create_collection(self):
+        """获取或创建示例集合（余弦距离）"""
+        return self.client.get_or_create_collection(
+            name=COLLECTION_NAME,
+            metadata={
+                "description": "示例工作流索引",
+                "hnsw:space": "cosine"
+            }
+        )
+
+    @staticmethod
+    def _digest(examples: List[Dict[str, Any]]) -> str:
+        return hashlib.md5(
+            json.dumps(examples, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def _ensure_indexed(self, examples: List[Dict[str, Any]], force: bool = False) -> str:
+        """
+        确保索引中有当前示例集的全部条目，必要时写入
+
+        Args:
+            examples: 全部示例
+            force: 忽略本进程的已索引标记，重新检查集合
+        """
+        digest = self._digest(examples)
+        with self._lock:
+            if self._indexed_digest == digest and not force:
+                return digest
+
+            existing = self.collection.get(where={"digest": digest}, include=[])
+            if len(existing["ids"]) != len(examples):
+                # 条目ID包含摘要，重复写入是幂等的，多个进程同时重建也不会互相覆盖
+                self.collection.upsert(
+                    ids=[f"example_{digest}_{i}" for i in range(len(examples))],
+                    documents=[
+                        f"{example.get('name', '')}\n{example.get('user_requirement', '')}"
+                        for example in examples
+                    ],
+                    metadatas=[{"index": i, "digest": digest} for i in range(len(examples))]
+                )
+                # 清理旧示例集的条目（查询按摘要过滤，清理失败不影响结果）
+                try:
+                    self.collection.delete(where={"digest": {"$ne": digest}})
+                except Exception as e:
+                    logger.warning(f"清理旧示例索引失败: {e}")
+                logger.info(f"示例索引已重建，共 {len(examples)} 个示例")
+
+            self._indexed_digest = digest
+            return digest
+
+    def select(self, requirement: str, examples: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """
+        选择与需求最相似的示例
+
+        Args:
+            requirement: 用户需求
+            examples: 全部示例（agent.examples）
+            top_k: 返回数量；不大于0或不小于示例总数时返回全部示例
+
+        Returns:
+            按相似度降序排列的示例列表
+        """
+        if not examples or top_k <= 0 or top_k >= len(examples):
+            return list(examples or [])
+
+        try:
+            for attempt in range(2):
+                # 结果不足说明条目已被使用其他示例集的进程清理，重新检查并写入一次
+                digest = self._ensure_indexed(examples, force=attempt > 0)
+                results = self.collection.query(
+                    query_texts=[requirement],
+                    n_results=top_k,
+                    where={"digest": digest},
+                    include=["metadatas"]
+                )
+                indices = [metadata["index"] for metadata in results["metadatas"][0]]
+                selected = [examples[i] for i in indices if i < len(examples)]
+                if len(selected) >= top_k:
+                    return selected
+            raise RuntimeError(f"示例索引仅返回 {len(selected)} 个结果")
+        except Exception as e:
+            logger.warning(f"示例相似度检索失败，使用前 {top_k} 个示例: {e}")
+            return list(examples[:top_k])
+
+
+# 全局实例
+_example_store: Optional[ExampleStore] = None
+
+
+def get_example_store() -> ExampleStore:
+    """获取全局示例索引实例"""
+    global _example_store
+    if _example_store is None:
+        _example_store = ExampleStore()
+    return _example_store
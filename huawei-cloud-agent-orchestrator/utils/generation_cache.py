@@ -0,0 +1,219 @@
+"""
+工作流生成语义缓存
+按需求文本的向量相似度复用已生成的工作流（存储于 workflow_records），避免重复调用LLM
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Any
+
+import chromadb
+from chromadb.config import Settings
+
+from utils.config_manager import get_config
+from utils.database import get_workflow_record
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+COLLECTION_NAME = "workflow_generation_cache"
+
+
+class WorkflowGenerationCache:
+    """
+    工作流生成语义缓存
+
+    缓存条目 = 需求文本向量 + 作用域元数据(region, prompt_version, model) + workflow_records记录ID。
+    只有作用域完全一致且相似度不低于阈值时才命中；提示词或注册表变化会改变 prompt_version，
+    旧条目因此自然失效，并可通过 invalidate 清理。
+    """
+
+    def __init__(self, persist_directory: str = "./data/vector_db"):
+        self.config = get_config()
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+        self.collection = self._get_or_create_collection()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        logger.info(f"工作流生成缓存初始化完成，当前条目数: {self.collection.count()}")
+
+    def _get_or_create_collection(self):
+        """获取或创建缓存集合（余弦距离，1 - distance 即余弦相似度）"""
+        return self.client.get_or_create_collection(
+            name=COLLECTION_NAME,
+            metadata={
+                "description": "AI生成工作流语义缓存",
+                "hnsw:space": "cosine"
+            }
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('agent.generation_cache.enabled', True))
+
+    @property
+    def similarity_threshold(self) -> float:
+        return float(self.config.get('agent.generation_cache.similarity_threshold', 0.95))
+
+    def _build_where(self, scope: Dict[str, Any]) -> Dict[str, Any]:
+        """作用域 → where 条件；值为列表时匹配其中任一值"""
+        return {"$and": [
+            {key: {"$in": value} if isinstance(value, list) else value}
+            for key, value in sorted(scope.items())
+        ]}
+
+    def lookup(self, requirement: str, scope: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        查找语义相近的已生成工作流
+
+        Args:
+            requirement: 用户需求
+            scope: 作用域（region, prompt_version, model），必须全部一致；值为列表时匹配其中任一值
+
+        Returns:
+            命中时返回 {"record_id", "similarity", "workflow", "model"}，否则返回None
+        """
+        if not self.enabled or any(value == [] for value in scope.values()):
+            return None
+
+        try:
+            results = self.collection.query(
+                query_texts=[requirement],
+                n_results=1,
+                where=self._build_where(scope),
+                include=["metadatas", "distances"]
+            )
+        except Exception as e:
+            logger.warning(f"查询生成缓存失败: {e}")
+            self._record(hit=False)
+            return None
+
+        if not results["ids"] or not results["ids"][0]:
+            self._record(hit=False)
+            return None
+
+        entry_id = results["ids"][0][0]
+        similarity = 1 - results["distances"][0][0]
+        if similarity < self.similarity_threshold:
+            self._record(hit=False)
+            return None
+
+        record_id = results["metadatas"][0][0].get("record_id", entry_id)
+        record = get_workflow_record(record_id)
+        if not record or not record.get("workflow_json"):
+            # 记录已被删除，清理悬空条目
+            self.remove(record_id)
+            self._record(hit=False)
+            return None
+
+        self._record(hit=True)
+        logger.info(f"生成缓存命中: record_id={record_id}, 相似度={similarity:.3f}")
+        return {
+            "record_id": record_id,
+            "similarity": similarity,
+            "workflow": record["workflow_json"],
+            "model": results["metadatas"][0][0].get("model", ""),
+        }
+
+    def store(self, requirement: str, scope: Dict[str, str], record_id: str) -> bool:
+        """
+        写入缓存条目
+
+        Args:
+            requirement: 用户需求
+            scope: 作用域（region, prompt_version, model）
+            record_id: workflow_records 记录ID
+
+        Returns:
+            是否写入成功
+        """
+        if not self.enabled:
+            return False
+
+        try:
+            self.collection.upsert(
+                ids=[record_id],
+                documents=[requirement],
+                metadatas=[{
+                    **scope,
+                    "record_id": record_id,
+                    "created_at": datetime.now().isoformat(),
+                }]
+            )
+            with self._lock:
+                self._stores += 1
+            return True
+        except Exception as e:
+            logger.warning(f"写入生成缓存失败 {record_id}: {e}")
+            return False
+
+    def remove(self, record_id: str) -> bool:
+        """删除指定记录对应的缓存条目"""
+        try:
+            self.collection.delete(ids=[record_id])
+            return True
+        except Exception as e:
+            logger.warning(f"删除生成缓存条目失败 {record_id}: {e}")
+            return False
+
+    def invalidate(self, prompt_version: Optional[str] = None) -> bool:
+        """
+        使缓存失效
+
+        Args:
+            prompt_version: 指定时仅删除其他提示词版本的条目；为None时清空全部
+
+        Returns:
+            是否成功
+        """
+        try:
+            if prompt_version is None:
+                self.client.delete_collection(COLLECTION_NAME)
+                self.collection = self._get_or_create_collection()
+            else:
+                self.collection.delete(where={"prompt_version": {"$ne": prompt_version}})
+            logger.info("工作流生成缓存已失效")
+            return True
+        except Exception as e:
+            logger.error(f"清理生成缓存失败: {e}")
+            return False
+
+    def _record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率统计"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "similarity_threshold": self.similarity_threshold,
+                "entries": self.collection.count(),
+                "hits": self._hits,
+                "misses": self._misses,
+                "stores": self._stores,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+
+# 全局实例
+_generation_cache: Optional[WorkflowGenerationCache] = None
+
+
+def get_generation_cache() -> WorkflowGenerationCache:
+    """获取全局工作流生成缓存实例"""
+    global _generation_cache
+    if _generation_cache is None:
+        _generation_cache = WorkflowGenerationCache()
+    return _generation_cache
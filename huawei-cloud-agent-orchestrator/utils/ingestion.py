@@ -0,0 +1,188 @@
+"""
+向量数据库批量导入流水线
+按固定大小分块读取操作（可以是生成器），在线程池中并行计算嵌入，按块顺序写入并逐块重试，
+输出进度和吞吐量。同时在途的块数有上限，内存占用与目录规模无关。
+
+使用示例:
+    pipeline = IngestionPipeline(get_vector_store(), embedding_cache=get_embedding_cache())
+    report = pipeline.run(iter_operations(), total=len(operations))
+    print(report.to_dict())
+"""
+
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.embedding_cache import EmbeddingCache
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 256
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_RETRIES = 3
+
+
+@dataclass
+class IngestionReport:
+    """导入结果"""
+    total: int = 0
+    written: int = 0
+    chunks: int = 0
+    failed_chunks: int = 0
+    failed_ids: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """写入速度（条/秒）"""
+        return round(self.written / self.elapsed, 1) if self.elapsed else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "written": self.written,
+            "failed": len(self.failed_ids),
+            "chunks": self.chunks,
+            "failed_chunks": self.failed_chunks,
+            "failed_ids": self.failed_ids,
+            "errors": self.errors,
+            "elapsed_seconds": round(self.elapsed, 2),
+            "throughput": self.throughput,
+        }
+
+
+# 一个待写入的块：(操作ID, 文档文本, 元数据, 嵌入向量)
+_Chunk = Tuple[List[str], List[str], List[Dict[str, Any]], List[List[float]]]
+
+
+class IngestionPipeline:
+    """
+    分块并行导入流水线
+
+    - 读取：从操作迭代器中每次取 chunk_size 个（不超过 Chroma 的单批上限）
+    - 嵌入：在 workers 个线程中并行计算（有嵌入缓存时只计算缓存中没有的文本）
+    - 写入：主线程按块顺序 upsert，写入可重复执行，失败时按指数退避重试
+    - 在途块数不超过 2 × workers，超过时先等待最早的块写完
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        workers: int = DEFAULT_WORKERS,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_backoff: float = 0.5,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        progress_callback: Optional[Callable[[IngestionReport], None]] = None
+    ):
+        """
+        Args:
+            vector_store: OperationVectorStore 实例
+            chunk_size: 每块操作数
+            workers: 嵌入线程数
+            max_retries: 每块嵌入/写入的最大重试次数
+            retry_backoff: 首次重试前的等待秒数（之后每次翻倍）
+            embedding_cache: 可选的嵌入缓存
+            progress_callback: 每写完一块调用一次，参数为当前的导入结果
+        """
+        self.vector_store = vector_store
+        self.chunk_size = max(1, min(chunk_size, vector_store.max_batch_size()))
+        self.workers = max(1, workers)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.embedding_cache = embedding_cache
+        self.progress_callback = progress_callback or self._log_progress
+
+    def run(self, operations: Iterable[Dict[str, Any]], total: Optional[int] = None) -> IngestionReport:
+        """
+        执行导入
+
+        Args:
+            operations: 操作字典的可迭代对象（格式同 OperationVectorStore.batch_add_operations）
+            total: 可选的操作总数，仅用于进度显示
+
+        Returns:
+            导入结果（包含写入失败的操作ID）
+        """
+        report = IngestionReport()
+        self._expected_total = total
+        started = time.perf_counter()
+        iterator = iter(operations)
+        pending: "deque[Tuple[List[str], Future]]" = deque()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest") as executor:
+            while True:
+                chunk = list(islice(iterator, self.chunk_size))
+                if chunk:
+                    report.total += len(chunk)
+                    ids = [op.get("operation_id") for op in chunk]
+                    pending.append((ids, executor.submit(self._prepare_chunk, chunk)))
+                if pending and (not chunk or len(pending) >= 2 * self.workers):
+                    ids, future = pending.popleft()
+                    self._write_chunk(ids, future, report)
+                    report.elapsed = time.perf_counter() - started
+                    self.progress_callback(report)
+                if not chunk and not pending:
+                    break
+
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def _prepare_chunk(self, operations: List[Dict[str, Any]]) -> _Chunk:
+        """（工作线程）构建文档和元数据并计算嵌入"""
+        ids, documents, metadatas = [], [], []
+        for op in operations:
+            doc_text, metadata = self.vector_store.build_record(op)
+            ids.append(op.get("operation_id"))
+            documents.append(doc_text)
+            metadatas.append(metadata)
+
+        if self.embedding_cache is not None:
+            embeddings = self._with_retry(
+                lambda: self.embedding_cache.embed(documents, self.vector_store.embed_documents,
+                                                   self.vector_store.embedding_model_name),
+                "计算嵌入"
+            )
+        else:
+            embeddings = self._with_retry(lambda: self.vector_store.embed_documents(documents), "计算嵌入")
+        return ids, documents, metadatas, embeddings
+
+    def _write_chunk(self, ids: List[str], future: Future, report: IngestionReport):
+        """（主线程）等待块准备完成并写入，失败的块记录到结果中"""
+        report.chunks += 1
+        try:
+            chunk_ids, documents, metadatas, embeddings = future.result()
+            self._with_retry(
+                lambda: self.vector_store.upsert_records(chunk_ids, documents, metadatas, embeddings),
+                "写入"
+            )
+        except Exception as e:
+            report.failed_chunks += 1
+            report.failed_ids.extend(ids)
+            report.errors.append(f"{ids[0]} 起的 {len(ids)} 条: {e}")
+            logger.error(f"块写入失败（{ids[0]} 起的 {len(ids)} 条）: {e}")
+            return
+        report.written += len(ids)
+
+    def _with_retry(self, action: Callable[[], Any], what: str) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return action()
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(f"{what}失败，{delay:.1f}秒后重试 ({attempt + 1}/{self.max_retries}): {e}")
+                time.sleep(delay)
+
+    def _log_progress(self, report: IngestionReport):
+        total = self._expected_total or report.total
+        logger.info(
+            f"导入进度: {report.written + len(report.failed_ids)}/{total} "
+            f"(失败 {len(report.failed_ids)}，{report.throughput} 条/秒)"
+        )
@@ -0,0 +1,167 @@
+"""
+JSON Patch 工具
+实现 RFC 6902 的 add/remove/replace/move/copy/test 操作，用于增量修正工作流
+"""
+
+import copy
+from typing import Any, Dict, List, Tuple
+
+
+class JsonPatchError(ValueError):
+    """补丁格式错误或无法应用"""
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """
+    解析 JSON Pointer (RFC 6901)
+
+    Args:
+        pointer: 如 "/tasks/0/parameters/name"，空串表示整个文档
+
+    Returns:
+        路径片段列表
+    """
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"无效的JSON Pointer: {pointer}")
+    return [part.replace("~1", "/").replace("~0", "~") for part in pointer[1:].split("/")]
+
+
+def _array_index(container: list, token: str, allow_end: bool) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise JsonPatchError(f"无效的数组下标: {token}")
+    index = int(token)
+    upper = len(container) if allow_end else len(container) - 1
+    if index > upper:
+        raise JsonPatchError(f"数组下标越界: {token}")
+    return index
+
+
+def _resolve_parent(document: Any, pointer: str) -> Tuple[Any, str]:
+    """定位路径的父容器和最后一个片段"""
+    parts = parse_pointer(pointer)
+    if not parts:
+        raise JsonPatchError("不支持对文档根执行该操作")
+    target = document
+    for token in parts[:-1]:
+        if isinstance(target, dict):
+            if token not in target:
+                raise JsonPatchError(f"路径不存在: {pointer}")
+            target = target[token]
+        elif isinstance(target, list):
+            target = target[_array_index(target, token, allow_end=False)]
+        else:
+            raise JsonPatchError(f"路径不存在: {pointer}")
+    return target, parts[-1]
+
+
+def _get(document: Any, pointer: str) -> Any:
+    if pointer == "":
+        return document
+    parent, token = _resolve_parent(document, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"路径不存在: {pointer}")
+        return parent[token]
+    if isinstance(parent, list):
+        return parent[_array_index(parent, token, allow_end=False)]
+    raise JsonPatchError(f"路径不存在: {pointer}")
+
+
+def _add(document: Any, pointer: str, value: Any) -> Any:
+    if pointer == "":
+        return value
+    parent, token = _resolve_parent(document, pointer)
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(parent, token, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"路径不存在: {pointer}")
+    return document
+
+
+def _remove(document: Any, pointer: str) -> Any:
+    parent, token = _resolve_parent(document, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"路径不存在: {pointer}")
+        del parent[token]
+    elif isinstance(parent, list):
+        del parent[_array_index(parent, token, allow_end=False)]
+    else:
+        raise JsonPatchError(f"路径不存在: {pointer}")
+    return document
+
+
+def _replace(document: Any, pointer: str, value: Any) -> Any:
+    if pointer == "":
+        return value
+    parent, token = _resolve_parent(document, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"路径不存在: {pointer}")
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent[_array_index(parent, token, allow_end=False)] = value
+    else:
+        raise JsonPatchError(f"路径不存在: {pointer}")
+    return document
+
+
+def apply_patch(document: Any, patch: List[Dict[str, Any]]) -> Any:
+    """
+    应用 JSON Patch，原文档不被修改
+
+    Args:
+        document: 原始JSON文档
+        patch: 补丁操作列表，如 [{"op": "replace", "path": "/tasks/0/operation", "value": "create_vpc"}]
+
+    Returns:
+        应用补丁后的新文档
+
+    Raises:
+        JsonPatchError: 补丁格式错误、路径不存在或 test 操作不通过
+    """
+    if not isinstance(patch, list):
+        raise JsonPatchError("补丁必须是操作数组")
+
+    result = copy.deepcopy(document)
+    for operation in patch:
+        if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+            raise JsonPatchError(f"无效的补丁操作: {operation}")
+        op = operation["op"]
+        path = operation["path"]
+        if not isinstance(path, str) or not isinstance(operation.get("from", ""), str):
+            raise JsonPatchError(f"补丁路径必须是字符串: {operation}")
+
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise JsonPatchError(f"{op} 操作缺少 value: {operation}")
+        if op in ("move", "copy") and "from" not in operation:
+            raise JsonPatchError(f"{op} 操作缺少 from: {operation}")
+
+        if op == "add":
+            result = _add(result, path, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            result = _remove(result, path)
+        elif op == "replace":
+            result = _replace(result, path, copy.deepcopy(operation["value"]))
+        elif op == "move":
+            source = operation["from"]
+            if path.startswith(source + "/"):
+                raise JsonPatchError(f"不能将路径移动到其子路径: {source} -> {path}")
+            value = _get(result, source)
+            result = _remove(result, source)
+            result = _add(result, path, value)
+        elif op == "copy":
+            result = _add(result, path, copy.deepcopy(_get(result, operation["from"])))
+        elif op == "test":
+            if _get(result, path) != operation["value"]:
+                raise JsonPatchError(f"test 操作不通过: {path}")
+        else:
+            raise JsonPatchError(f"不支持的补丁操作: {op}")
+
+    return result
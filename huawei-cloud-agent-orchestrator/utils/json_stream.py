@@ -0,0 +1,342 @@
+"""
+流式JSON解析工具
+在LLM流式输出过程中增量解析工作流JSON，任务对象一旦完整即可取出；
+以及对LLM输出JSON的单遍容错解析
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class IncrementalTaskParser:
+    """
+    增量任务解析器
+
+    逐块输入LLM输出文本，跟踪字符串/转义/括号嵌套状态，
+    当顶层对象 "tasks" 数组中的某个元素闭合时立即解析并返回该任务。
+    解析器在遇到第一个 '{' 之前的内容（如 ```json 代码块标记）会被忽略。
+
+    使用示例:
+        parser = IncrementalTaskParser()
+        async for chunk in stream:
+            for index, task in parser.feed(chunk):
+                ...
+        if not parser.is_complete:
+            # 输出被截断
+    """
+
+    def __init__(self, array_key: str = "tasks"):
+        self.array_key = array_key
+        self._buffer: List[str] = []
+        self._length = 0
+        self._stack: List[Dict[str, Any]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_chars: List[str] = []
+        self._started = False
+        self._closed = False
+        self._tasks_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        # 当前未闭合任务在之前各块中的文本
+        self._item_parts: List[str] = []
+        self.tasks: List[Dict[str, Any]] = []
+
+    @property
+    def text(self) -> str:
+        """目前为止收到的完整文本"""
+        if len(self._buffer) > 1:
+            # 合并后保留，重复读取不再重新拼接
+            self._buffer = ["".join(self._buffer)]
+        return self._buffer[0] if self._buffer else ""
+
+    @property
+    def is_complete(self) -> bool:
+        """根对象是否已闭合（False 表示输出可能被截断）"""
+        return self._closed
+
+    def feed(self, chunk: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        输入一段文本
+
+        Args:
+            chunk: 新收到的文本片段
+
+        Returns:
+            本次新完成的任务列表 [(任务序号, 任务对象)]，序号从0开始、在整个输出中连续
+        """
+        if not chunk:
+            return []
+
+        completed = []
+        offset = self._length
+        self._buffer.append(chunk)
+        self._length += len(chunk)
+
+        for i, ch in enumerate(chunk):
+            if self._closed:
+                break
+            position = offset + i
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._on_string_end("".join(self._string_chars))
+                    continue
+                self._string_chars.append(ch)
+                continue
+
+            if not self._started:
+                if ch == '{':
+                    self._started = True
+                    self._stack.append({"type": "{", "key": None, "expect_key": True})
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_chars = []
+            elif ch in '{[':
+                self._on_open(ch, position)
+            elif ch in '}]':
+                task = self._on_close(chunk, offset, position)
+                if task is not None:
+                    completed.append((len(self.tasks) + len(completed), task))
+            elif ch == ':':
+                if self._stack and self._stack[-1]["type"] == '{':
+                    self._stack[-1]["expect_key"] = False
+            elif ch == ',':
+                if self._stack and self._stack[-1]["type"] == '{':
+                    self._stack[-1]["expect_key"] = True
+
+        if self._item_start is not None:
+            self._item_parts.append(chunk[max(self._item_start - offset, 0):])
+        self.tasks.extend(task for _, task in completed)
+        return completed
+
+    def _on_string_end(self, value: str):
+        top = self._stack[-1] if self._stack else None
+        if top is not None and top["type"] == '{' and top["expect_key"]:
+            top["key"] = value
+
+    def _on_open(self, ch: str, position: int):
+        parent = self._stack[-1] if self._stack else None
+        if (ch == '[' and self._tasks_depth is None and len(self._stack) == 1
+                and parent is not None and parent["key"] == self.array_key):
+            self._tasks_depth = len(self._stack) + 1
+        if ch == '{' and self._tasks_depth is not None and len(self._stack) == self._tasks_depth:
+            self._item_start = position
+            self._item_parts = []
+        self._stack.append({"type": ch, "key": None, "expect_key": ch == '{'})
+
+    def _on_close(self, chunk: str, offset: int, position: int) -> Optional[Dict[str, Any]]:
+        if not self._stack:
+            return None
+        self._stack.pop()
+        depth = len(self._stack)
+
+        if depth == 0:
+            self._closed = True
+            return None
+
+        if self._tasks_depth is not None and depth == self._tasks_depth - 1:
+            # tasks 数组本身闭合
+            self._tasks_depth = None
+            return None
+
+        if (self._tasks_depth is not None and depth == self._tasks_depth
+                and self._item_start is not None):
+            self._item_parts.append(chunk[max(self._item_start - offset, 0):position - offset + 1])
+            raw = "".join(self._item_parts)
+            self._item_start = None
+            self._item_parts = []
+            return _loads_fragment(raw)
+        return None
+
+
+def _loads_fragment(raw: str) -> Optional[Dict[str, Any]]:
+    """解析单个任务片段（容忍尾部逗号）"""
+    try:
+        value = json.loads(raw)
+    except json.JSONDecodeError:
+        try:
+            value = json.loads(re.sub(r',\s*([}\]])', r'\1', raw))
+        except json.JSONDecodeError:
+            return None
+    return value if isinstance(value, dict) else None
+
+
+# 代码块标记只在行首（允许缩进）识别，字符串值中的 ``` 不会被当作代码块
+_FENCE_PATTERN = re.compile(r'^[ \t]*```', re.MULTILINE)
+_PRIMITIVE_PATTERN = re.compile(r'^(true|false|null|-?\d+(\.\d+)?([eE][+-]?\d+)?)$')
+_STRING_CONTROL_ESCAPES = {'\n': '\\n', '\r': '\\r', '\t': '\\t'}
+
+
+def parse_json_tolerant(text: str) -> Tuple[Optional[Any], List[str]]:
+    """
+    单遍容错解析LLM输出中的JSON
+
+    整段文本本身是合法的JSON对象/数组时直接返回；否则一次扫描内完成：
+    提取行首 ``` 开始的代码块、定位首个 { 或 [、去除尾部逗号、修正括号错配、
+    丢弃多余闭合括号、转义字符串内的控制字符；输出被截断时回退到最后一个完整值并补全括号。
+    根值闭合后的文本（如代码块结束标记、解释文字）被忽略。
+
+    Args:
+        text: LLM原始输出
+
+    Returns:
+        (解析结果, 应用的修复列表)；无法解析时结果为None。修复项取值:
+        code_fence, trailing_comma, bracket_mismatch, extra_closer, control_character, truncated
+    """
+    try:
+        value = json.loads(text)
+        if isinstance(value, (dict, list)):
+            return value, []
+    except ValueError:
+        pass
+
+    repairs: List[str] = []
+
+    def note(repair: str):
+        if repair not in repairs:
+            repairs.append(repair)
+
+    start = 0
+    fence = _FENCE_PATTERN.search(text)
+    first_value = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    # 首个 { 或 [ 之后才出现的代码块标记属于值后面的说明文字
+    if fence is not None and (first_value < 0 or fence.start() < first_value):
+        note("code_fence")
+        line_end = text.find("\n", fence.end())
+        start = line_end + 1 if line_end >= 0 else fence.end()
+
+    out: List[str] = []
+    stack: List[Dict[str, Any]] = []
+    safe: Optional[Tuple[int, List[str]]] = None
+    in_string = False
+    escape = False
+    primitive: List[str] = []
+    pending_comma = False
+    started = False
+    closed = False
+
+    def mark_safe():
+        nonlocal safe
+        safe = (len(out), [entry["type"] for entry in stack])
+
+    def end_primitive():
+        token = "".join(primitive)
+        primitive.clear()
+        out.append(token)
+        if _PRIMITIVE_PATTERN.match(token):
+            mark_safe()
+
+    for ch in text[start:]:
+        if in_string:
+            if escape:
+                escape = False
+                out.append(ch)
+            elif ch == '\\':
+                escape = True
+                out.append(ch)
+            elif ch == '"':
+                in_string = False
+                out.append(ch)
+                top = stack[-1] if stack else None
+                if top is not None and top["type"] == '{' and top["expect_key"]:
+                    top["expect_key"] = False
+                else:
+                    mark_safe()
+            elif ch in _STRING_CONTROL_ESCAPES:
+                note("control_character")
+                out.append(_STRING_CONTROL_ESCAPES[ch])
+            else:
+                out.append(ch)
+            continue
+
+        if not started:
+            if ch in '{[':
+                started = True
+                stack.append({"type": ch, "expect_key": ch == '{'})
+                out.append(ch)
+                mark_safe()
+            continue
+
+        if ch.isspace():
+            if primitive:
+                end_primitive()
+            continue
+
+        if ch not in '{}[]",:`':
+            if pending_comma:
+                out.append(',')
+                pending_comma = False
+            primitive.append(ch)
+            continue
+
+        if primitive:
+            end_primitive()
+
+        if ch == '`':
+            # 代码块结束标记出现在根值闭合之前：按截断处理
+            break
+
+        if ch == ',':
+            if pending_comma:
+                note("trailing_comma")
+            pending_comma = True
+            if stack and stack[-1]["type"] == '{':
+                stack[-1]["expect_key"] = True
+            continue
+
+        if ch in '}]':
+            if pending_comma:
+                note("trailing_comma")
+                pending_comma = False
+            opener = '{' if ch == '}' else '['
+            if not any(entry["type"] == opener for entry in stack):
+                note("extra_closer")
+                continue
+            while stack[-1]["type"] != opener:
+                note("bracket_mismatch")
+                out.append('}' if stack.pop()["type"] == '{' else ']')
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                closed = True
+                break
+            mark_safe()
+            continue
+
+        if pending_comma:
+            out.append(',')
+            pending_comma = False
+
+        if ch in '{[':
+            # 只有完整的值才作为截断回退点，避免产生空的任务对象
+            stack.append({"type": ch, "expect_key": ch == '{'})
+            out.append(ch)
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch == ':':
+            out.append(ch)
+
+    if not started:
+        return None, repairs
+
+    if not closed:
+        if primitive and not in_string:
+            end_primitive()
+        note("truncated")
+        length, open_types = safe
+        del out[length:]
+        out.extend('}' if t == '{' else ']' for t in reversed(open_types))
+
+    try:
+        return json.loads("".join(out)), repairs
+    except json.JSONDecodeError:
+        return None, repairs
@@ -0,0 +1,378 @@
+"""
+生成链路追踪
+基于 contextvars 的轻量级span追踪：同一HTTP请求（或一次 plan 调用）内的各阶段、LLM调用、
+向量检索和验证自动形成父子关系。结束的span保存在内存环形缓冲区中供管理API查询，
+并可追加写入文件（JSON Lines，或 OpenTelemetry Collector otlpjsonfile 接收器可读取的 OTLP/JSON）。
+
+使用示例:
+    from utils.tracing import trace_span
+
+    with trace_span("vector.search", query=query) as span:
+        results = collection.query(...)
+        span.set_attribute("results", len(results))
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from utils.config_manager import get_config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# 当前span（子span以其为父）
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """一个计时区间，属性值只保存标量（字符串/数字/布尔）"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns",
+                 "attributes", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.status = "ok"
+        self.error: Optional[str] = None
+        for key, value in (attributes or {}).items():
+            self.set_attribute(key, value)
+
+    def set_attribute(self, key: str, value: Any):
+        """设置属性；None忽略，非标量值转为字符串（截断到500字符）"""
+        if value is None:
+            return
+        if not isinstance(value, (str, bool, int, float)):
+            value = json.dumps(value, ensure_ascii=False, default=str)
+        if isinstance(value, str) and len(value) > 500:
+            value = value[:500] + "..."
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"[:500]
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return round((self.end_ns - self.start_ns) / 1e6, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_ns / 1e9,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": dict(self.attributes),
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: List[Span], service_name: str = "huawei-cloud-agent-orchestrator") -> Dict[str, Any]:
+    """
+    转换为 OTLP/JSON 格式（ExportTraceServiceRequest）
+
+    Args:
+        spans: 已结束的span
+
+    Returns:
+        可直接 POST 到 OTLP/HTTP 接收端 /v1/traces 的请求体
+    """
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "orchestrator.tracing"},
+                "spans": [
+                    {
+                        "traceId": span.trace_id,
+                        "spanId": span.span_id,
+                        "parentSpanId": span.parent_id or "",
+                        "name": span.name,
+                        "kind": 1,  # SPAN_KIND_INTERNAL
+                        "startTimeUnixNano": str(span.start_ns),
+                        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                        "attributes": [
+                            {"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()
+                        ],
+                        "status": {"code": 2, "message": span.error} if span.status == "error" else {"code": 1},
+                    }
+                    for span in spans
+                ],
+            }],
+        }]
+    }
+
+
+class Tracer:
+    """
+    追踪器：创建span、保存结束的span、按配置导出
+
+    配置（tracing.*）:
+        enabled: 是否启用（关闭后 trace_span 仍可使用，但不记录）
+        buffer_size: 内存中保留的已结束span数
+        export_path: 非空时追加写入该文件
+        export_format: jsonl（每行一个span）或 otlp（每个追踪的本地根span结束时写一行 OTLP/JSON）
+    """
+
+    def __init__(self):
+        self.config = get_config()
+        self._lock = threading.Lock()
+        self._spans: deque = deque(maxlen=int(self.config.get('tracing.buffer_size', 5000)))
+        self._pending: "OrderedDict[str, List[Span]]" = OrderedDict()  # otlp导出：按追踪暂存
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get('tracing.enabled', True))
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """
+        开始一个span（当前span的子span；没有当前span时开始新的追踪）
+
+        异常会记录到span上并继续抛出。
+        """
+        parent = _current_span.get()
+        span = Span(
+            name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except GeneratorExit:
+            raise  # 流式消费方提前关闭生成器，不算错误
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # 异步生成器在其他上下文中被关闭时无法reset，恢复为父span
+                _current_span.set(parent)
+            span.end_ns = time.time_ns()
+            if self.enabled:
+                self._finish(span, is_root=parent is None)
+
+    def _finish(self, span: Span, is_root: bool):
+        with self._lock:
+            self._spans.append(span)
+        export_path = self.config.get('tracing.export_path', '')
+        if not export_path:
+            return
+        try:
+            if self.config.get('tracing.export_format', 'jsonl') == 'otlp':
+                self._export_otlp(span, is_root, export_path)
+            else:
+                self._write_line(export_path, span.to_dict())
+        except Exception as e:
+            logger.warning(f"导出追踪数据失败: {e}")
+
+    def _export_otlp(self, span: Span, is_root: bool, export_path: str):
+        """同一追踪的span暂存到本地根span结束时一起写出（一行一个 ExportTraceServiceRequest）"""
+        with self._lock:
+            batch = self._pending.setdefault(span.trace_id, [])
+            batch.append(span)
+            if not is_root:
+                while len(self._pending) > 1000:  # 根span未结束的追踪过多时丢弃最旧的
+                    self._pending.popitem(last=False)
+                return
+            self._pending.pop(span.trace_id, None)
+        self._write_line(export_path, to_otlp(batch))
+
+    def _write_line(self, path: str, payload: Dict[str, Any]):
+        line = json.dumps(payload, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    # ---------- 查询 ----------
+
+    def get_spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        """缓冲区中的span（按结束顺序），可按追踪ID过滤"""
+        with self._lock:
+            spans = list(self._spans)
+        if trace_id:
+            spans = [span for span in spans if span.trace_id == trace_id]
+        return spans
+
+    def list_traces(self, limit: int = 50, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        最近的追踪摘要（新的在前）
+
+        Args:
+            limit: 返回数量
+            name: 只返回包含该名称span的追踪
+
+        Returns:
+            [{"trace_id", "root", "request_id", "start_time", "duration_ms", "span_count",
+              "llm_calls", "prompt_tokens", "completion_tokens", "status"}]
+        """
+        traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        for span in self.get_spans():
+            traces.setdefault(span.trace_id, []).append(span)
+
+        summaries = []
+        for trace_id, spans in reversed(traces.items()):
+            if name and not any(span.name == name for span in spans):
+                continue
+            span_ids = {span.span_id for span in spans}
+            root = next((span for span in spans if span.parent_id not in span_ids), spans[0])
+            llm_spans = [span for span in spans if span.name == "llm.call"]
+            summaries.append({
+                "trace_id": trace_id,
+                "root": root.name,
+                "request_id": root.attributes.get("request_id"),
+                "start_time": min(span.start_ns for span in spans) / 1e9,
+                "duration_ms": round((max(span.end_ns for span in spans) - min(span.start_ns for span in spans)) / 1e6, 3),
+                "span_count": len(spans),
+                "llm_calls": len(llm_spans),
+                "prompt_tokens": sum(span.attributes.get("prompt_tokens", 0) for span in llm_spans),
+                "completion_tokens": sum(span.attributes.get("completion_tokens", 0) for span in llm_spans),
+                "status": "error" if any(span.status == "error" for span in spans) else "ok",
+            })
+            if len(summaries) >= limit:
+                break
+        return summaries
+
+    def summarize(self) -> List[Dict[str, Any]]:
+        """
+        按span名称汇总缓冲区中的耗时分布和token数（耗时总和降序），用于定位生成时间花在哪里
+
+        Returns:
+            [{"name", "count", "errors", "total_ms", "mean_ms", "p50_ms", "p95_ms", "max_ms",
+              "prompt_tokens", "completion_tokens"}]
+        """
+        groups: Dict[str, List[Span]] = {}
+        for span in self.get_spans():
+            groups.setdefault(span.name, []).append(span)
+
+        summary = []
+        for name, spans in groups.items():
+            durations = sorted(span.duration_ms for span in spans)
+            summary.append({
+                "name": name,
+                "count": len(spans),
+                "errors": sum(1 for span in spans if span.status == "error"),
+                "total_ms": round(sum(durations), 1),
+                "mean_ms": round(sum(durations) / len(durations), 1),
+                "p50_ms": round(durations[int(0.5 * (len(durations) - 1))], 1),
+                "p95_ms": round(durations[int(round(0.95 * (len(durations) - 1)))], 1),
+                "max_ms": round(durations[-1], 1),
+                "prompt_tokens": sum(span.attributes.get("prompt_tokens", 0) for span in spans),
+                "completion_tokens": sum(span.attributes.get("completion_tokens", 0) for span in spans),
+            })
+        summary.sort(key=lambda item: -item["total_ms"])
+        return summary
+
+    def clear(self):
+        """清空缓冲区"""
+        with self._lock:
+            self._spans.clear()
+            self._pending.clear()
+
+
+# 全局追踪器实例
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """获取全局追踪器实例"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
+
+
+def trace_span(name: str, **attributes):
+    """开始一个span（见 Tracer.span）"""
+    return get_tracer().span(name, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    """当前span（不在任何span内时为None）"""
+    return _current_span.get()
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """
+    请求追踪中间件：为每个API请求开始一个根span，并通过 X-Request-ID 与追踪关联
+
+    请求头带 X-Request-ID 时沿用，否则生成新的ID；响应头返回该ID。
+    流式响应的span在响应体发送完毕后才结束。
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        path = request.url.path
+        if not path.startswith("/api/") or path.startswith("/api/admin/traces"):
+            return await call_next(request)
+
+        request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        request.state.request_id = request_id
+        span_context = trace_span(
+            f"HTTP {request.method} {path}",
+            request_id=request_id,
+            http_method=request.method,
+            http_target=path
+        )
+        span = span_context.__enter__()
+        try:
+            response = await call_next(request)
+        except BaseException as e:
+            span_context.__exit__(type(e), e, e.__traceback__)
+            raise
+
+        span.set_attribute("http_status_code", response.status_code)
+        response.headers[REQUEST_ID_HEADER] = request_id
+        body_iterator = response.body_iterator
+
+        async def traced_body():
+            try:
+                async for chunk in body_iterator:
+                    yield chunk
+            finally:
+                span_context.__exit__(None, None, None)
+
+        response.body_iterator = traced_body()
+        return response
@@ -5,12 +5,29 @@
 
 import chromadb
 from chromadb.config import Settings
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, List, Optional, Any, Tuple
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
+from utils.embedding_cache import EmbeddingCache
 from utils.logger import get_logger
+from utils.tracing import trace_span
 
 logger = get_logger(__name__)
 
+# 多查询检索时单次召回的结果数上限（每个查询）
+MAX_MULTI_QUERY_RESULTS = 100
+
+# 集合使用 Chroma 默认嵌入函数（all-MiniLM-L6-v2），作为嵌入缓存键的模型名
+EMBEDDING_MODEL_NAME = "chroma-default/all-MiniLM-L6-v2"
+
+
+def _normalize_id(operation_id: str) -> str:
+    """操作ID归一化：小写、去首尾空白、连字符和空格统一为下划线"""
+    return operation_id.strip().lower().replace("-", "_").replace(" ", "_")
+
 
 class OperationVectorStore:
     """华为云操作向量存储"""
@@ -36,6 +53,30 @@ class OperationVectorStore:
         # 创建或获取集合
         self.collection = self._get_or_create_collection()
 
+        # 操作ID -> 文档的内存索引（首次按ID查找时从集合加载，经本实例写入时失效）
+        # 其他进程（导入、同步脚本）写入的数据最多滞后 TTL
+        self._index_lock = threading.Lock()
+        self._version = 0
+        self._id_index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._id_index_loaded_at = 0.0
+        self._id_index_ttl = 300  # 5分钟
+        self._normalized_ids: Dict[str, str] = {}
+
+        # search 结果缓存：(查询, 结果数, 服务过滤, 集合版本) -> (写入时间, 结果)
+        # 经本实例的写入会使版本递增；其他进程写入的数据最多滞后 TTL
+        self._search_cache: "OrderedDict[Tuple[str, int, Optional[str], int], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._search_cache_ttl = 300  # 5分钟
+        self._search_cache_max = 512
+        self._search_cache_hits = 0
+        self._search_cache_misses = 0
+
+        # 按服务的操作数：(集合版本, 统计时间, {服务名: 操作数})，写入后失效
+        self._service_counts: Optional[Tuple[int, float, Dict[str, int]]] = None
+        self._service_counts_ttl = 300  # 5分钟，覆盖其他进程的写入
+
+        self._embedding_function = None
+        self.embedding_model_name = EMBEDDING_MODEL_NAME
+
         logger.info(f"向量存储初始化完成，目录: {persist_directory}")
 
     def _get_or_create_collection(self):
@@ -85,31 +126,25 @@ class OperationVectorStore:
             是否添加成功
         """
         try:
-            # 构建文档文本 - 用于向量嵌入
-            doc_text = self._build_document_text(
-                service_name=service_name,
-                operation_name=operation_name,
-                description=description,
-                input_params=input_params,
-                output_params=output_params
-            )
-
-            # 构建元数据
-            metadatas = {
+            doc_text, metadatas = self.build_record({
+                "operation_id": operation_id,
                 "service_name": service_name,
                 "operation_name": operation_name,
-                "operation_id": operation_id,
                 "description": description,
-            }
-            if metadata:
-                metadatas.update(metadata)
+                "input_params": input_params,
+                "output_params": output_params,
+                "metadata": metadata
+            })
 
             # 添加到集合
-            self.collection.add(
-                ids=[operation_id],
-                documents=[doc_text],
-                metadatas=[metadatas]
-            )
+            try:
+                self.collection.add(
+                    ids=[operation_id],
+                    documents=[doc_text],
+                    metadatas=[metadatas]
+                )
+            finally:
+                self._invalidate_index()
 
             logger.debug(f"添加操作成功: {operation_id}")
             return True
@@ -118,64 +153,267 @@ class OperationVectorStore:
             logger.error(f"添加操作失败 {operation_id}: {e}")
             return False
 
-    def batch_add_operations(self, operations: List[Dict[str, Any]]) -> int:
+    def build_record(self, op: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """
+        由操作字典构建文档文本和元数据
+
+        元数据中的 content_hash 是文档文本和其余元数据的哈希，增量同步据此判断操作是否变化。
+
+        Returns:
+            (文档文本, 元数据)
         """
-        批量添加操作
+        service_name = op.get("service_name")
+        operation_name = op.get("operation_name")
+        description = op.get("description", "")
+        input_params = op.get("input_params", {})
+
+        # 构建文档文本 - 用于向量嵌入
+        doc_text = self._build_document_text(
+            service_name=service_name,
+            operation_name=operation_name,
+            description=description,
+            input_params=input_params,
+            output_params=op.get("output_params", {})
+        )
+
+        # 构建元数据
+        metadata = {
+            "service_name": service_name,
+            "operation_name": operation_name,
+            "operation_id": op.get("operation_id"),
+            "description": description,
+            # 参数定义原样保存（JSON字符串），供静态验证检查必填参数
+            "input_params": json.dumps(input_params or {}, ensure_ascii=False),
+            **(op.get("metadata") or {})
+        }
+        content = json.dumps([doc_text, metadata], ensure_ascii=False, sort_keys=True, default=str)
+        metadata["content_hash"] = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        return doc_text, metadata
+
+    def sync_operations(
+        self,
+        operations: List[Dict[str, Any]],
+        source: str,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        delete_missing: bool = False
+    ) -> Dict[str, Any]:
+        """
+        增量同步：把集合中来自 source 的操作更新为给定的操作集合
+
+        按操作ID和 content_hash 与已存储的数据比较，只 upsert 新增和内容变化的操作；
+        delete_missing 时删除同一来源中不在给定集合里的操作。多个导入脚本共用一个集合，
+        其他来源（以及没有来源标记的旧数据）的操作不会被删除；操作ID已被其他来源占用时跳过并记入 conflicts，
+        两个来源交替同步时不会互相覆盖。没有来源标记的旧数据由本次同步接管。集合始终不为空，同步期间检索照常可用。
 
         Args:
-            operations: 操作列表，每个操作是一个字典
+            operations: 该来源期望的完整操作列表（格式同 batch_add_operations）
+            source: 数据来源，写入元数据的 source 字段，如 "registry"、"sdk"
+            embedding_cache: 可选的嵌入缓存
+            delete_missing: 是否删除同一来源中不在给定集合里的已存储操作
 
         Returns:
-            成功添加的数量
+            {"added", "updated", "unchanged", "deleted", "conflicts", "failed": 操作ID列表,
+             "error": 失败原因(成功时为None)}
         """
+        from utils.ingestion import IngestionPipeline
+
+        summary: Dict[str, Any] = {"added": [], "updated": [], "unchanged": [], "deleted": [], "conflicts": [],
+                                   "failed": [], "error": None}
+
+        desired: Dict[str, Dict[str, Any]] = {}
+        for op in operations:
+            # 重复ID以最后一个为准
+            desired[op.get("operation_id")] = {**op, "metadata": {**(op.get("metadata") or {}), "source": source}}
+
         try:
-            ids = []
-            documents = []
-            metadatas = []
-
-            for op in operations:
-                operation_id = op.get("operation_id")
-                service_name = op.get("service_name")
-                operation_name = op.get("operation_name")
-                description = op.get("description", "")
-                input_params = op.get("input_params", {})
-                output_params = op.get("output_params", {})
-                metadata = op.get("metadata", {})
-
-                # 构建文档文本
-                doc_text = self._build_document_text(
-                    service_name=service_name,
-                    operation_name=operation_name,
-                    description=description,
-                    input_params=input_params,
-                    output_params=output_params
-                )
+            stored = self.collection.get(include=["metadatas"])
+        except Exception as e:
+            logger.error(f"读取已存储操作失败: {e}")
+            summary["error"] = str(e)
+            return summary
+        stored_hashes = {
+            doc_id: (metadata or {}).get("content_hash")
+            for doc_id, metadata in zip(stored["ids"], stored["metadatas"])
+        }
+        stored_sources = {
+            doc_id: (metadata or {}).get("source")
+            for doc_id, metadata in zip(stored["ids"], stored["metadatas"])
+        }
+        own_ids = {doc_id for doc_id, stored_source in stored_sources.items() if stored_source == source}
+
+        changed = []
+        for operation_id, op in desired.items():
+            if stored_sources.get(operation_id) not in (None, source):
+                summary["conflicts"].append(operation_id)
+                continue
+            _, metadata = self.build_record(op)
+            if operation_id not in stored_hashes:
+                summary["added"].append(operation_id)
+            elif stored_hashes[operation_id] != metadata["content_hash"]:
+                summary["updated"].append(operation_id)  # 包括导入时未保存 content_hash 的旧数据
+            else:
+                summary["unchanged"].append(operation_id)
+                continue
+            changed.append(op)
+        if delete_missing:
+            summary["deleted"] = sorted(own_ids - set(desired))
+
+        if changed:
+            report = IngestionPipeline(self, embedding_cache=embedding_cache).run(changed)
+            summary["failed"] = report.failed_ids
+            if report.failed_ids:
+                summary["error"] = f"{len(report.failed_ids)} 个操作写入失败"
+        if summary["deleted"]:
+            try:
+                try:
+                    self.collection.delete(ids=summary["deleted"])
+                finally:
+                    self._invalidate_index()
+            except Exception as e:
+                logger.error(f"删除已移除的操作失败: {e}")
+                summary["error"] = str(e)
+                return summary
+
+        logger.info(
+            f"同步完成: 新增 {len(summary['added'])}，更新 {len(summary['updated'])}，"
+            f"未变化 {len(summary['unchanged'])}，删除 {len(summary['deleted'])}，"
+            f"与其他来源冲突 {len(summary['conflicts'])}"
+        )
+        return summary
+
+    def embed_documents(self, documents: List[str]) -> List[List[float]]:
+        """用集合的嵌入模型计算文档向量（与 add 时 Chroma 自动嵌入的结果一致）"""
+        if self._embedding_function is None:
+            with self._index_lock:  # 导入流水线的多个线程可能同时首次调用
+                if self._embedding_function is None:
+                    from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+                    self._embedding_function = DefaultEmbeddingFunction()
+        return self._embedding_function(documents)
+
+    def batch_add_operations(
+        self,
+        operations: Iterable[Dict[str, Any]],
+        embedding_cache: Optional[EmbeddingCache] = None,
+        total: Optional[int] = None
+    ) -> int:
+        """
+        批量添加操作（已存在的ID覆盖）
 
-                ids.append(operation_id)
-                documents.append(doc_text)
+        通过 IngestionPipeline 分块并行嵌入、逐块写入，写入失败的块重试后跳过，不影响其他块。
 
-                # 构建元数据
-                metadatas.append({
-                    "service_name": service_name,
-                    "operation_name": operation_name,
-                    "operation_id": operation_id,
-                    "description": description,
-                    **metadata
-                })
+        Args:
+            operations: 操作列表或生成器，每个操作是一个字典
+            embedding_cache: 可选的嵌入缓存；提供时只对缓存中没有的文档文本计算向量
+            total: 可选的操作总数，仅用于进度显示（operations 为列表时自动取长度）
+
+        Returns:
+            成功添加的数量
+        """
+        from utils.ingestion import IngestionPipeline
+
+        if total is None and isinstance(operations, list):
+            total = len(operations)
+        report = IngestionPipeline(self, embedding_cache=embedding_cache).run(operations, total=total)
+        if report.failed_ids:
+            logger.error(f"批量添加操作部分失败: {len(report.failed_ids)} 条，如 {report.failed_ids[:5]}")
+        logger.info(f"批量添加操作完成: {report.written}/{report.total} 条，{report.throughput} 条/秒")
+        return report.written
+
+    def max_batch_size(self) -> int:
+        """Chroma 单次写入的最大条数"""
+        try:
+            return self.client.get_max_batch_size()
+        except Exception:
+            return 5000
 
-            # 批量添加
-            self.collection.add(
+    def upsert_records(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: Optional[List[List[float]]] = None
+    ):
+        """写入已构建好的记录（已存在的ID覆盖），失败时抛出异常"""
+        try:
+            self.collection.upsert(
                 ids=ids,
                 documents=documents,
-                metadatas=metadatas
+                metadatas=metadatas,
+                embeddings=embeddings
             )
+        finally:
+            self._invalidate_index()
+
+    def _invalidate_index(self):
+        """集合内容变化后使内存索引失效"""
+        with self._index_lock:
+            self._version += 1
+            self._id_index = None
+            self._normalized_ids = {}
+            self._search_cache.clear()
+            self._service_counts = None
+
+    def _get_id_index(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        获取操作ID -> {"document", "metadata"} 的内存索引，首次调用或 TTL 到期时一次 get 加载整个集合
 
-            logger.info(f"批量添加操作成功: {len(operations)} 条")
-            return len(operations)
+        Returns:
+            索引；加载失败时返回 None
+        """
+        with self._index_lock:
+            if self._id_index is not None and time.time() - self._id_index_loaded_at < self._id_index_ttl:
+                return self._id_index
+            version = self._version
+
+        with trace_span("vector.load_id_index") as span:
+            try:
+                results = self.collection.get(include=["documents", "metadatas"])
+            except Exception as e:
+                span.record_error(e)
+                logger.error(f"加载操作ID索引失败: {e}")
+                return None
+            index = {
+                doc_id: {"document": document, "metadata": metadata or {}}
+                for doc_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+            }
+            normalized_ids = {}
+            for doc_id in sorted(index):
+                normalized_ids.setdefault(_normalize_id(doc_id), doc_id)
+            span.set_attribute("documents", len(index))
+
+        with self._index_lock:
+            if self._version == version:  # 加载期间没有写入才缓存
+                self._id_index = index
+                self._id_index_loaded_at = time.time()
+                self._normalized_ids = normalized_ids
+        return index
+
+    def lookup_operation(self, service: str, operation: str) -> Optional[Dict[str, Any]]:
+        """
+        按 服务:操作 精确查找操作（忽略大小写和连字符/下划线差异），不做向量检索
 
-        except Exception as e:
-            logger.error(f"批量添加操作失败: {e}")
-            return 0
+        Returns:
+            与 search 结果格式相同的字典（similarity 为 1）；不存在时返回 None
+        """
+        index = self._get_id_index()
+        if not index:
+            return None
+        operation_id = f"{service}:{operation}"
+        if operation_id not in index:
+            operation_id = self._normalized_ids.get(_normalize_id(operation_id))
+        entry = index.get(operation_id) if operation_id else None
+        if entry is None:
+            return None
+        metadata = entry["metadata"]
+        return {
+            "operation_id": operation_id,
+            "service_name": metadata.get("service_name", service),
+            "operation_name": metadata.get("operation_name", operation),
+            "description": metadata.get("description", ""),
+            "document": entry["document"],
+            "similarity": 1.0,
+            "distance": 0.0
+        }
 
     def _build_document_text(
         self,
@@ -244,39 +482,75 @@ class OperationVectorStore:
         Returns:
             搜索结果列表
         """
-        try:
-            # 构建过滤条件
-            where = None
-            if service_filter:
-                where = {"service_name": service_filter}
-
-            # 查询
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results,
-                where=where,
-                include=["documents", "metadatas", "distances"]
-            )
-
-            # 格式化结果
-            formatted_results = []
-            if results["ids"] and results["ids"][0]:
-                for i, doc_id in enumerate(results["ids"][0]):
-                    formatted_results.append({
-                        "operation_id": doc_id,
-                        "service_name": results["metadatas"][0][i]["service_name"],
-                        "operation_name": results["metadatas"][0][i]["operation_name"],
-                        "description": results["metadatas"][0][i].get("description", ""),
-                        "document": results["documents"][0][i],
-                        "similarity": 1 - results["distances"][0][i],  # 转换为相似度
-                        "distance": results["distances"][0][i]
-                    })
-
-            return formatted_results
+        with trace_span("vector.search", query_length=len(query), n_results=n_results,
+                        service_filter=service_filter) as span:
+            cache_key, cached = self._get_cached_search(query, n_results, service_filter)
+            if cached is not None:
+                span.set_attribute("cache_hit", True)
+                span.set_attribute("results", len(cached))
+                return cached
+
+            try:
+                # 构建过滤条件
+                where = None
+                if service_filter:
+                    where = {"service_name": service_filter}
+
+                # 查询
+                results = self.collection.query(
+                    query_texts=[query],
+                    n_results=n_results,
+                    where=where,
+                    include=["documents", "metadatas", "distances"]
+                )
 
-        except Exception as e:
-            logger.error(f"搜索失败: {e}")
-            return []
+                formatted_results = self._format_query_results(results, 0)
+                span.set_attribute("results", len(formatted_results))
+                self._put_search_cache(cache_key, formatted_results)
+                return formatted_results
+
+            except Exception as e:
+                span.record_error(e)
+                logger.error(f"搜索失败: {e}")
+                return []
+
+    def _get_cached_search(
+        self, query: str, n_results: int, service_filter: Optional[str]
+    ) -> Tuple[Tuple[str, int, Optional[str], int], Optional[List[Dict[str, Any]]]]:
+        """查找 search 结果缓存，返回 (缓存键, 结果副本或None)"""
+        with self._index_lock:
+            key = (query, n_results, service_filter, self._version)
+            entry = self._search_cache.get(key)
+            if entry is not None and time.time() - entry[0] < self._search_cache_ttl:
+                self._search_cache.move_to_end(key)
+                self._search_cache_hits += 1
+                return key, [dict(hit) for hit in entry[1]]
+            if entry is not None:
+                del self._search_cache[key]
+            self._search_cache_misses += 1
+            return key, None
+
+    def _put_search_cache(self, key: Tuple[str, int, Optional[str], int], results: List[Dict[str, Any]]):
+        with self._index_lock:
+            if key[3] != self._version:  # 检索期间集合已被修改
+                return
+            self._search_cache[key] = (time.time(), [dict(hit) for hit in results])
+            self._search_cache.move_to_end(key)
+            while len(self._search_cache) > self._search_cache_max:
+                self._search_cache.popitem(last=False)
+
+    def get_search_cache_stats(self) -> Dict[str, Any]:
+        """search 结果缓存统计"""
+        with self._index_lock:
+            total = self._search_cache_hits + self._search_cache_misses
+            return {
+                "entries": len(self._search_cache),
+                "max_entries": self._search_cache_max,
+                "ttl_seconds": self._search_cache_ttl,
+                "hits": self._search_cache_hits,
+                "misses": self._search_cache_misses,
+                "hit_rate": round(self._search_cache_hits / total, 4) if total else 0.0,
+            }
 
     def search_by_service_operations(
         self,
@@ -284,7 +558,7 @@ class OperationVectorStore:
         n_results_per_op: int = 5
     ) -> List[Dict[str, Any]]:
         """
-        按服务+操作对进行针对性检索
+        按服务+操作对进行针对性检索：操作ID精确存在的直接取文档，其余按服务过滤做向量检索
 
         Args:
             service_operations: 列表，每项含 service 和 operation
@@ -293,30 +567,115 @@ class OperationVectorStore:
         Returns:
             去重后的搜索结果列表
         """
-        seen_ids = set()
-        results = []
+        with trace_span("vector.search_by_service_operations", pairs=len(service_operations)) as span:
+            results = self._search_by_service_operations(service_operations, n_results_per_op)
+            span.set_attribute("results", len(results))
+            span.set_attribute("exact_hits", sum(1 for hit in results if hit["distance"] == 0.0))
+            return results
+
+    @staticmethod
+    def _format_query_results(results: Dict[str, Any], index: int) -> List[Dict[str, Any]]:
+        """格式化 collection.query 返回的第 index 个查询的结果"""
+        formatted_results = []
+        if results["ids"] and results["ids"][index]:
+            for i, doc_id in enumerate(results["ids"][index]):
+                metadata = results["metadatas"][index][i]
+                distance = results["distances"][index][i]
+                formatted_results.append({
+                    "operation_id": doc_id,
+                    "service_name": metadata["service_name"],
+                    "operation_name": metadata["operation_name"],
+                    "description": metadata.get("description", ""),
+                    "document": results["documents"][index][i],
+                    "similarity": 1 - distance,  # 转换为相似度
+                    "distance": distance
+                })
+        return formatted_results
+
+    def _multi_query(self, queries: List[str], services: List[str], n_results: int) -> List[List[Dict[str, Any]]]:
+        """
+        一次多查询调用检索多个 (查询文本, 服务) 对
+
+        所有查询文本一次批量嵌入，服务过滤合并为 $in 条件，按服务数放大召回数后
+        再按各查询自己的服务拆分结果。召回被其他服务挤占、结果不足的查询按服务分组补查，
+        保证每个查询的结果与单独带服务过滤检索一致。
 
+        Returns:
+            与 queries 一一对应的结果列表（每项最多 n_results 条）
+        """
+        distinct_services = sorted(set(services))
+        where = ({"service_name": distinct_services[0]} if len(distinct_services) == 1
+                 else {"service_name": {"$in": distinct_services}})
+        n_fetch = min(n_results * len(distinct_services), MAX_MULTI_QUERY_RESULTS)
+        results = self.collection.query(
+            query_texts=queries,
+            n_results=max(n_fetch, n_results),
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+
+        hits_per_query: List[List[Dict[str, Any]]] = []
+        refill: Dict[str, List[int]] = {}
+        for i, service in enumerate(services):
+            fetched = self._format_query_results(results, i)
+            hits = [hit for hit in fetched if hit["service_name"] == service][:n_results]
+            if len(hits) < n_results and len(fetched) >= n_fetch and len(distinct_services) > 1:
+                refill.setdefault(service, []).append(i)  # 召回已满但本服务结果不足，可能被截断
+            hits_per_query.append(hits)
+
+        for service, indexes in refill.items():
+            results = self.collection.query(
+                query_texts=[queries[i] for i in indexes],
+                n_results=n_results,
+                where={"service_name": service},
+                include=["documents", "metadatas", "distances"]
+            )
+            for position, i in enumerate(indexes):
+                hits_per_query[i] = self._format_query_results(results, position)
+        return hits_per_query
+
+    def _search_by_service_operations(
+        self,
+        service_operations: List[Dict[str, str]],
+        n_results_per_op: int
+    ) -> List[Dict[str, Any]]:
+        pairs = []
         for pair in service_operations:
             service = pair.get("service", "")
             operation = pair.get("operation", "")
-            if not service or not operation:
-                continue
-
-            # 精确搜索：用操作名作为查询，服务名作为过滤
-            hits = self.search(
-                query=operation,
-                n_results=n_results_per_op,
-                service_filter=service
-            )
+            if service and operation:
+                pairs.append((service, operation))
+        pairs = list(dict.fromkeys(pairs))
+        if not pairs:
+            return []
 
-            if not hits:
-                # 回退：仅按服务名搜索
-                hits = self.search(
-                    query=f"{service} {operation}",
-                    n_results=n_results_per_op,
-                    service_filter=service
+        # 操作ID精确命中的直接取文档，不做嵌入和向量检索
+        hits_per_pair: List[List[Dict[str, Any]]] = []
+        unresolved = []
+        for i, (service, operation) in enumerate(pairs):
+            hit = self.lookup_operation(service, operation)
+            if hit is None:
+                unresolved.append(i)
+            hits_per_pair.append([hit] if hit else [])
+
+        # 其余用操作名作为查询，服务名作为过滤；带服务过滤的检索只在该服务没有任何
+        # 文档时才返回空，因此不再需要按 "服务 操作" 文本重查的回退
+        if unresolved:
+            try:
+                searched = self._multi_query(
+                    [pairs[i][1] for i in unresolved],
+                    [pairs[i][0] for i in unresolved],
+                    n_results_per_op
                 )
+            except Exception as e:
+                logger.error(f"批量检索失败: {e}")
+                searched = [[] for _ in unresolved]
+            for i, hits in zip(unresolved, searched):
+                hits_per_pair[i] = hits
 
+        seen_ids = set()
+        results = []
+        for hits in hits_per_pair:
             for hit in hits:
                 op_id = hit.get("operation_id", "")
                 if op_id not in seen_ids:
@@ -325,6 +684,35 @@ class OperationVectorStore:
 
         return results
 
+    def get_input_params(self, operation_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        批量获取操作的输入参数定义（从操作ID索引读取，不做向量检索）
+
+        Args:
+            operation_ids: 操作ID列表 (格式: service_name:operation_name)
+
+        Returns:
+            {操作ID: input_params}；不存在的操作或导入时未保存参数定义的旧数据不包含在结果中
+        """
+        ids = list(dict.fromkeys(operation_ids))
+        if not ids:
+            return {}
+        index = self._get_id_index()
+        if index is None:
+            return {}
+
+        params = {}
+        for doc_id in ids:
+            entry = index.get(doc_id)
+            raw = entry["metadata"].get("input_params") if entry else None
+            if not raw:
+                continue
+            try:
+                params[doc_id] = json.loads(raw)
+            except (TypeError, ValueError):
+                logger.warning(f"操作 {doc_id} 的参数定义不是有效JSON，已忽略")
+        return params
+
     def get_all_operations(
         self,
         service_filter: Optional[str] = None
@@ -375,7 +763,10 @@ class OperationVectorStore:
             是否删除成功
         """
         try:
-            self.collection.delete(ids=[operation_id])
+            try:
+                self.collection.delete(ids=[operation_id])
+            finally:
+                self._invalidate_index()
             logger.debug(f"删除操作成功: {operation_id}")
             return True
         except Exception as e:
@@ -391,8 +782,11 @@ class OperationVectorStore:
         """
         try:
             # 删除并重新创建集合
-            self.client.delete_collection("huawei_cloud_operations")
-            self.collection = self._get_or_create_collection()
+            try:
+                self.client.delete_collection("huawei_cloud_operations")
+                self.collection = self._get_or_create_collection()
+            finally:
+                self._invalidate_index()
             logger.info("清空所有数据成功")
             return True
         except Exception as e:
@@ -403,21 +797,72 @@ class OperationVectorStore:
         """获取操作总数"""
         return self.collection.count()
 
+    def get_service_counts(self) -> Dict[str, int]:
+        """
+        按服务统计操作数（结果缓存到下一次写入或 TTL 到期）
+
+        内存索引未过期时直接统计；否则分页只读取操作ID（格式为 "服务:操作"），
+        不加载文档和元数据，仅对不符合该格式的ID读取元数据中的服务名。
+
+        Returns:
+            {服务名: 操作数}
+        """
+        with self._index_lock:
+            cached = self._service_counts
+            version = self._version
+        if cached is not None and cached[0] == version and time.time() - cached[1] < self._service_counts_ttl:
+            return dict(cached[2])
+
+        counts: Dict[str, int] = {}
+        with self._index_lock:
+            index = self._id_index
+            if index is not None and time.time() - self._id_index_loaded_at >= self._id_index_ttl:
+                index = None  # 过期的索引可能缺少其他进程写入的操作，改为直接读取集合
+        if index is not None:
+            services = [entry["metadata"].get("service_name") for entry in index.values()]
+        else:
+            services = self._read_service_names()
+        for service in services:
+            if service:
+                counts[service] = counts.get(service, 0) + 1
+
+        with self._index_lock:
+            if self._version == version:
+                self._service_counts = (version, time.time(), counts)
+        return dict(counts)
+
+    def _read_service_names(self) -> List[Optional[str]]:
+        """分页读取集合中每个操作的服务名（优先从操作ID解析）"""
+        services: List[Optional[str]] = []
+        unparsed: List[str] = []
+        page_size = self.max_batch_size()
+        offset = 0
+        while True:
+            ids = self.collection.get(include=[], limit=page_size, offset=offset)["ids"]
+            for doc_id in ids:
+                service, separator, _ = doc_id.partition(":")
+                if separator and service:
+                    services.append(service)
+                else:
+                    unparsed.append(doc_id)
+            if len(ids) < page_size:
+                break
+            offset += page_size
+        for start in range(0, len(unparsed), page_size):
+            metadatas = self.collection.get(ids=unparsed[start:start + page_size], include=["metadatas"])["metadatas"]
+            services.extend((metadata or {}).get("service_name") for metadata in metadatas)
+        return services
+
     def get_stats(self) -> Dict[str, Any]:
         """获取统计信息"""
         try:
-            all_ops = self.get_all_operations()
-
-            # 按服务统计
-            service_count = {}
-            for op in all_ops:
-                service = op["service_name"]
-                service_count[service] = service_count.get(service, 0) + 1
+            service_count = self.get_service_counts()
 
             return {
-                "total_operations": len(all_ops),
+                "total_operations": sum(service_count.values()),
                 "total_services": len(service_count),
-                "operations_by_service": service_count
+                "operations_by_service": service_count,
+                "search_cache": self.get_search_cache_stats()
             }
         except Exception as e:
             logger.error(f"获取统计信息失败: {e}")
@@ -3,10 +3,12 @@
 基于LLM完全自动化的工作流生成和执行
 """
 
+import asyncio
 import json
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 from agents.llm_orchestration_agent import LLMOrchestrationAgent
 from services.workflow_engine import WorkflowEngine
+from utils.config_manager import get_config
 from utils.logger import setup_logger
 
 
@@ -73,7 +75,7 @@ class NaturalLanguageWorkflowGenerator:
         """生成工作流"""
         try:
             # 使用Agent生成工作流
-            workflow = self.agent.plan(requirement, context)
+            workflow = await self.agent.aplan(requirement, context)
             return workflow
         except Exception as e:
             self.logger.error(f"生成工作流失败: {e}")
@@ -116,22 +118,72 @@ class NaturalLanguageWorkflowGenerator:
             return False
         return True
 
-    async def batch_generate(self, requirements: List[str]) -> List[Dict[str, Any]]:
+    async def batch_generate(self, requirements: List[str], concurrency: Optional[int] = None,
+                             context: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
-        批量生成工作流
+        批量生成工作流（并发执行）
 
         Args:
             requirements: 需求列表
+            concurrency: 最大并发数，默认 agent.batch_concurrency
+            context: 可选上下文，所有需求共用
 
         Returns:
-            结果列表
+            结果列表，顺序与 requirements 一致
         """
-        results = []
-        for req in requirements:
-            result = await self.generate_and_execute(req, auto_execute=False)
-            results.append(result)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(requirements)
+        async for index, result in self.batch_generate_iter(requirements, concurrency, context):
+            results[index] = result
         return results
 
+    async def batch_generate_iter(
+        self,
+        requirements: List[str],
+        concurrency: Optional[int] = None,
+        context: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        批量生成工作流，按完成顺序逐个产出结果
+
+        最多 concurrency 个需求同时生成；整个批次共享向量检索结果，
+        参数相同的检索（如模板化需求的针对性检索）只执行一次。
+        提前停止迭代时未完成的生成会被取消。
+
+        Args:
+            requirements: 需求列表
+            concurrency: 最大并发数，默认 agent.batch_concurrency
+            context: 可选上下文，所有需求共用
+
+        Yields:
+            (需求在 requirements 中的下标, 结果字典)
+        """
+        if concurrency is None:
+            concurrency = get_config().get('agent.batch_concurrency', 8)
+        semaphore = asyncio.Semaphore(max(int(concurrency), 1))
+        memo: Dict[str, asyncio.Task] = {}
+
+        async def run(index: int, requirement: str) -> Tuple[int, Dict[str, Any]]:
+            async with semaphore:
+                with self.agent.shared_retrieval(memo):
+                    try:
+                        result = await self.generate_and_execute(requirement, auto_execute=False, context=context)
+                    except Exception as e:
+                        self.logger.error(f"批量生成第 {index + 1} 个需求失败: {e}")
+                        result = {"success": False, "error": str(e), "message": "生成工作流失败"}
+            result["requirement"] = requirement
+            return index, result
+
+        tasks = [asyncio.create_task(run(i, req)) for i, req in enumerate(requirements)]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                yield await completed
+        finally:
+            for task in tasks:
+                task.cancel()
+            for task in memo.values():
+                task.cancel()
+            self.logger.info(f"批量生成结束: {len(requirements)} 个需求，去重后执行向量检索 {len(memo)} 次")
+
 
 # 单例实例
 _generator = None